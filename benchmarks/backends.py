@@ -0,0 +1,80 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+"""
+Local stand-in of a network cache (redis, memcached) for benchmarks.
+"""
+
+from __future__ import unicode_literals, absolute_import
+
+import random
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class LatencyCache(LocMemCache):
+    """
+    LocMemCache which sleeps LATENCY +- JITTER seconds on every call, bulk
+    calls included, to simulate one network round trip. It counts calls and
+    keys read by get and get_many.
+    """
+
+    def __init__(self, name, params):
+        super(LatencyCache, self).__init__(name, params)
+        self.latency = float(params.get('LATENCY', 0.0005))
+        self.jitter = float(params.get('JITTER', 0.0001))
+        self.calls = 0
+        self.reads = 0
+
+    def round_trip(self):
+        self.calls += 1
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.round_trip()
+        return super(LatencyCache, self).add(key, value, timeout, version)
+
+    def get(self, key, default=None, version=None):
+        self.round_trip()
+        self.reads += 1
+        return super(LatencyCache, self).get(key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.round_trip()
+        super(LatencyCache, self).set(key, value, timeout, version)
+
+    def delete(self, key, version=None):
+        self.round_trip()
+        super(LatencyCache, self).delete(key, version)
+
+    def get_many(self, keys, version=None):
+        self.round_trip()
+        self.reads += len(keys)
+        result = {}
+        for key in keys:
+            value = super(LatencyCache, self).get(key, version=version)
+            if value is not None:
+                result[key] = value
+
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self.round_trip()
+        for key, value in data.items():
+            super(LatencyCache, self).set(key, value, timeout, version)
+
+        return []
+
+    def delete_many(self, keys, version=None):
+        self.round_trip()
+        for key in keys:
+            super(LatencyCache, self).delete(key, version)
+
+    def clear(self):
+        self.round_trip()
+        super(LatencyCache, self).clear()
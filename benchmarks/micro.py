@@ -0,0 +1,62 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+"""
+Micro benchmarks of InRequestCache hot path. Keys of default version are
+built once and memoized (KEY_MEMO_SIZE), "version=1" rows build the key on
+every call, that is the only path TRUSTED_KEYS makes faster.
+
+    $ python benchmarks/micro.py
+"""
+
+from __future__ import unicode_literals, absolute_import, print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure()
+
+from django_in_request_cache.cache import InRequestCache  # noqa: E402
+from django_in_request_cache.context import request_cache_scope  # noqa: E402
+
+NUMBER = 200000
+
+
+def bench(name, func, number=NUMBER):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print('%-48s %8.0f ns/op' % (name, seconds / number * 1e9))
+
+
+def main():
+    with request_cache_scope():
+        raw = {'key': 'value'}
+        bench('dict.get (baseline)', lambda: raw.get('key'))
+
+        for index, (name, params) in enumerate((
+                ('InRequestCache', {}),
+                ('InRequestCache TRUSTED_KEYS', {'TRUSTED_KEYS': True}),
+                ('InRequestCache MAX_ENTRIES', {'MAX_ENTRIES': 1000}),
+                ('InRequestCache REQUEST_CLOCK', {
+                    'TRUSTED_KEYS': True, 'REQUEST_CLOCK': True,
+                    'REQUEST_TIMEOUT': 60,
+                }),
+        )):
+            # request store of each config is kept under its own location
+            cache = InRequestCache('_bench_%s' % index, params)
+            cache.set('key', 'value')
+            bench('%s.get hit' % name, lambda: cache.get('key'))
+            # explicit version skips key memo, key is built on every call
+            bench('%s.get hit version=1' % name,
+                  lambda: cache.get('key', version=1))
+            bench('%s.get miss' % name, lambda: cache.get('missing'))
+            bench('%s.set' % name, lambda: cache.set('key', 'value'))
+
+
+if __name__ == '__main__':
+    main()
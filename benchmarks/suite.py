@@ -0,0 +1,282 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+"""
+Benchmark suite of InRequestCache, LocMemCache and CacheACache against
+a slow tier with simulated latency (benchmarks.backends.LatencyCache).
+
+    $ python benchmarks/suite.py --latency 0.5 --jitter 0.1 --output out.json
+    $ python benchmarks/suite.py --quick --zipf 0
+
+Keys are picked by Zipf law (--zipf exponent, 0 for uniform keys), so hot
+keys repeat across requests like in real traffic and fast tiers can serve
+them.
+
+Results are printed as a table and written as JSON to --output, so runs of
+different versions can be compared.
+"""
+
+from __future__ import unicode_literals, absolute_import, print_function
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+BACKENDS = (
+    'in_request',
+    'locmem',
+    'objects',
+    'slow',
+    'cache_a_cache_in_request',
+    'cache_a_cache_locmem',
+    'cache_a_cache_objects',
+)
+OPERATIONS = ('get', 'get_many', 'set', 'add')
+HIT_RATIOS = (0.0, 0.5, 0.9, 1.0)
+KEY_COUNTS = (10, 100)
+VALUE_SIZES = (10, 1024, 100 * 1024)
+
+
+def configure(latency, jitter, key_space):
+    slow = {
+        'BACKEND': 'benchmarks.backends.LatencyCache',
+        'LOCATION': 'slow',
+        'LATENCY': latency,
+        'JITTER': jitter,
+        'OPTIONS': {'MAX_ENTRIES': key_space * 10},
+    }
+    settings.configure(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'in_request': {
+            'BACKEND': 'django_in_request_cache.cache.InRequestCache',
+        },
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'locmem',
+            'OPTIONS': {'MAX_ENTRIES': key_space * 10},
+        },
+        'objects': {
+            'BACKEND': 'django_in_request_cache.cache.ObjectCache',
+            'LOCATION': 'objects',
+            'SAFETY': 'immutable',
+            'OPTIONS': {'MAX_ENTRIES': key_space * 10},
+        },
+        'slow': slow,
+        'cache_a_cache_in_request': {
+            'BACKEND': 'django_in_request_cache.cache.CacheACache',
+            'FAST_CACHE': 'in_request',
+            'CACHE_TO_CACHE': 'slow',
+        },
+        'cache_a_cache_locmem': {
+            'BACKEND': 'django_in_request_cache.cache.CacheACache',
+            'FAST_CACHE': 'locmem',
+            'CACHE_TO_CACHE': 'slow',
+        },
+        'cache_a_cache_objects': {
+            'BACKEND': 'django_in_request_cache.cache.CacheACache',
+            'FAST_CACHE': 'objects',
+            'CACHE_TO_CACHE': 'slow',
+        },
+    })
+    django.setup()
+
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def key_picker(rnd, key_names, zipf):
+    """
+    Return function picking given count of distinct keys, uniformly or by
+    Zipf law with zipf exponent over randomly ranked keys.
+    """
+    if not zipf:
+        return lambda count: rnd.sample(key_names, count)
+
+    ranked = list(key_names)
+    rnd.shuffle(ranked)
+    cum_weights = list(itertools.accumulate(
+        1.0 / (rank + 1) ** zipf for rank in range(len(ranked))
+    ))
+
+    def pick(count):
+        keys = []
+        while len(keys) < count:
+            key = rnd.choices(ranked, cum_weights=cum_weights)[0]
+            if key not in keys:
+                keys.append(key)
+
+        return keys
+
+    return pick
+
+
+def scenarios(quick):
+    hit_ratios = (0.0, 0.9) if quick else HIT_RATIOS
+    value_sizes = (1024,) if quick else VALUE_SIZES
+    key_counts = (10,) if quick else KEY_COUNTS
+    for backend, operation, value_size in itertools.product(
+            BACKENDS, OPERATIONS, value_sizes):
+        if operation == 'set':
+            yield backend, operation, None, 1, value_size
+            continue
+
+        counts = key_counts if operation == 'get_many' else (1,)
+        for hit_ratio, keys in itertools.product(hit_ratios, counts):
+            yield backend, operation, hit_ratio, keys, value_size
+
+
+def run_scenario(backend, operation, hit_ratio, keys, value_size, ops,
+                 ops_per_request, key_space, zipf=0):
+    from django.core.cache import caches
+    from django_in_request_cache.context import request_cache_scope
+
+    rnd = random.Random(42)
+    value = 'x' * value_size
+    key_names = ['key:%d' % index for index in range(key_space)]
+    present = set(rnd.sample(
+        key_names, int(key_space * (hit_ratio or 0.0))
+    ))
+    pick = key_picker(rnd, key_names, zipf)
+    slow = caches['slow']
+
+    def populate(cache):
+        # untimed, without slow tier round trips
+        latency, slow.latency = slow.latency, 0
+        jitter, slow.jitter = slow.jitter, 0
+        cache.set_many(dict((key, value) for key in present))
+        slow.latency, slow.jitter = latency, jitter
+
+    for name in ('slow', 'locmem', 'objects'):
+        caches[name].clear()
+
+    if present and backend != 'in_request':
+        with request_cache_scope():
+            populate(caches[backend])
+            if backend.startswith('cache_a_cache'):
+                # process wide fast tier starts cold
+                caches[backend].fast_cache.clear()
+
+    timings = []
+    slow_calls = 0
+    reads = slow_reads = 0
+    while len(timings) < ops:
+        with request_cache_scope():
+            cache = caches[backend]
+            if present and backend == 'in_request':
+                populate(cache)
+
+            calls_before, reads_before = slow.calls, slow.reads
+            for _ in range(min(ops_per_request, ops - len(timings))):
+                if operation == 'get_many':
+                    args = (pick(keys),)
+                    reads += keys
+                elif operation in ('set', 'add'):
+                    args = (pick(1)[0], value)
+                else:
+                    args = (pick(1)[0],)
+                    reads += 1
+
+                method = getattr(cache, operation)
+                start = time.perf_counter()
+                method(*args)
+                timings.append(time.perf_counter() - start)
+
+            slow_calls += slow.calls - calls_before
+            slow_reads += slow.reads - reads_before
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'backend': backend,
+        'operation': operation,
+        'hit_ratio': hit_ratio,
+        'keys': keys,
+        'value_size': value_size,
+        'ops': len(timings),
+        'total_s': total,
+        'throughput_ops_s': len(timings) / total if total else None,
+        'mean_us': total / len(timings) * 1e6,
+        'p50_us': percentile(timings, 0.5) * 1e6,
+        'p95_us': percentile(timings, 0.95) * 1e6,
+        'p99_us': percentile(timings, 0.99) * 1e6,
+        'slow_calls_per_op': float(slow_calls) / len(timings),
+        # fraction of read keys served without slow tier round trip
+        'fast_hit_ratio': 1 - float(slow_reads) / reads if (
+            reads and backend.startswith('cache_a_cache')) else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=0.5,
+                        help='slow tier latency in ms')
+    parser.add_argument('--jitter', type=float, default=0.1,
+                        help='slow tier latency jitter in ms')
+    parser.add_argument('--ops', type=int, default=500,
+                        help='operations per scenario')
+    parser.add_argument('--ops-per-request', type=int, default=50,
+                        help='operations in one request scope')
+    parser.add_argument('--key-space', type=int, default=1000,
+                        help='number of distinct keys')
+    parser.add_argument('--zipf', type=float, default=0.99,
+                        help='Zipf exponent of key popularity, 0 for '
+                             'uniform keys')
+    parser.add_argument('--quick', action='store_true',
+                        help='run reduced set of scenarios')
+    parser.add_argument('--output', help='JSON results file')
+    args = parser.parse_args(argv)
+
+    configure(args.latency / 1000.0, args.jitter / 1000.0, args.key_space)
+    from django_in_request_cache import __version__
+
+    results = []
+    print('%-26s %-9s %5s %4s %7s %10s %10s %8s %8s' % (
+        'backend', 'operation', 'hit', 'keys', 'size', 'mean_us', 'p95_us',
+        'slow/op', 'fast_hit'
+    ))
+    for scenario in scenarios(args.quick):
+        result = run_scenario(*scenario, ops=args.ops,
+                              ops_per_request=args.ops_per_request,
+                              key_space=args.key_space, zipf=args.zipf)
+        results.append(result)
+        fast_hit_ratio = result['fast_hit_ratio']
+        print('%-26s %-9s %5s %4d %7d %10.1f %10.1f %8.2f %8s' % (
+            result['backend'], result['operation'],
+            '-' if result['hit_ratio'] is None else result['hit_ratio'],
+            result['keys'], result['value_size'], result['mean_us'],
+            result['p95_us'], result['slow_calls_per_op'],
+            '-' if fast_hit_ratio is None else '%.2f' % fast_hit_ratio,
+        ))
+
+    report = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'django': django.get_version(),
+        'timestamp': time.time(),
+        'parameters': vars(args),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,584 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+"""
+Async support, it requires Python >= 3.5
+"""
+
+from __future__ import unicode_literals, absolute_import
+
+import asyncio
+import functools
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from django_in_request_cache.context import current_request, enter_scope, \
+    exit_scope
+from django_in_request_cache.stats import perf_counter, TimedCache
+from django_in_request_cache.store import CACHE_MISS, _NOT_FOUND
+from django_in_request_cache.tags import TaggedValue
+from django_in_request_cache.threads import run_in_request, share_request
+from django_in_request_cache.write_behind import flush_writes, \
+    WRITE_BUFFERS_ATTRIBUTE
+
+
+class AsyncRequestCacheMiddleware(object):
+    """
+    Async version of RequestCacheMiddleware for ASGI deployments.
+    CacheACache writes queued in the request (WRITE_BEHIND option) are
+    flushed in executor when the response is ready, request_finished
+    signal may be sent by other thread under ASGI.
+    """
+    sync_capable = False
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    async def __call__(self, request):
+        token = enter_scope(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            exit_scope(token)
+            if getattr(request, WRITE_BUFFERS_ATTRIBUTE, None):
+                asyncio.get_event_loop().run_in_executor(
+                    None, functools.partial(flush_writes, request=request)
+                )
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Call blocking sync func in default executor of the event loop, the call
+    sees request cache of the current request (see submit_in_request).
+    """
+    request = current_request()
+    if request is None:
+        call = functools.partial(func, *args, **kwargs)
+
+    else:
+        share_request(request)
+        call = functools.partial(run_in_request, request, func, args, kwargs)
+
+    return await asyncio.get_event_loop().run_in_executor(None, call)
+
+
+async def acall(cache, method, *args, **kwargs):
+    """
+    Await async version of cache backend method (aget for get etc.). Sync
+    method of backend without async cache API (all backends on Django
+    < 3.1) is called in executor, see run_sync, so gathered calls still
+    run concurrently.
+    """
+    timed_cache = None
+    if isinstance(cache, TimedCache):
+        timed_cache, cache = cache, cache.cache
+        start = perf_counter()
+
+    try:
+        async_method = getattr(cache, 'a' + method, None)
+        if async_method is None:
+            return await run_sync(getattr(cache, method), *args, **kwargs)
+
+        return await async_method(*args, **kwargs)
+    finally:
+        if timed_cache is not None:
+            timed_cache.stats.observe(
+                timed_cache.tier, perf_counter() - start
+            )
+
+
+async def aget_many_caches(keys, version=None):
+    """
+    Fetch keys from several caches concurrently.
+    :param keys: dict cache alias -> keys
+    :return: dict cache alias -> dict key -> value
+    """
+    aliases = list(keys)
+    results = await asyncio.gather(*[
+        acall(caches[alias], 'get_many', keys[alias], version=version)
+        for alias in aliases
+    ])
+    return dict(zip(aliases, results))
+
+
+class InRequestCacheAsyncMixin(object):
+    """
+    Native async API of InRequestCache. Request store is read in the event
+    loop, there is no thread switch of default Django implementation.
+    Extra keyword arguments (InRequestCache tags) are passed to the sync
+    methods.
+    """
+
+    async def aget(self, key, default=None, version=None):
+        return self.get(key, default, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+                   **kwargs):
+        return self.set(key, value, timeout, version, **kwargs)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+                   **kwargs):
+        return self.add(key, value, timeout, version, **kwargs)
+
+    async def adelete(self, key, version=None):
+        return self.delete(key, version)
+
+    async def aget_many(self, keys, version=None):
+        return self.get_many(keys, version)
+
+    async def aset_many(self, data, timeout=DEFAULT_TIMEOUT, version=None,
+                        **kwargs):
+        return self.set_many(data, timeout, version, **kwargs)
+
+    async def adelete_many(self, keys, version=None):
+        return self.delete_many(keys, version)
+
+    async def ahas_key(self, key, version=None):
+        return self.has_key(key, version)
+
+    async def aincr(self, key, delta=1, version=None):
+        return self.incr(key, delta, version)
+
+    async def adecr(self, key, delta=1, version=None):
+        return self.decr(key, delta, version)
+
+    async def aclear(self):
+        return self.clear()
+
+
+class CacheACacheAsyncMixin(object):
+    """
+    Native async API of CacheACache. Fast cache is awaited first, slower
+    cache is awaited for missing keys only. Namespace generations (COHERENCE
+    option), tag stamps and fast tiers of TIERS option are read and written
+    in executor, see run_sync. Generations and tag stamps found in request
+    memo are used in the event loop.
+    """
+
+    def generations_missing(self, keys):
+        """
+        Returns True if generations of keys namespaces aren't in request
+        memo, get_generations reads them from slower cache.
+        """
+        generations = self.request_memo(self.generations_attribute)
+        return any(self.namespace(key) not in generations for key in keys)
+
+    def tag_stamps_missing(self, tags, version=None):
+        """
+        Returns True if stamps of tags aren't in request memo,
+        get_tag_stamps reads them from slower cache.
+        """
+        stamps = self.tag_stamps_memo(version)
+        return any(tag not in stamps for tag in tags)
+
+    async def amemoized(self, missing, method, *args):
+        """
+        Call method reading request memo, in executor if the memo is
+        missing and it is read from slower cache.
+        """
+        if missing:
+            return await run_sync(method, *args)
+
+        return method(*args)
+
+    async def afast_cache_wrap(self, data, version=None):
+        return await self.amemoized(
+            self.generations_missing(data), self.fast_cache_wrap, data,
+            version
+        )
+
+    async def afast_cache_unwrap(self, data, version=None):
+        return await self.amemoized(
+            self.generations_missing(data), self.fast_cache_unwrap, data,
+            version
+        )
+
+    async def auntag_many(self, data, version=None):
+        tags = [
+            tag for value in data.values() if type(value) is TaggedValue
+            for tag in value.tags
+        ]
+        return await self.amemoized(
+            self.tag_stamps_missing(tags, version), self.untag_many, data,
+            version
+        )
+
+    async def auntag(self, key, value, version=None):
+        if type(value) is not TaggedValue:
+            return value
+
+        return (await self.auntag_many({key: value}, version)).get(
+            key, _NOT_FOUND
+        )
+
+    async def atag_many(self, data, tags, version=None):
+        """
+        Wrap values with current stamps of their tags, see tag_value.
+        :return: dict key -> TaggedValue
+        """
+        def tag_many():
+            return dict(
+                (key, self.tag_value(value, tags, version))
+                for key, value in data.items()
+            )
+
+        return await self.amemoized(
+            self.tag_stamps_missing(tags, version), tag_many
+        )
+
+    async def abump_generations(self, keys, version=None):
+        await run_sync(self.bump_generations, keys, version)
+
+    async def abackfill_many(self, data, timeout, version=None):
+        await run_sync(self.fast_cache.backfill_many, data, timeout, version)
+
+    async def afast_cache_set(self, key, value, timeout=DEFAULT_TIMEOUT,
+                              version=None, backfill=False):
+        timeout = self.get_fast_cache_timeout(timeout)
+        if self.refresh_ahead is not None:
+            self.refresh_ahead.record([key], timeout, version)
+
+        if self.coherence:
+            value = (await self.afast_cache_wrap({key: value}, version))[key]
+
+        if backfill and self.tier_chain is not None:
+            await self.abackfill_many({key: value}, timeout, version)
+
+        else:
+            await acall(self.fast_cache, 'set', key, value, timeout, version)
+
+    async def afast_cache_set_many(self, data, timeout=DEFAULT_TIMEOUT,
+                                   version=None, backfill=False):
+        if data:
+            timeout = self.get_fast_cache_timeout(timeout)
+            if self.refresh_ahead is not None:
+                self.refresh_ahead.record([
+                    key for key, value in data.items()
+                    if value is not CACHE_MISS
+                ], timeout, version)
+
+            if self.coherence:
+                data = await self.afast_cache_wrap(data, version)
+
+            if backfill and self.tier_chain is not None:
+                await self.abackfill_many(data, timeout, version)
+
+            else:
+                await acall(
+                    self.fast_cache, 'set_many', data, timeout, version
+                )
+
+    async def afast_cache_set_missing(self, keys, version=None):
+        if self.negative_timeout is None or not keys:
+            return
+
+        await self.afast_cache_set_many(
+            dict((key, CACHE_MISS) for key in keys), self.negative_timeout,
+            version, backfill=True
+        )
+
+    async def aget(self, key, default=None, version=None):
+        """
+        Fetch a given key from the cache. If the key does not exist, return
+        default, which itself defaults to None.
+        """
+        if self.prefetch and version is None:
+            self.record_reads([key])
+
+        stats = self.stats
+        value = await acall(
+            self.fast_cache, 'get', key, default=_NOT_FOUND, version=version
+        )
+        if self.coherence and value is not _NOT_FOUND:
+            value = (await self.afast_cache_unwrap({key: value}, version)).get(
+                key, _NOT_FOUND
+            )
+
+        if value is not _NOT_FOUND:
+            value = await self.auntag(key, value, version)
+
+        if value is CACHE_MISS:
+            if stats is not None:
+                stats.incr('negative_hit')
+
+            return default
+
+        if value is not _NOT_FOUND:
+            if stats is not None:
+                stats.incr('fast_hit')
+
+            if self.refresh_ahead is not None:
+                self.refresh_keys([key], version=version)
+
+            return value
+
+        if self.write_behind:
+            value = self.buffered_value(key, version)
+            if value is CACHE_MISS:
+                return default
+
+            if value is not _NOT_FOUND:
+                return self.served_value(value)
+
+        stored = await acall(
+            self.cache, 'get', key, default=_NOT_FOUND, version=version
+        )
+        value = await self.auntag(key, stored, version)
+        if value is _NOT_FOUND:
+            if stats is not None:
+                stats.incr('miss')
+
+            await self.afast_cache_set_missing([key], version=version)
+            return default
+
+        if stats is not None:
+            stats.incr('slow_hit')
+            self.record_backfill([value])
+
+        await self.afast_cache_set(key, stored, version=version, backfill=True)
+        return self.served_value(value)
+
+    async def aget_many(self, keys, version=None):
+        """
+        Fetch a bunch of keys from the cache, see get_many.
+        """
+        keys = list(keys)
+        if self.prefetch and version is None:
+            self.record_reads(keys)
+
+        return await self.afetch_many(keys, version=version)
+
+    async def afetch_many(self, keys, version=None):
+        """
+        Async version of fetch_many.
+        """
+        fast_found = await acall(
+            self.fast_cache, 'get_many', keys, version=version
+        )
+        if self.coherence:
+            fast_found = await self.afast_cache_unwrap(fast_found, version)
+
+        fast_found = await self.auntag_many(fast_found, version)
+        missing = [key for key in keys if key not in fast_found]
+        result = dict(
+            (key, value) for key, value in fast_found.items()
+            if value is not CACHE_MISS
+        )
+        if self.refresh_ahead is not None and result:
+            self.refresh_keys(list(result), version=version)
+
+        if missing and self.write_behind:
+            buffered = {}
+            for key in missing:
+                value = self.buffered_value(key, version)
+                if value is not _NOT_FOUND:
+                    buffered[key] = value
+
+            if buffered:
+                missing = [key for key in missing if key not in buffered]
+                result.update(
+                    (key, self.served_value(value))
+                    for key, value in buffered.items()
+                    if value is not CACHE_MISS
+                )
+
+        if missing:
+            stored = await acall(
+                self.cache, 'get_many', missing, version=version
+            )
+            found = await self.auntag_many(stored, version)
+            if found is not stored:
+                stored = dict((key, stored[key]) for key in found)
+
+            await self.afast_cache_set_many(
+                stored, version=version, backfill=True
+            )
+            await self.afast_cache_set_missing(
+                [key for key in missing if key not in found], version=version
+            )
+            result.update(
+                (key, self.served_value(value)) for key, value in found.items()
+            )
+
+        if self.stats is not None:
+            negative = len(
+                [value for value in fast_found.values() if value is CACHE_MISS]
+            )
+            self.stats.incr('fast_hit', len(fast_found) - negative)
+            self.stats.incr('negative_hit', negative)
+            if missing:
+                self.stats.incr('slow_hit', len(found))
+                self.stats.incr('miss', len(missing) - len(found))
+                self.record_backfill(list(found.values()))
+
+        return result
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+                   tags=None):
+        """
+        Set a value in both caches, see set.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        if tags:
+            value = (await self.atag_many({key: value}, tags, version))[key]
+
+        buffer = self.write_buffer()
+        if buffer is not None:
+            buffer.set(key, value, timeout, version)
+
+        else:
+            await acall(self.cache, 'set', key, value, timeout, version)
+            if self.coherence:
+                await self.abump_generations([key], version=version)
+
+        await self.afast_cache_set(key, value, timeout, version)
+
+    async def aset_many(self, data, timeout=DEFAULT_TIMEOUT, version=None,
+                        tags=None):
+        """
+        Set a bunch of values in both caches, see set_many.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        if tags:
+            data = await self.atag_many(data, tags, version)
+
+        buffer = self.write_buffer()
+        if buffer is not None:
+            for key, value in data.items():
+                buffer.set(key, value, timeout, version)
+
+            await self.afast_cache_set_many(data, timeout, version)
+            return []
+
+        failed_keys = await acall(
+            self.cache, 'set_many', data, timeout, version
+        ) or []
+        if failed_keys:
+            data = dict(
+                (key, value) for key, value in data.items()
+                if key not in failed_keys
+            )
+
+        if self.coherence:
+            await self.abump_generations(list(data), version=version)
+
+        await self.afast_cache_set_many(data, timeout, version)
+        return failed_keys
+
+    async def adelete(self, key, version=None):
+        """
+        Delete a key from both caches, failing silently.
+        """
+        await self.adelete_many([key], version=version)
+
+    async def adelete_many(self, keys, version=None):
+        """
+        Delete a bunch of values in both caches, failing silently.
+        """
+        keys = list(keys)
+        buffer = self.write_buffer()
+        if buffer is not None:
+            for key in keys:
+                buffer.delete(key, version)
+
+        else:
+            slow_keys = keys
+            if self.stale_timeout is not None:
+                slow_keys = keys + [self.stale_key(key) for key in keys]
+
+            await acall(self.cache, 'delete_many', slow_keys, version=version)
+            if self.coherence:
+                await self.abump_generations(keys, version=version)
+
+        await acall(self.fast_cache, 'delete_many', keys, version=version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+                   tags=None):
+        """
+        Set a value in the cache if the key does not already exist, see add.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        if tags:
+            value = (await self.atag_many({key: value}, tags, version))[key]
+
+        buffer = self.write_buffer()
+        if buffer is not None:
+            buffer.pop(key, version)
+
+        if await acall(self.cache, 'add', key, value, timeout, version):
+            if self.coherence:
+                await self.abump_generations([key], version=version)
+
+            await self.afast_cache_set(key, value, timeout, version)
+            return True
+
+        await acall(self.fast_cache, 'delete', key, version=version)
+        return False
+
+    async def ahas_key(self, key, version=None):
+        return await self.aget(
+            key, default=_NOT_FOUND, version=version
+        ) is not _NOT_FOUND
+
+
+class ShardedCacheAsyncMixin(object):
+    """
+    Native async API of ShardedCache, shards are awaited concurrently.
+    """
+
+    async def aget(self, key, default=None, version=None):
+        return await acall(
+            self.shard(key), 'get', key, default=default, version=version
+        )
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return await acall(
+            self.shard(key), 'set', key, value, timeout, version
+        )
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return await acall(
+            self.shard(key), 'add', key, value, timeout, version
+        )
+
+    async def adelete(self, key, version=None):
+        return await acall(self.shard(key), 'delete', key, version=version)
+
+    async def aget_many(self, keys, version=None):
+        result = {}
+        for found in await asyncio.gather(*[
+            acall(caches[alias], 'get_many', keys, version=version)
+            for alias, keys in self.ring.split(keys).items()
+        ]):
+            result.update(found)
+
+        return result
+
+    async def aset_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        groups = {}
+        for key, value in data.items():
+            groups.setdefault(self.ring.get_node(key), {})[key] = value
+
+        failed_keys = []
+        for failed in await asyncio.gather(*[
+            acall(caches[alias], 'set_many', data, timeout, version)
+            for alias, data in groups.items()
+        ]):
+            failed_keys.extend(failed or [])
+
+        return failed_keys
+
+    async def adelete_many(self, keys, version=None):
+        await asyncio.gather(*[
+            acall(caches[alias], 'delete_many', keys, version=version)
+            for alias, keys in self.ring.split(keys).items()
+        ])
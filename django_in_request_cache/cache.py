@@ -5,42 +5,162 @@
 
 from __future__ import unicode_literals, absolute_import
 
-import collections
+import copy
+import threading
 import time
 import warnings
+from collections import OrderedDict
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2.7
+    from collections import MutableMapping
+
+from django.conf import settings
 from django.core.cache import caches
 from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_finished
+from django.utils.module_loading import import_string
 from django_globals import globals as d_global
 
+from django_in_request_cache.context import current_request, current_scope
+try:
+    from django_in_request_cache.aio import CacheACacheAsyncMixin, \
+        InRequestCacheAsyncMixin
+except SyntaxError:  # Python 2.7
+    CacheACacheAsyncMixin = InRequestCacheAsyncMixin = object
+from django_in_request_cache.keys import CompiledKeysMixin
+from django_in_request_cache.refresh import RefreshAhead, \
+    ThreadPoolExecutor
+from django_in_request_cache.shards import ShardedCache
+from django_in_request_cache.stats import get_cache_stats, TimedCache
+from django_in_request_cache.store import approximate_size, CACHE_MISS, \
+    freeze, LRUStore, RequestStore, SharedLRUStore, _NOT_FOUND
+from django_in_request_cache.tags import tag_key, TagIndex, TaggedValue
+from django_in_request_cache.threads import is_shared
+from django_in_request_cache.tiers import Tier, TierChain
+from django_in_request_cache.write_behind import flush_writes, \
+    get_write_buffer, SET, WRITE_BUFFERS_ATTRIBUTE
+
+
+class CacheItem(object):
+    """
+    Value stored in request store with its expiration time.
+    """
+    __slots__ = ('value', 'expire_at')
+
+    def __init__(self, value, expire_at):
+        self.value = value
+        self.expire_at = expire_at
+
+    def __repr__(self):
+        return 'CacheItem(value=%r, expire_at=%r)' % (
+            self.value, self.expire_at
+        )
+
+
+class Flight(object):
+    """
+    One in-flight call shared by all threads asking for the same key.
+    """
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+STORE_TYPES = (dict, RequestStore, LRUStore, SharedLRUStore)
+
+# guards request store initialization in requests shared by worker threads
+_store_lock = threading.Lock()
 
-CacheItem = collections.namedtuple('CacheItem', ['value', 'expire_at'])
 
+def wall_clock(cache):
+    """
+    InRequestCache.clock reading time on every call
+    """
+    return time.time()
 
-class InRequestCache(BaseCache):
+
+class InRequestCache(InRequestCacheAsyncMixin, CompiledKeysMixin,
+                     BaseCache):
     cache_name = '_dinr_cache'
     max_timeout = None
 
     def __init__(self, location, params):
         super(InRequestCache, self).__init__(params)
+        self.setup_keys(params)
         self.cache_name = location or self.cache_name
+        self.tags_name = '%s_tags' % self.cache_name
         self.max_timeout = params.get('max_timeout', params.get('MAX_TIMEOUT'))
         if self.max_timeout is not None:
             self.max_timeout = int(self.max_timeout)
 
+        # request store is unbounded unless any of these is set
+        options = params.get('OPTIONS', {})
+        self.max_entries = params.get('max_entries', params.get(
+            'MAX_ENTRIES', options.get('MAX_ENTRIES')
+        ))
+        if self.max_entries is not None:
+            self.max_entries = int(self.max_entries)
+
+        self.max_bytes = params.get('max_bytes', params.get(
+            'MAX_BYTES', options.get('MAX_BYTES')
+        ))
+        if self.max_bytes is not None:
+            self.max_bytes = int(self.max_bytes)
+
+        # keys are known to be valid, skip validate_key when a key is built,
+        # keys served from key memo or KeyHandle are validated once anyway
+        self.trusted_keys = bool(params.get(
+            'trusted_keys', params.get('TRUSTED_KEYS', False)
+        ))
+        if self.trusted_keys:
+            self.compile_key = self.make_key
+
+        self.stats = None
+        if params.get('stats', params.get('STATS', False)):
+            self.stats = get_cache_stats(params.get(
+                'stats_name', params.get('STATS_NAME', self.cache_name)
+            ))
+
+        # read clock once per request, at request store initialization
+        self.request_clock = bool(params.get(
+            'request_clock', params.get('REQUEST_CLOCK', False)
+        ))
+        # values stored for at least request_timeout seconds never expire
+        # in request, they skip expiration time check
+        self.request_timeout = params.get(
+            'request_timeout', params.get('REQUEST_TIMEOUT')
+        )
+        if self.request_timeout is not None:
+            self.request_timeout = int(self.request_timeout)
+
+        if not self.request_clock:
+            self.clock = wall_clock
+
     @property
     def request(self):
         """
-        get current django request object
+        get current django request object (or request_cache_scope)
         :return:
         """
+        scope = current_scope()
+        if scope is not None:
+            return scope
+
         try:
             return d_global.request
         except AttributeError:
             warnings.warn(
-                'Missing django request object, check you have django_globals.'
-                'middleware.Global in middleware_classes and don\'t use this '
-                'cache out of django http request scope',
+                'Missing django request object, check you have '
+                'django_in_request_cache.middleware.RequestCacheMiddleware or '
+                'django_globals.middleware.Global in middleware_classes and '
+                'don\'t use this cache out of django http request scope or '
+                'request_cache_scope',
                 stacklevel=4
             )
 
@@ -50,10 +170,21 @@ class InRequestCache(BaseCache):
         get cache object stored in django request
         :return: cache (dict) instance
         """
-        request = self.request
+        request = current_scope()
+        if request is None:
+            request = self.request
+
         cache = getattr(request, self.cache_name, None)
-        if not isinstance(cache, collections.MutableMapping):
-            cache = self._initialize_cache(request)
+        # abstract class isinstance check is slow, try store types first
+        if type(cache) not in STORE_TYPES and \
+                not isinstance(cache, MutableMapping):
+            if not is_shared(request):
+                return self._initialize_cache(request)
+
+            with _store_lock:  # other worker thread may have created it
+                cache = getattr(request, self.cache_name, None)
+                if cache is None:
+                    cache = self._initialize_cache(request)
 
         return cache
 
@@ -62,56 +193,149 @@ class InRequestCache(BaseCache):
         Initialize cache in request object
         :return: cache (dict) instance
         """
-        cache = {}
+        if self.max_entries is not None or self.max_bytes is not None:
+            store_type = SharedLRUStore if is_shared(request) else LRUStore
+            cache = store_type(
+                max_entries=self.max_entries, max_bytes=self.max_bytes,
+                name='%s %s' % (self.cache_name, getattr(request, 'path', ''))
+            )
+            if self.request_clock:
+                cache.now = time.time()
+
+        elif self.request_clock or self.request_timeout is not None:
+            cache = RequestStore(time.time() if self.request_clock else None)
+
+        else:
+            cache = {}
+
         if request:
             setattr(request, self.cache_name, cache)
 
         return cache
 
-    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+    def clock(self, cache):
+        """
+        Current time for given request store, it is request start time
+        with request_clock.
+        """
+        return getattr(cache, 'now', None) or time.time()
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT, now=None):
         """
         Returns the timeout value usable by this backend based upon the provided
-        timeout.
+        timeout. None means the value never expires.
         """
         if timeout == DEFAULT_TIMEOUT:
             timeout = self.default_timeout
 
-        elif timeout <= 0:
+        elif timeout is not None and timeout <= 0:
             # ticket 21147 - avoid time.time() related precision issues
             timeout = -1
 
         if self.max_timeout is not None:
-            timeout = min(timeout, self.max_timeout)
+            timeout = self.max_timeout if timeout is None else min(
+                timeout, self.max_timeout
+            )
+
+        if timeout is None or (self.request_timeout is not None and
+                               timeout >= self.request_timeout):
+            return None
 
-        return time.time() + timeout
+        return (time.time() if now is None else now) + timeout
 
-    def cache_key(self, key, version=None):
+    def store_item(self, cache, key, value, timeout):
         """
-        Constructs and validate the key used by all other methods.
+        Store value in request store, it registers expiration time of
+        RequestStore values.
         """
-        key = self.make_key(key, version=version)
-        self.validate_key(key)
-        return key
+        now = self.clock(cache)
+        expire_at = self.get_backend_timeout(timeout, now)
+        cache[key] = CacheItem(value, expire_at)
+        if expire_at is not None and type(cache) is RequestStore:
+            cache.expire(key, expire_at, now)
 
-    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=None):
         """
         Set a value in the cache. If timeout is given, that timeout will be
         used for the key; otherwise the default cache timeout will be used.
+        Tagged keys are deleted by invalidate_tags.
         """
         key = self.cache_key(key, version=version)
-        expiration_time = self.get_backend_timeout(timeout)
-        self.cache[key] = CacheItem(value, expiration_time)
+        cache = self.cache
+        if type(cache) is dict:
+            cache[key] = CacheItem(value, self.get_backend_timeout(timeout))
+
+        else:
+            self.store_item(cache, key, value, timeout)
+
+        if tags:
+            self.tag_keys([key], tags)
+
+        else:
+            self.untag_keys([key])
+
+    def tag_index(self, create=False):
+        """
+        get tag index of current request
+        :return: TagIndex or None
+        """
+        request = current_scope()
+        if request is None:
+            request = self.request
+
+        index = getattr(request, self.tags_name, None)
+        if index is None and create:
+            index = TagIndex()
+            if request is not None:
+                setattr(request, self.tags_name, index)
+
+        return index
+
+    def tag_keys(self, cache_keys, tags):
+        """
+        Add cache keys to tag index of current request.
+        """
+        self.tag_index(create=True).add(cache_keys, tags)
+
+    def untag_keys(self, cache_keys):
+        """
+        Drop overwritten or deleted cache keys from tag index.
+        """
+        index = getattr(current_request(), self.tags_name, None)
+        if index:
+            index.discard(cache_keys)
+
+    def invalidate_tags(self, tags):
+        """
+        Delete all keys stored with any of the tags.
+        """
+        index = self.tag_index()
+        if not index:
+            return
+
+        cache = self.cache
+        for tag in tags:
+            for key in index.pop(tag):
+                cache.pop(key, None)
 
     def get(self, key, default=None, version=None):
         """
         Fetch a given key from the cache. If the key does not exist, return
         default, which itself defaults to None.
         """
-        key = self.cache_key(key, version=version)
-        item = self.cache.get(key)
-        if isinstance(item, CacheItem) and time.time() < item.expire_at:
+        cache = self.cache
+        item = cache.get(self.cache_key(key, version=version))
+        if item is not None and (item.expire_at is None or
+                                 self.clock(cache) < item.expire_at):
+            if self.stats is not None:
+                self.stats.incr('hit')
+
             return item.value
 
+        if self.stats is not None:
+            self.stats.incr('miss')
+
         return default
 
     def delete(self, key, version=None):
@@ -124,13 +348,88 @@ class InRequestCache(BaseCache):
         except KeyError:
             pass  # delete method fails silently.
 
+        self.untag_keys([key])
+
+    def get_many(self, keys, version=None):
+        """
+        Fetch a bunch of keys from the cache. Request cache is resolved and
+        clock is read only once for all keys.
+
+        Returns a dict mapping each key in keys to its value. If the given
+        key is missing or expired, it will be missing from the response dict.
+        """
+        if self.stats is not None:
+            keys = list(keys)
+
+        cache = self.cache
+        now = self.clock(cache)
+        result = {}
+        for key in keys:
+            item = cache.get(self.cache_key(key, version=version))
+            if item is not None and (item.expire_at is None or
+                                     now < item.expire_at):
+                result[key] = item.value
+
+        if self.stats is not None:
+            self.stats.incr('hit', len(result))
+            self.stats.incr('miss', len(keys) - len(result))
+
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None,
+                 tags=None):
+        """
+        Set a bunch of values in the cache at once from a dict of key/value
+        pairs. All values share the same expiration time.
+
+        Returns a list of keys that failed insertion (always empty).
+        """
+        cache = self.cache
+        cache_keys = [self.cache_key(key, version=version) for key in data]
+        if tags:
+            self.tag_keys(cache_keys, tags)
+
+        else:
+            self.untag_keys(cache_keys)
+
+        if type(cache) is not dict:
+            for key, value in data.items():
+                self.store_item(
+                    cache, self.cache_key(key, version=version), value, timeout
+                )
+
+            return []
+
+        expiration_time = self.get_backend_timeout(timeout)
+        for key, value in data.items():
+            cache[self.cache_key(key, version=version)] = CacheItem(
+                value, expiration_time
+            )
+
+        return []
+
+    def delete_many(self, keys, version=None):
+        """
+        Delete a bunch of values in the cache at once, failing silently.
+        """
+        cache = self.cache
+        cache_keys = [self.cache_key(key, version=version) for key in keys]
+        for key in cache_keys:
+            cache.pop(key, None)
+
+        self.untag_keys(cache_keys)
+
     def clear(self):
         """
         Remove *all* values from the cache at once.
         """
-        self._initialize_cache(self.request)
+        request = self.request
+        self._initialize_cache(request)
+        if getattr(request, self.tags_name, None):
+            setattr(request, self.tags_name, TagIndex())
 
-    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=None):
         """
         Set a value in the cache if the key does not already exist. If
         timeout is given, that timeout will be used for the key; otherwise
@@ -139,7 +438,7 @@ class InRequestCache(BaseCache):
         Returns True if the value was stored, False otherwise.
         """
         if not self.has_key(key, version):
-            self.set(key, value, timeout, version)
+            self.set(key, value, timeout, version, tags)
             return True
 
         return False
@@ -154,121 +453,1476 @@ class InRequestCache(BaseCache):
 
         return super(InRequestCache, self).has_key(key, version)
 
+    def live_item(self, cache, cache_key):
+        """
+        get item of the key from request store unless it has expired
+        :return: CacheItem or None
+        """
+        item = cache.get(cache_key)
+        if item is not None and (item.expire_at is None or
+                                 self.clock(cache) < item.expire_at):
+            return item
+
+        return None
+
+    def incr(self, key, delta=1, version=None):
+        """
+        Add delta to value in the cache, with one request store lookup. If
+        the key does not exist, raise a ValueError exception.
+        """
+        cache_key = self.cache_key(key, version=version)
+        item = self.live_item(self.cache, cache_key)
+        if item is None:
+            raise ValueError("Key '%s' not found" % key)
+
+        item.value = item.value + delta
+        return item.value
+
+    def decr(self, key, delta=1, version=None):
+        """
+        Subtract delta from value in the cache. If the key does not exist,
+        raise a ValueError exception.
+        """
+        return self.incr(key, -delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Update the key's expiry time.
+
+        Returns True if successful or False if the key does not exist.
+        """
+        cache_key = self.cache_key(key, version=version)
+        cache = self.cache
+        item = self.live_item(cache, cache_key)
+        if item is None:
+            return False
+
+        if type(cache) is dict:
+            item.expire_at = self.get_backend_timeout(timeout)
+
+        else:  # expiration time is registered by RequestStore
+            self.store_item(cache, cache_key, item.value, timeout)
+
+        return True
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Fetch a given key from the cache. If the key does not exist, set it
+        to the default value (or result of default callable) with one
+        request store lookup and one write.
+
+        Return the value of the key stored or retrieved.
+        """
+        cache_key = self.cache_key(key, version=version)
+        cache = self.cache
+        item = self.live_item(cache, cache_key)
+        if item is not None:
+            if self.stats is not None:
+                self.stats.incr('hit')
+
+            return item.value
+
+        if self.stats is not None:
+            self.stats.incr('miss')
+
+        if callable(default):
+            default = default()
+
+        if default is not None:
+            if type(cache) is dict:
+                cache[cache_key] = CacheItem(
+                    default, self.get_backend_timeout(timeout)
+                )
+
+            else:
+                self.store_item(cache, cache_key, default, timeout)
+
+            self.untag_keys([cache_key])
+
+        return default
+
+
+# ObjectCache stores shared by all threads of the process, by location
+_object_stores = {}
+_object_locks = {}
+
 
-class CacheACache(BaseCache):
+class ObjectCache(InRequestCacheAsyncMixin, CompiledKeysMixin, BaseCache):
     """
-    Intended use case is to use fast (memory) cache to cache a "slower"
-    (but cross process) cache.
+    Process wide cache of live python objects, values are not pickled.
+    It is intended as CacheACache fast cache, slower cache value is
+    deserialized once per back population then.
+
+    SAFETY option protects cached objects against changes by callers:
+    'copy' - values are deep copied on set and get (default), deepcopy per
+    set and per get, it costs more than unpickling small values,
+    'freeze' - values are stored as read-only copies, see freeze, one
+    container walk per set, gets are free. Dicts are returned as
+    mappingproxy, lists as tuples and sets as frozensets,
+    'immutable' - values are stored and returned as they are, no cost.
     """
+    COPY = 'copy'
+    FREEZE = 'freeze'
+    IMMUTABLE = 'immutable'
 
     def __init__(self, location, params):
-        self.location = location  # isn't used right now
-        self.fast_cache_alias = params.get('fast_cache', params.get(
-            'FAST_CACHE'
-        ))
-        self.fast_cache_timeout = params.get(
-            'fast_cache_max_timeout', params.get('FAST_CACHE_MAX_TIMEOUT')
-        )
-        if self.fast_cache_timeout is None:
-            self.fast_cache_timeout = 30
+        super(ObjectCache, self).__init__(params)
+        self.setup_keys(params)
+        self.safety = params.get('safety', params.get('SAFETY', self.COPY))
+        if self.safety not in (self.COPY, self.FREEZE, self.IMMUTABLE):
+            raise ImproperlyConfigured(
+                'ObjectCache SAFETY must be one of copy, freeze or immutable, '
+                'not %r.' % self.safety
+            )
 
-        else:
-            self.fast_cache_timeout = int(self.fast_cache_timeout)
+        self._cache = _object_stores.setdefault(location, OrderedDict())
+        self._lock = _object_locks.setdefault(location, threading.Lock())
 
-        self.cache_alias = params.get('cache_to_cache', params.get(
-            'CACHE_TO_CACHE'
-        ))
-        super(CacheACache, self).__init__(params)
-        if self.fast_cache_timeout > 30:
-            warnings.warn(
-                'fast_cache_timeout should be low, because we don\'t know for '
-                'how much longer the cached value should be stored.',
-                stacklevel=2
-            )
+    def stored_value(self, value):
+        """
+        Value kept in the cache, see SAFETY option.
+        """
+        if self.safety == self.COPY:
+            return copy.deepcopy(value)
 
-    @property
-    def fast_cache(self):
+        if self.safety == self.FREEZE:
+            return freeze(value)
+
+        return value
+
+    def returned_value(self, value):
         """
-        It get faster cache backend
-        :return: BaseCache
+        Value returned from the cache, see SAFETY option.
         """
-        return caches[self.fast_cache_alias]
+        if self.safety == self.COPY:
+            return copy.deepcopy(value)
 
-    @property
-    def cache(self):
+        return value
+
+    def served_value(self, value):
         """
-        It get slower cache backend
-        :return: BaseCache
+        Value read from other cache as get of this cache returns it, frozen
+        with 'freeze' safety. CacheACache returns the same types from its
+        fast cache and its slower cache then.
         """
-        return caches[self.cache_alias]
+        if self.safety == self.FREEZE:
+            return freeze(value)
 
-    def fast_cache_set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return value
+
+    def _get(self, key, now):
         """
-        Set a value in the cache. If timeout is given, that timeout will be
-        used for the key; otherwise the default cache timeout will be used.
+        get live item of the key and mark it as most recently used, caller
+        holds the lock
+        :return: CacheItem or None
         """
-        if timeout == DEFAULT_TIMEOUT:
-            timeout = self.fast_cache_timeout
+        item = self._cache.pop(key, None)
+        if item is None:
+            return None
 
-        else:
-            timeout = min(self.fast_cache_timeout, timeout)
+        if item.expire_at is not None and item.expire_at <= now:
+            return None
+
+        self._cache[key] = item
+        return item
 
-        self.fast_cache.set(key, value, timeout, version)
+    def _set(self, key, item):
+        """
+        Store item and evict least recently used items over max_entries,
+        caller holds the lock
+        """
+        cache = self._cache
+        cache.pop(key, None)
+        cache[key] = item
+        while len(cache) > self._max_entries:
+            cache.popitem(last=False)
 
     def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
         """
         Set a value in the cache. If timeout is given, that timeout will be
         used for the key; otherwise the default cache timeout will be used.
         """
-        if timeout == DEFAULT_TIMEOUT:
-            timeout = self.default_timeout
-
-        self.cache.set(key, value, timeout, version)
-        self.fast_cache_set(key, value, timeout, version)
+        key = self.cache_key(key, version=version)
+        item = CacheItem(
+            self.stored_value(value), self.get_backend_timeout(timeout)
+        )
+        with self._lock:
+            self._set(key, item)
 
     def get(self, key, default=None, version=None):
         """
         Fetch a given key from the cache. If the key does not exist, return
         default, which itself defaults to None.
         """
-        value = self.fast_cache.get(key, default=None, version=version)
-        if value is not None:
-            return value
+        key = self.cache_key(key, version=version)
+        with self._lock:
+            item = self._get(key, time.time())
 
-        value = self.cache.get(key, default=None, version=version)
-        if value is not None:
-            self.fast_cache_set(key, value, version=version)
-            return value
+        if item is None:
+            return default
 
-        return default
+        return self.returned_value(item.value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Set a value in the cache if the key does not already exist.
+
+        Returns True if the value was stored, False otherwise.
+        """
+        key = self.cache_key(key, version=version)
+        item = CacheItem(
+            self.stored_value(value), self.get_backend_timeout(timeout)
+        )
+        with self._lock:
+            if self._get(key, time.time()) is not None:
+                return False
+
+            self._set(key, item)
+            return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Update the key's expiry time.
+
+        Returns True if successful or False if the key does not exist.
+        """
+        key = self.cache_key(key, version=version)
+        with self._lock:
+            item = self._get(key, time.time())
+            if item is None:
+                return False
+
+            item.expire_at = self.get_backend_timeout(timeout)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        """
+        Add delta to value in the cache. If the key does not exist, raise a
+        ValueError exception.
+        """
+        key = self.cache_key(key, version=version)
+        with self._lock:
+            item = self._get(key, time.time())
+            if item is None:
+                raise ValueError("Key '%s' not found" % key)
+
+            item.value = item.value + delta
+            return item.value
 
     def delete(self, key, version=None):
         """
         Delete a key from the cache, failing silently.
         """
-        self.cache.delete(key, version=version)
-        self.fast_cache.delete(key, version=version)
+        key = self.cache_key(key, version=version)
+        with self._lock:
+            self._cache.pop(key, None)
 
-    def clear(self):
+    def has_key(self, key, version=None):
         """
-        Remove *all* values from the cache at once.
+        Returns True if the key is in the cache and has not expired.
         """
-        self.cache.clear()
-        self.fast_cache.clear()
+        key = self.cache_key(key, version=version)
+        with self._lock:
+            return self._get(key, time.time()) is not None
 
-    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+    def get_many(self, keys, version=None):
         """
-        Set a value in the cache if the key does not already exist. If
-        timeout is given, that timeout will be used for the key; otherwise
-        the default cache timeout will be used.
+        Fetch a bunch of keys from the cache, under one lock.
+        """
+        cache_keys = [
+            (key, self.cache_key(key, version=version)) for key in keys
+        ]
+        now = time.time()
+        with self._lock:
+            items = [
+                (key, self._get(cache_key, now))
+                for key, cache_key in cache_keys
+            ]
 
-        Returns True if the value was stored, False otherwise.
+        return dict(
+            (key, self.returned_value(item.value))
+            for key, item in items if item is not None
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
         """
-        if timeout == DEFAULT_TIMEOUT:
-            timeout = self.default_timeout
+        Set a bunch of values in the cache at once, under one lock.
+
+        Returns a list of keys that failed insertion (always empty).
+        """
+        expire_at = self.get_backend_timeout(timeout)
+        items = [
+            (self.cache_key(key, version=version),
+             CacheItem(self.stored_value(value), expire_at))
+            for key, value in data.items()
+        ]
+        with self._lock:
+            for key, item in items:
+                self._set(key, item)
+
+        return []
+
+    def delete_many(self, keys, version=None):
+        """
+        Delete a bunch of values in the cache at once, failing silently.
+        """
+        keys = [self.cache_key(key, version=version) for key in keys]
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def clear(self):
+        """
+        Remove *all* values from the cache at once.
+        """
+        with self._lock:
+            self._cache.clear()
+
+
+def is_request_scoped(alias):
+    """
+    Check cache alias is configured with InRequestCache backend, without
+    creating the cache.
+    :return: True if entries of the cache live until the end of request
+    """
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    try:
+        return issubclass(import_string(backend), InRequestCache)
+    except (ImportError, TypeError):
+        return False
 
-        if self.cache.add(key, value, timeout, version):
-            self.fast_cache_set(key, value, timeout, version)
-            return True
 
+class CacheACache(CacheACacheAsyncMixin, BaseCache):
+    """
+    Intended use case is to use fast (memory) cache to cache a "slower"
+    (but cross process) cache.
+    """
+    lock_backoff = 0.05  # first wait for a lock holder, in seconds
+    lock_max_backoff = 1
+
+    # in-flight get_or_set calls shared by all threads of the process,
+    # django creates cache backend instance per thread.
+    _flights = {}
+    _flights_lock = threading.Lock()
+
+    # namespaces seen by the process, their generations are fetched at once
+    _namespaces = {}  # slower cache alias -> namespaces seen by process
+    max_namespaces = 256
+    # memos of generations and tag stamps out of request scope,
+    # (attribute, slower cache alias) -> (expire at, memo)
+    _process_memos = {}
+    generations_attribute = '_dinr_generations'
+    tag_stamps_attribute = '_dinr_tag_stamps'
+    reads_attribute = '_dinr_reads'
+    write_buffer_attribute = WRITE_BUFFERS_ATTRIBUTE
+
+    def __init__(self, location, params):
+        self.location = location
+        self.fast_cache_alias = params.get('fast_cache', params.get(
+            'FAST_CACHE'
+        ))
+        self.fast_cache_timeout = params.get(
+            'fast_cache_max_timeout', params.get('FAST_CACHE_MAX_TIMEOUT')
+        )
+        if self.fast_cache_timeout is None:
+            self.fast_cache_timeout = 30
+
+        else:
+            self.fast_cache_timeout = int(self.fast_cache_timeout)
+
+        self.cache_alias = params.get('cache_to_cache', params.get(
+            'CACHE_TO_CACHE'
+        ))
+        # TIERS option replaces FAST_CACHE and CACHE_TO_CACHE, the last tier
+        # is the slower cache, faster ones are chained, see TierChain
+        self.tier_chain = None
+        tiers = params.get('tiers', params.get('TIERS'))
+        if tiers:
+            if len(tiers) < 2:
+                raise ImproperlyConfigured(
+                    'CacheACache TIERS option needs at least two caches.'
+                )
+
+            tiers = [
+                Tier.from_config(tier, self.fast_cache_timeout)
+                for tier in tiers
+            ]
+            self.tier_chain = TierChain(tiers[:-1])
+            self.fast_cache_alias = '+'.join(
+                tier.alias for tier in tiers[:-1]
+            )
+            self.fast_cache_timeout = max(
+                tier.max_timeout for tier in tiers[:-1]
+            )
+            self.cache_alias = tiers[-1].alias
+
+        # SHARDS option replaces the slower cache with several caches, keys
+        # are routed to them by consistent hashing, see ShardedCache
+        self.shards = None
+        shards = params.get('shards', params.get('SHARDS'))
+        if shards:
+            self.shards = ShardedCache(
+                shards,
+                replicas=int(params.get('shard_replicas', params.get(
+                    'SHARD_REPLICAS', 100
+                ))),
+                workers=params.get('shard_workers', params.get(
+                    'SHARD_WORKERS'
+                )),
+            )
+            self.cache_alias = ','.join(shards)
+
+        # if set then keys missing in slower cache are cached in fast cache
+        self.negative_timeout = params.get(
+            'negative_timeout', params.get('NEGATIVE_TIMEOUT')
+        )
+        if self.negative_timeout is not None:
+            self.negative_timeout = int(self.negative_timeout)
+
+        # get_or_set stampede protection, see get_or_set
+        self.single_flight = bool(params.get(
+            'single_flight', params.get('SINGLE_FLIGHT', False)
+        ))
+        self.lock_timeout = int(params.get(
+            'lock_timeout', params.get('LOCK_TIMEOUT', 10)
+        ))
+        self.stale_timeout = params.get(
+            'stale_timeout', params.get('STALE_TIMEOUT')
+        )
+        if self.stale_timeout is not None:
+            self.stale_timeout = int(self.stale_timeout)
+
+        # name used by statistics and prefetch
+        self.name = location or '%s+%s' % (
+            self.fast_cache_alias, self.cache_alias
+        )
+
+        # per tier hit/miss counters and latency histograms
+        self.stats = None
+        self._timed_caches = {}
+        if params.get('stats', params.get('STATS', False)):
+            self.stats = get_cache_stats(params.get(
+                'stats_name', params.get('STATS_NAME', self.name)
+            ))
+
+        # record keys read in request for CachePrefetchMiddleware
+        self.prefetch = bool(params.get(
+            'prefetch', params.get('PREFETCH', False)
+        ))
+
+        # slower cache writes are queued and written at the end of request
+        self.write_behind = bool(params.get(
+            'write_behind', params.get('WRITE_BEHIND', False)
+        ))
+        if self.write_behind:
+            request_finished.connect(
+                flush_writes, dispatch_uid='django_in_request_cache.flush'
+            )
+
+        # keys read close to fast cache expiration are re-read in background
+        self.refresh_ahead = None
+        refresh_ahead = params.get(
+            'refresh_ahead', params.get('REFRESH_AHEAD')
+        )
+        if self.tier_chain is None:
+            fast_aliases = [self.fast_cache_alias]
+
+        else:
+            fast_aliases = [tier.alias for tier in self.tier_chain.tiers]
+
+        if refresh_ahead and ThreadPoolExecutor is None:
+            warnings.warn(
+                'REFRESH_AHEAD requires concurrent.futures module.',
+                stacklevel=2
+            )
+
+        elif refresh_ahead and any(map(is_request_scoped, fast_aliases)):
+            # refresh threads run out of request, they would write to
+            # a throwaway request store
+            warnings.warn(
+                'REFRESH_AHEAD is disabled, it can\'t refresh request scoped '
+                'fast cache %s.' % self.fast_cache_alias,
+                stacklevel=2
+            )
+
+        elif refresh_ahead:
+            self.refresh_ahead = RefreshAhead(
+                self, float(refresh_ahead),
+                workers=int(params.get(
+                    'refresh_workers', params.get('REFRESH_WORKERS', 2)
+                )),
+                max_pending=int(params.get('refresh_max_pending', params.get(
+                    'REFRESH_MAX_PENDING', 16
+                ))),
+            )
+
+        # fast cache entries are tagged with key namespace generation,
+        # kept in slower cache, see get_generations
+        self.coherence = bool(params.get(
+            'coherence', params.get('COHERENCE', False)
+        ))
+        self.namespace_separator = params.get(
+            'namespace_separator', params.get('NAMESPACE_SEPARATOR', ':')
+        )
+        # generations and tag stamps are memoized this long out of request
+        # scope (celery tasks etc.), never longer than fast cache timeout
+        self.process_memo_timeout = min(float(params.get(
+            'process_memo_timeout', params.get('PROCESS_MEMO_TIMEOUT', 1)
+        )), self.fast_cache_timeout)
+
+        super(CacheACache, self).__init__(params)
+        if self.fast_cache_timeout > 30 and not self.coherence:
+            warnings.warn(
+                'fast_cache_timeout should be low, because we don\'t know for '
+                'how much longer the cached value should be stored.',
+                stacklevel=2
+            )
+
+    @property
+    def fast_cache(self):
+        """
+        It get faster cache backend
+        :return: BaseCache
+        """
+        cache = self.tier_chain
+        if cache is None:
+            cache = caches[self.fast_cache_alias]
+
+        if self.stats is None:
+            return cache
+
+        return self._timed_cache(cache, 'fast')
+
+    @property
+    def cache(self):
+        """
+        It get slower cache backend
+        :return: BaseCache
+        """
+        cache = self.shards
+        if cache is None:
+            cache = caches[self.cache_alias]
+
+        if self.stats is None:
+            return cache
+
+        return self._timed_cache(cache, 'slow')
+
+    def _timed_cache(self, cache, tier):
+        """
+        Wrap cache backend to record latency of its calls.
+        :return: TimedCache
+        """
+        timed_cache = self._timed_caches.get(tier)
+        if timed_cache is None or timed_cache.cache is not cache:
+            timed_cache = TimedCache(cache, self.stats, tier)
+            self._timed_caches[tier] = timed_cache
+
+        return timed_cache
+
+    def record_backfill(self, values):
+        """
+        Record values back populated from slower cache to fast cache.
+        """
+        self.stats.incr('backfill', len(values))
+        self.stats.incr('slow_bytes', sum(
+            approximate_size(value) for value in values
+        ))
+
+    def namespace(self, key):
+        """
+        Key namespace is key part before namespace_separator, keys without
+        separator share '' namespace.
+        """
+        namespace, separator, _ = key.partition(self.namespace_separator)
+        return namespace if separator else ''
+
+    def generation_key(self, namespace):
+        """
+        Slower cache key of namespace generation.
+        """
+        return 'dinr-generation:%s' % namespace
+
+    def new_generation(self):
+        """
+        Generation of namespace missing in slower cache, it differs from
+        any previous generation.
+        """
+        return int(time.time() * 1000000)
+
+    def request_memo(self, attribute):
+        """
+        get dict memoized in current request for slower cache of this
+        cache, generations and tag stamps are stored there. Out of request
+        the dict is memoized by the process for process_memo_timeout.
+        :return: dict
+        """
+        request = current_request()
+        if request is None:
+            return self.process_memo(attribute)
+
+        memos = getattr(request, attribute, None)
+        if memos is None:
+            memos = {}
+            setattr(request, attribute, memos)
+
+        memo = memos.get(self.cache_alias)
+        if memo is None:
+            memo = memos.setdefault(self.cache_alias, {})
+
+        return memo
+
+    def process_memo(self, attribute):
+        """
+        get dict memoized by the process for slower cache of this cache,
+        it is used out of request scope, see request_memo.
+        :return: dict
+        """
+        if self.process_memo_timeout <= 0:
+            return {}
+
+        key = (attribute, self.cache_alias)
+        now = time.time()
+        memo = self._process_memos.get(key)
+        if memo is None or memo[0] <= now:
+            memo = self._process_memos[key] = (
+                now + self.process_memo_timeout, {}
+            )
+
+        return memo[1]
+
+    def get_generations(self, keys, version=None):
+        """
+        get current generations of keys namespaces. Generations are fetched
+        from slower cache once per request, generations of all namespaces
+        seen by the process are fetched together in one call.
+        :return: dict namespace -> generation
+        """
+        generations = self.request_memo(self.generations_attribute)
+        namespaces = set(self.namespace(key) for key in keys)
+        missing = namespaces.difference(generations)
+        if missing:
+            seen = self._namespaces.setdefault(self.cache_alias, set())
+            if len(seen) < self.max_namespaces:
+                seen.update(missing)
+
+            missing.update(seen.difference(generations))
+            generation_keys = dict(
+                (self.generation_key(namespace), namespace)
+                for namespace in missing
+            )
+            found = self.cache.get_many(list(generation_keys), version=version)
+            new = {}
+            for generation_key, namespace in generation_keys.items():
+                generation = found.get(generation_key)
+                if generation is None:
+                    generation = new[generation_key] = self.new_generation()
+
+                generations[namespace] = generation
+
+            if new:
+                self.cache.set_many(new, None, version)
+
+        return generations
+
+    def bump_generations(self, keys, version=None):
+        """
+        Invalidate fast cache entries of keys namespaces in all processes.
+        """
+        generations = self.get_generations(keys, version=version)
+        for namespace in set(self.namespace(key) for key in keys):
+            generation_key = self.generation_key(namespace)
+            try:
+                generation = self.cache.incr(generation_key, version=version)
+            except ValueError:  # generation is missing in slower cache
+                generation = self.new_generation()
+                self.cache.set(generation_key, generation, None, version)
+
+            generations[namespace] = generation
+
+    def tag_stamps_memo(self, version=None):
+        """
+        get memoized stamps of tags of given key version, see request_memo.
+        :return: dict tag -> stamp
+        """
+        memo = self.request_memo(self.tag_stamps_attribute)
+        stamps = memo.get(version)
+        if stamps is None:
+            stamps = memo.setdefault(version, {})
+
+        return stamps
+
+    def get_tag_stamps(self, tags, version=None):
+        """
+        get current stamps of tags. Stamps are fetched from slower cache in
+        one call, once per request and key version.
+        :return: dict tag -> stamp
+        """
+        stamps = self.tag_stamps_memo(version)
+
+        missing = [tag for tag in tags if tag not in stamps]
+        if missing:
+            tag_keys = dict((tag_key(tag), tag) for tag in missing)
+            found = self.cache.get_many(list(tag_keys), version=version)
+            new = {}
+            for key, tag in tag_keys.items():
+                stamp = found.get(key)
+                if stamp is None:
+                    # values of evicted stamp can't be validated any more
+                    stamp = new[key] = self.new_generation()
+
+                stamps[tag] = stamp
+
+            if new:
+                self.cache.set_many(new, None, version)
+
+        return stamps
+
+    def tag_value(self, value, tags, version=None):
+        """
+        Wrap value with current stamps of its tags.
+        :return: TaggedValue
+        """
+        stamps = self.get_tag_stamps(tags, version=version)
+        return TaggedValue(value, dict((tag, stamps[tag]) for tag in tags))
+
+    def untag_many(self, data, version=None):
+        """
+        Unwrap tagged values, values with invalidated tags are dropped.
+        Stamps of all tags are checked at once.
+        :return: dict key -> value
+        """
+        tagged = [
+            (key, value) for key, value in data.items()
+            if type(value) is TaggedValue
+        ]
+        if not tagged:
+            return data
+
+        stamps = self.get_tag_stamps(
+            set(tag for _, value in tagged for tag in value.tags),
+            version=version
+        )
+        result = dict(data)
+        for key, value in tagged:
+            if all(stamps[tag] == stamp for tag, stamp in value.tags.items()):
+                result[key] = value.value
+
+            else:
+                del result[key]
+
+        return result
+
+    def untag(self, key, value, version=None):
+        """
+        Unwrap tagged value.
+        :return: value or _NOT_FOUND if its tags were invalidated
+        """
+        if type(value) is not TaggedValue:
+            return value
+
+        return self.untag_many({key: value}, version).get(key, _NOT_FOUND)
+
+    def invalidate_tags(self, tags, version=None):
+        """
+        Invalidate values stored with any of the tags in both caches, in all
+        processes. It costs one slower cache call per tag.
+        """
+        stamps = self.get_tag_stamps([], version=version)
+        for tag in tags:
+            key = tag_key(tag)
+            try:
+                stamp = self.cache.incr(key, version=version)
+            except ValueError:  # stamp is missing in slower cache
+                stamp = self.new_generation()
+                self.cache.set(key, stamp, None, version)
+
+            stamps[tag] = stamp
+
+    def fast_cache_wrap(self, data, version=None):
+        """
+        Tag fast cache values with their namespace generation.
+        :return: dict key -> (generation, value)
+        """
+        generations = self.get_generations(data, version=version)
+        return dict(
+            (key, (generations[self.namespace(key)], value))
+            for key, value in data.items()
+        )
+
+    def fast_cache_unwrap(self, data, version=None):
+        """
+        Drop fast cache values of old namespace generation.
+        :return: dict key -> value
+        """
+        generations = self.get_generations(data, version=version)
+        result = {}
+        for key, item in data.items():
+            if isinstance(item, tuple) and len(item) == 2 and \
+                    item[0] == generations[self.namespace(key)]:
+                result[key] = item[1]
+
+        return result
+
+    def fast_cache_set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+                       backfill=False):
+        """
+        Set a value in the cache. If timeout is given, that timeout will be
+        used for the key; otherwise the default cache timeout will be used.
+        Tiers with skip-on-miss policy aren't back populated (backfill).
+        """
+        timeout = self.get_fast_cache_timeout(timeout)
+        if self.refresh_ahead is not None:
+            self.refresh_ahead.record([key], timeout, version)
+
+        if self.coherence:
+            value = self.fast_cache_wrap({key: value}, version)[key]
+
+        if backfill and self.tier_chain is not None:
+            self.fast_cache.backfill_many({key: value}, timeout, version)
+
+        else:
+            self.fast_cache.set(key, value, timeout, version)
+
+    def fast_cache_set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None,
+                            backfill=False):
+        """
+        Set a bunch of values in the fast cache at once. Timeout is limited
+        the same way as in fast_cache_set.
+        """
+        if data:
+            timeout = self.get_fast_cache_timeout(timeout)
+            if self.refresh_ahead is not None:
+                self.refresh_ahead.record([
+                    key for key, value in data.items()
+                    if value is not CACHE_MISS
+                ], timeout, version)
+
+            if self.coherence:
+                data = self.fast_cache_wrap(data, version)
+
+            if backfill and self.tier_chain is not None:
+                self.fast_cache.backfill_many(data, timeout, version)
+
+            else:
+                self.fast_cache.set_many(data, timeout, version)
+
+    def fast_cache_set_missing(self, keys, version=None):
+        """
+        Mark keys missing in slower cache as missing in fast cache too, so
+        slower cache isn't asked for them again. Does nothing when
+        negative_timeout isn't set.
+        """
+        if self.negative_timeout is None or not keys:
+            return
+
+        self.fast_cache_set_many(
+            dict((key, CACHE_MISS) for key in keys), self.negative_timeout,
+            version, backfill=True
+        )
+
+    def get_fast_cache_timeout(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Returns timeout for fast cache, it is never longer than
+        fast_cache_timeout.
+        """
+        if timeout == DEFAULT_TIMEOUT or timeout is None:
+            return self.fast_cache_timeout
+
+        return min(self.fast_cache_timeout, timeout)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=None):
+        """
+        Set a value in the cache. If timeout is given, that timeout will be
+        used for the key; otherwise the default cache timeout will be used.
+        Value is invalidated by invalidate_tags of any of its tags.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        if tags:
+            value = self.tag_value(value, tags, version)
+
+        buffer = self.write_buffer()
+        if buffer is not None:
+            buffer.set(key, value, timeout, version)
+
+        else:
+            self.cache.set(key, value, timeout, version)
+            if self.coherence:
+                self.bump_generations([key], version=version)
+
+        self.fast_cache_set(key, value, timeout, version)
+
+    def write_buffer(self):
+        """
+        get write buffer of current request
+        :return: WriteBuffer or None without write_behind or out of request
+        """
+        if not self.write_behind:
+            return None
+
+        request = current_request()
+        if request is None:
+            return None
+
+        return get_write_buffer(self, request)
+
+    def served_value(self, value):
+        """
+        Value read from slower cache or write buffer as fast cache get
+        returns it, see ObjectCache.served_value.
+        """
+        served = getattr(self.fast_cache, 'served_value', None)
+        return value if served is None else served(value)
+
+    def buffered_value(self, key, version=None):
+        """
+        get value of the key queued by write_behind
+        :return: value, CACHE_MISS for deleted key or _NOT_FOUND
+        """
+        buffer = self.write_buffer()
+        if buffer is None:
+            return _NOT_FOUND
+
+        op = buffer.lookup(key, version)
+        if op is None:
+            return _NOT_FOUND
+
+        if op[0] != SET:
+            return CACHE_MISS
+
+        value = self.untag(key, op[1], version)
+        return CACHE_MISS if value is _NOT_FOUND else value
+
+    def refresh_keys(self, keys, version=None):
+        """
+        Schedule background refresh of fast cache hits close to their
+        expiration, keys with writes queued by write_behind are skipped.
+        """
+        refresh_ahead = self.refresh_ahead
+        for key in keys:
+            if refresh_ahead.due(key, version) and \
+                    self.buffered_value(key, version) is _NOT_FOUND:
+                refresh_ahead.schedule(key, version)
+
+    def refresh(self, key, version=None):
+        """
+        Re-read the key from slower cache to fast cache, it's called on
+        refresh ahead thread pool.
+        """
+        value = self.cache.get(key, default=_NOT_FOUND, version=version)
+        if self.stats is not None:
+            self.stats.incr('refresh')
+
+        if value is _NOT_FOUND:
+            self.fast_cache.delete(key, version=version)
+            self.fast_cache_set_missing([key], version=version)
+
+        else:
+            self.fast_cache_set(key, value, version=version, backfill=True)
+
+    def record_reads(self, keys):
+        """
+        Record keys read in current request, see CachePrefetchMiddleware.
+        """
+        request = current_request()
+        if request is None:
+            return
+
+        reads = getattr(request, self.reads_attribute, None)
+        if reads is None:
+            reads = {}
+            setattr(request, self.reads_attribute, reads)
+
+        reads.setdefault(self.name, set()).update(keys)
+
+    def get(self, key, default=None, version=None):
+        """
+        Fetch a given key from the cache. If the key does not exist, return
+        default, which itself defaults to None.
+        """
+        if self.prefetch and version is None:
+            self.record_reads([key])
+
+        stats = self.stats
+        value = self.fast_cache.get(key, default=_NOT_FOUND, version=version)
+        if self.coherence and value is not _NOT_FOUND:
+            value = self.fast_cache_unwrap({key: value}, version).get(
+                key, _NOT_FOUND
+            )
+
+        if type(value) is TaggedValue:
+            value = self.untag(key, value, version)
+
+        if value is CACHE_MISS:
+            if stats is not None:
+                stats.incr('negative_hit')
+
+            return default
+
+        if value is not _NOT_FOUND:
+            if stats is not None:
+                stats.incr('fast_hit')
+
+            if self.refresh_ahead is not None:
+                self.refresh_keys([key], version=version)
+
+            return value
+
+        if self.write_behind:
+            value = self.buffered_value(key, version)
+            if value is CACHE_MISS:
+                return default
+
+            if value is not _NOT_FOUND:
+                return self.served_value(value)
+
+        request = current_request()
+        if request is not None and is_shared(request):
+            # worker threads of the request missing the same key wait for
+            # one slower cache read
+            value = self._coalesce(
+                (id(request), self.cache_alias, key, version),
+                lambda: self.read_through(key, version)
+            )
+
+        else:
+            value = self.read_through(key, version)
+
+        return default if value is _NOT_FOUND else value
+
+    def read_through(self, key, version=None):
+        """
+        Read key missing in fast cache from slower cache and backfill it.
+        :return: value or _NOT_FOUND
+        """
+        stats = self.stats
+        stored = self.cache.get(key, default=_NOT_FOUND, version=version)
+        value = self.untag(key, stored, version)
+        if value is _NOT_FOUND:
+            if stats is not None:
+                stats.incr('miss')
+
+            self.fast_cache_set_missing([key], version=version)
+            return value
+
+        if stats is not None:
+            stats.incr('slow_hit')
+            self.record_backfill([value])
+
+        self.fast_cache_set(key, stored, version=version, backfill=True)
+        return self.served_value(value)
+
+    def delete(self, key, version=None):
+        """
+        Delete a key from the cache, failing silently.
+        """
+        buffer = self.write_buffer()
+        if buffer is not None:
+            buffer.delete(key, version)
+
+        elif self.stale_timeout is None:
+            self.cache.delete(key, version=version)
+
+        else:
+            self.cache.delete_many(
+                [key, self.stale_key(key)], version=version
+            )
+
+        if self.coherence and buffer is None:
+            self.bump_generations([key], version=version)
+
+        self.fast_cache.delete(key, version=version)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Fetch a given key from the cache. If the key does not exist, add the
+        key and set it to the default value. The default value can also be
+        any callable.
+
+        It costs at most one slower cache read and one slower cache add.
+        With single_flight enabled only one caller recomputes a missing
+        value, while holding a lock added to slower cache. Threads of the
+        same process wait for the result of that call. Other processes get
+        a stale copy (kept stale_timeout seconds longer than the value) or
+        wait with bounded backoff for the new value.
+
+        Return the value of the key stored or retrieved.
+        """
+        value = self.get(key, _NOT_FOUND, version=version)
+        if value is not _NOT_FOUND:
+            return value
+
+        if not self.single_flight:
+            if callable(default):
+                default = default()
+
+            if default is not None and not self.add(
+                    key, default, timeout=timeout, version=version):
+                # other writer won the race, return its value
+                return self.get(key, default, version=version)
+
+            return self.served_value(default)
+
+        return self.served_value(self._coalesce(
+            (self.cache_alias, key, version),
+            lambda: self._get_or_set_locked(key, default, timeout, version)
+        ))
+
+    def incr(self, key, delta=1, version=None):
+        """
+        Add delta to value in slower cache atomically, fast cache is
+        refreshed from the result. If the key does not exist, raise a
+        ValueError exception.
+        """
+        return self._incr('incr', key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        """
+        Subtract delta from value in slower cache atomically, see incr.
+        """
+        return self._incr('decr', key, delta, version)
+
+    def _incr(self, method, key, delta, version):
+        buffer = self.write_buffer()
+        if buffer is not None:
+            # incr is synchronous, write queued value of the key first
+            buffer.pop(key, version)
+
+        try:
+            value = getattr(self.cache, method)(key, delta, version=version)
+        except ValueError:
+            # key is missing in slower cache, drop possible stale copy
+            self.fast_cache.delete(key, version=version)
+            raise
+
+        if self.coherence:
+            self.bump_generations([key], version=version)
+
+        self.fast_cache_set(key, value, version=version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Update the key's expiry time in both caches, fast cache expiry time
+        is limited the same way as in fast_cache_set.
+
+        Returns True if successful or False if the key does not exist.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        buffer = self.write_buffer()
+        if buffer is not None:
+            # touch is synchronous, write queued value of the key first
+            buffer.pop(key, version)
+
+        if not self.cache.touch(key, timeout, version):
+            self.fast_cache.delete(key, version=version)
+            return False
+
+        if self.stale_timeout is not None and timeout is not None:
+            self.cache.touch(
+                self.stale_key(key), timeout + self.stale_timeout, version
+            )
+
+        fast_cache = self.fast_cache
+        fast_timeout = self.get_fast_cache_timeout(timeout)
+        if self.negative_timeout is not None and fast_cache.get(
+                key, version=version) is CACHE_MISS:
+            # negative entry is outdated, the key exists
+            fast_cache.delete(key, version=version)
+            return True
+
+        try:
+            fast_cache.touch(key, fast_timeout, version)
+        except NotImplementedError:
+            fast_cache.delete(key, version=version)
+            return True
+
+        if self.refresh_ahead is not None:
+            self.refresh_ahead.record([key], fast_timeout, version)
+
+        return True
+
+    def lock_key(self, key):
+        """
+        Slower cache key of get_or_set recompute lock.
+        """
+        return '%s:lock' % key
+
+    def stale_key(self, key):
+        """
+        Slower cache key of value copy served while the value is recomputed.
+        """
+        return '%s:stale' % key
+
+    def _coalesce(self, flight_key, func):
+        """
+        Call func once for all threads waiting for the same flight_key.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[flight_key]
+
+            flight.event.set()
+
+    def _get_or_set_locked(self, key, default, timeout, version):
+        """
+        Recompute value while holding slower cache lock or wait for other
+        process to do so.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        lock_key = self.lock_key(key)
+        deadline = time.time() + self.lock_timeout
+        delay = self.lock_backoff
+        stale_checked = self.stale_timeout is None
+        while True:
+            if self.cache.add(lock_key, 1, self.lock_timeout, version):
+                try:
+                    value = default() if callable(default) else default
+                    self._set_with_stale(key, value, timeout, version)
+                finally:
+                    self.cache.delete(lock_key, version=version)
+
+                return value
+
+            if not stale_checked:
+                stale_checked = True
+                value = self.cache.get(
+                    self.stale_key(key), _NOT_FOUND, version=version
+                )
+                if type(value) is TaggedValue:
+                    value = value.value
+
+                if value is not _NOT_FOUND:
+                    return value
+
+            if time.time() >= deadline:
+                # lock holder is too slow, don't wait for it any longer
+                value = default() if callable(default) else default
+                if not self.add(key, value, timeout=timeout, version=version):
+                    return self.get(key, value, version=version)
+
+                return value
+
+            time.sleep(delay)
+            delay = min(delay * 2, self.lock_max_backoff)
+            stored = self.cache.get(key, _NOT_FOUND, version=version)
+            value = self.untag(key, stored, version)
+            if value is not _NOT_FOUND:
+                self.fast_cache_set(key, stored, timeout, version, True)
+                return value
+
+    def _set_with_stale(self, key, value, timeout, version):
+        """
+        Set value to both caches and its stale copy to slower cache.
+        """
+        self.cache.set(key, value, timeout, version)
+        if self.stale_timeout is not None and timeout is not None:
+            self.cache.set(
+                self.stale_key(key), value, timeout + self.stale_timeout,
+                version
+            )
+
+        if self.coherence:
+            self.bump_generations([key], version=version)
+
+        self.fast_cache_set(key, value, timeout, version)
+
+    def get_many(self, keys, version=None):
+        """
+        Fetch a bunch of keys from the cache. Keys missing in fast cache are
+        fetched from slower cache in one call and fast cache is back
+        populated in one call as well.
+
+        Returns a dict mapping each key in keys to its value. If the given
+        key is missing, it will be missing from the response dict.
+        """
+        keys = list(keys)
+        if self.prefetch and version is None:
+            self.record_reads(keys)
+
+        return self.fetch_many(keys, version=version)
+
+    def fetch_many(self, keys, version=None):
+        """
+        get_many without reads recording, it is used to prefetch keys.
+        """
+        fast_found = self.fast_cache.get_many(keys, version=version)
+        if self.coherence:
+            fast_found = self.fast_cache_unwrap(fast_found, version)
+
+        fast_found = self.untag_many(fast_found, version)
+        missing = [key for key in keys if key not in fast_found]
+        result = dict(
+            (key, value) for key, value in fast_found.items()
+            if value is not CACHE_MISS
+        )
+        if self.refresh_ahead is not None and result:
+            self.refresh_keys(list(result), version=version)
+
+        if missing and self.write_behind:
+            buffered = {}
+            for key in missing:
+                value = self.buffered_value(key, version)
+                if value is not _NOT_FOUND:
+                    buffered[key] = value
+
+            if buffered:
+                missing = [key for key in missing if key not in buffered]
+                result.update(
+                    (key, self.served_value(value))
+                    for key, value in buffered.items()
+                    if value is not CACHE_MISS
+                )
+
+        if missing:
+            stored = self.cache.get_many(missing, version=version)
+            found = self.untag_many(stored, version)
+            if found is not stored:
+                stored = dict((key, stored[key]) for key in found)
+
+            self.fast_cache_set_many(stored, version=version, backfill=True)
+            self.fast_cache_set_missing(
+                [key for key in missing if key not in found], version=version
+            )
+            result.update(
+                (key, self.served_value(value)) for key, value in found.items()
+            )
+
+        if self.stats is not None:
+            negative = len(
+                [value for value in fast_found.values() if value is CACHE_MISS]
+            )
+            self.stats.incr('fast_hit', len(fast_found) - negative)
+            self.stats.incr('negative_hit', negative)
+            if missing:
+                self.stats.incr('slow_hit', len(found))
+                self.stats.incr('miss', len(missing) - len(found))
+                self.record_backfill(list(found.values()))
+
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None,
+                 tags=None):
+        """
+        Set a bunch of values in both caches at once from a dict of key/value
+        pairs.
+
+        Returns a list of keys that failed insertion into slower cache.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        if tags:
+            data = dict(
+                (key, self.tag_value(value, tags, version))
+                for key, value in data.items()
+            )
+
+        buffer = self.write_buffer()
+        if buffer is not None:
+            for key, value in data.items():
+                buffer.set(key, value, timeout, version)
+
+            self.fast_cache_set_many(data, timeout, version)
+            return []
+
+        failed_keys = self.cache.set_many(data, timeout, version) or []
+        if failed_keys:
+            data = dict(
+                (key, value) for key, value in data.items()
+                if key not in failed_keys
+            )
+
+        if self.coherence:
+            self.bump_generations(list(data), version=version)
+
+        self.fast_cache_set_many(data, timeout, version)
+        return failed_keys
+
+    def delete_many(self, keys, version=None):
+        """
+        Delete a bunch of values in both caches at once, failing silently.
+        """
+        keys = list(keys)
+        buffer = self.write_buffer()
+        if buffer is not None:
+            for key in keys:
+                buffer.delete(key, version)
+
+        else:
+            self.cache.delete_many(keys, version=version)
+            if self.coherence:
+                self.bump_generations(keys, version=version)
+
+        self.fast_cache.delete_many(keys, version=version)
+
+    def clear(self):
+        """
+        Remove *all* values from the cache at once.
+        """
+        buffer = self.write_buffer()
+        if buffer is not None:
+            buffer.clear()
+
+        self.cache.clear()
+        self.fast_cache.clear()
+        for attribute in (self.generations_attribute,
+                          self.tag_stamps_attribute):
+            self._process_memos.pop((attribute, self.cache_alias), None)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=None):
+        """
+        Set a value in the cache if the key does not already exist. If
+        timeout is given, that timeout will be used for the key; otherwise
+        the default cache timeout will be used.
+
+        Returns True if the value was stored, False otherwise.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+
+        if tags:
+            value = self.tag_value(value, tags, version)
+
+        buffer = self.write_buffer()
+        if buffer is not None:
+            # add is synchronous, write queued value of the key first
+            buffer.pop(key, version)
+
+        if self.cache.add(key, value, timeout, version):
+            if self.coherence:
+                self.bump_generations([key], version=version)
+
+            self.fast_cache_set(key, value, timeout, version)
+            return True
+
+        # key exists in slower cache, drop possible negative entry
+        self.fast_cache.delete(key, version=version)
         return False
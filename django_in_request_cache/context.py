@@ -0,0 +1,108 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import threading
+from contextlib import contextmanager
+
+from django_globals import globals as d_global
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    ContextVar = None
+
+
+class LocalVar(object):
+    """
+    Thread local fallback of ContextVar for Python < 3.7
+    """
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.default = default
+        self.local = threading.local()
+
+    def get(self):
+        return getattr(self.local, 'value', self.default)
+
+    def set(self, value):
+        token = self.get()
+        self.local.value = value
+        return token
+
+    def reset(self, token):
+        self.local.value = token
+
+
+if ContextVar is not None:
+    _scope = ContextVar('django_in_request_cache_scope', default=None)
+
+else:
+    _scope = LocalVar('django_in_request_cache_scope')
+
+
+class RequestCacheScope(object):
+    """
+    Unit of work without django request object (celery task, management
+    command etc.), InRequestCache stores its data here.
+    """
+
+
+# get current scope (django request or RequestCacheScope) or None,
+# bound method directly, it is called on every InRequestCache access.
+current_scope = _scope.get
+
+
+def current_request():
+    """
+    get current scope or django_globals request, without any warning
+    :return: scope object or None
+    """
+    scope = _scope.get()
+    if scope is None:
+        scope = getattr(d_global, 'request', None)
+
+    return scope
+
+
+def enter_scope(scope):
+    """
+    Make scope current, InRequestCache stores its data in it.
+    :return: token for exit_scope
+    """
+    return _scope.set(scope)
+
+
+def exit_scope(token):
+    """
+    Restore scope which was current before enter_scope.
+    """
+    _scope.reset(token)
+
+
+@contextmanager
+def request_cache_scope(scope=None):
+    """
+    InRequestCache lives as long as this context manager, use it out of
+    django request (celery task, management command etc.)::
+
+        with request_cache_scope():
+            ...
+
+    :param scope: scope object, new RequestCacheScope by default
+    """
+    if scope is None:
+        scope = RequestCacheScope()
+
+    token = enter_scope(scope)
+    try:
+        yield scope
+    finally:
+        exit_scope(token)
+        # CacheACache writes queued in the scope
+        from django_in_request_cache.write_behind import flush_writes
+        flush_writes(request=scope)
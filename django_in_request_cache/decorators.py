@@ -0,0 +1,119 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import collections
+import functools
+import hashlib
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+MemoizeInfo = collections.namedtuple('MemoizeInfo', ['hits', 'misses'])
+
+_NOT_FOUND = object()
+
+
+def request_memoize(alias, key=None, timeout=DEFAULT_TIMEOUT,
+                    shared_alias=None, shared_timeout=DEFAULT_TIMEOUT):
+    """
+    Memoize function (or method) result for the rest of the request in
+    InRequestCache.
+
+    Results are stored in the request store directly under
+    (function, arguments) tuple, so there is no key formatting nor key
+    validation. Arguments must be hashable, call with unhashable arguments
+    isn't memoized. None results are memoized as well.
+
+    :param alias: InRequestCache alias
+    :param key: optional callable, it gets function arguments and returns
+        hashable key used instead of them
+    :param timeout: InRequestCache timeout
+    :param shared_alias: optional cross request cache alias (CacheACache
+        etc.), request misses are looked up there before function is called.
+        Key arguments repr is used to build the string key, use stable key
+        callable for methods.
+    :param shared_timeout: shared cache timeout
+    :return: decorator
+    """
+    def decorator(func):
+        name = '%s.%s' % (
+            func.__module__, getattr(func, '__qualname__', func.__name__)
+        )
+        stats = [0, 0]  # hits, misses
+
+        def shared_key(memo_key):
+            digest = hashlib.md5(repr(memo_key).encode('utf-8')).hexdigest()
+            return 'memoize:%s:%s' % (name, digest)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if key is not None:
+                memo_key = key(*args, **kwargs)
+            elif kwargs:
+                memo_key = (args, tuple(sorted(kwargs.items())))
+            else:
+                memo_key = args
+
+            cache = caches[alias]
+            store = cache.cache
+            store_key = (wrapper, memo_key)
+            try:
+                item = store.get(store_key)
+            except TypeError:  # unhashable arguments
+                return func(*args, **kwargs)
+
+            if item is not None and (item.expire_at is None or
+                                     cache.clock(store) < item.expire_at):
+                stats[0] += 1
+                return item.value
+
+            stats[1] += 1
+            value = _NOT_FOUND
+            if shared_alias is not None:
+                shared_cache = caches[shared_alias]
+                value = shared_cache.get(shared_key(memo_key), _NOT_FOUND)
+
+            if value is _NOT_FOUND:
+                value = func(*args, **kwargs)
+                if shared_alias is not None:
+                    shared_cache.set(
+                        shared_key(memo_key), value, shared_timeout
+                    )
+
+            cache.store_item(store, store_key, value, timeout)
+            return value
+
+        def cache_info():
+            """
+            :return: MemoizeInfo with hits and misses of this function
+            """
+            return MemoizeInfo(*stats)
+
+        wrapper.cache_info = cache_info
+        return wrapper
+
+    return decorator
+
+
+def prefetch_cache_keys(alias, keys):
+    """
+    Declare cache keys read by the view, CachePrefetchMiddleware fetches
+    them from CacheACache alias in one get_many before the view is called.
+
+    :param alias: CacheACache alias
+    :param keys: list of keys or callable, it gets view arguments
+        (request, *args, **kwargs) and returns list of keys
+    :return: decorator
+    """
+    def decorator(view):
+        prefetch = dict(getattr(view, 'cache_prefetch', {}))
+        prefetch[alias] = prefetch.get(alias, []) + [keys]
+        view.cache_prefetch = prefetch
+        return view
+
+    return decorator
@@ -0,0 +1,83 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+try:
+    text_type = unicode  # noqa: F821, Python 2.7
+except NameError:
+    text_type = str
+
+
+class KeyHandle(text_type):
+    """
+    Cache key compiled once per cache backend of this package (key prefix
+    and version applied, key validated). It is a plain string key for other
+    backends, so it can be passed to CacheACache as well.
+
+        SITE_SETTINGS = KeyHandle('site-settings')
+        cache.get(SITE_SETTINGS)
+    """
+
+    def __new__(cls, key):
+        handle = super(KeyHandle, cls).__new__(cls, key)
+        # cache key_signature -> compiled key
+        handle.keys = {}
+        return handle
+
+    def __reduce__(self):
+        return KeyHandle, (text_type(self),)
+
+
+class CompiledKeysMixin(object):
+    """
+    cache_key accepting KeyHandle, keys of default version given as plain
+    strings are memoized (up to KEY_MEMO_SIZE keys per backend instance).
+    """
+
+    def setup_keys(self, params):
+        # compiled keys are shared by caches with the same signature, it's
+        # a string as its hash is cached
+        self.key_signature = '%r:%s:%s' % (
+            self.key_func, self.key_prefix, self.version
+        )
+        self.key_memo = {}
+        self.key_memo_size = int(params.get('key_memo_size', params.get(
+            'KEY_MEMO_SIZE', 1024
+        )))
+
+    def compile_key(self, key, version=None):
+        """
+        Constructs and validate the key.
+        """
+        cache_key = self.make_key(key, version=version)
+        self.validate_key(cache_key)
+        return cache_key
+
+    def cache_key(self, key, version=None):
+        """
+        Constructs and validate the key used by all other methods.
+        """
+        if version is not None:
+            return self.compile_key(key, version)
+
+        if type(key) is KeyHandle:
+            cache_key = key.keys.get(self.key_signature)
+            if cache_key is None:
+                cache_key = key.keys[self.key_signature] = self.compile_key(
+                    key
+                )
+
+            return cache_key
+
+        memo = self.key_memo
+        cache_key = memo.get(key)
+        if cache_key is None:
+            if len(memo) >= self.key_memo_size:
+                memo.clear()
+
+            cache_key = memo[key] = self.compile_key(key)
+
+        return cache_key
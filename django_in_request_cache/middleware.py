@@ -0,0 +1,213 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import io
+import json
+import logging
+import os
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+
+from django_in_request_cache.cache import CacheACache
+from django_in_request_cache.context import enter_scope, exit_scope
+from django_in_request_cache.prefetch import registry, request_pattern
+from django_in_request_cache.profiler import cache_profile, CacheProfile, \
+    install_profiler, PROFILE_ATTRIBUTE
+from django_in_request_cache.stats import cache_stats, format_summary, \
+    perf_counter, REQUEST_STATS_ATTRIBUTE
+from django_in_request_cache.write_behind import flush_writes
+
+
+logger = logging.getLogger('django_in_request_cache.stats')
+profile_logger = logging.getLogger('django_in_request_cache.profiler')
+
+
+class RequestCacheMiddleware(object):
+    """
+    Make django request current InRequestCache scope. It uses contextvars,
+    so cache works with async views and sync_to_async thread hops as well.
+    Use django_in_request_cache.aio.AsyncRequestCacheMiddleware under ASGI.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = enter_scope(request)
+        try:
+            return self.get_response(request)
+        finally:
+            exit_scope(token)
+
+
+class CacheStatsMiddleware(object):
+    """
+    Report cache statistics (STATS option) of every request. Summary is
+    sent as cache_stats signal, logged to django_in_request_cache.stats
+    logger (DEBUG level) and added as IN_REQUEST_CACHE_STATS_HEADER
+    response header when the setting is set.
+    Put it after RequestCacheMiddleware.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+        self.header = getattr(settings, 'IN_REQUEST_CACHE_STATS_HEADER', None)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        summary = getattr(request, REQUEST_STATS_ATTRIBUTE, None)
+        if summary:
+            cache_stats.send(
+                sender=self.__class__, request=request, stats=summary
+            )
+            value = format_summary(summary)
+            logger.debug(
+                'cache stats %s %s', getattr(request, 'path', ''), value
+            )
+            if self.header:
+                response[self.header] = value
+
+        return response
+
+
+class CachePrefetchMiddleware(object):
+    """
+    Learn keys read from CacheACache aliases with PREFETCH option by each
+    URL pattern and fetch them in one get_many before the view is called,
+    fast cache (InRequestCache) is back populated with them.
+    Keys declared by prefetch_cache_keys view decorator are fetched too.
+    IN_REQUEST_CACHE_PREFETCH_MAX_KEYS setting limits number of learned
+    keys per pattern and cache. Put it after RequestCacheMiddleware.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+        registry.max_keys = getattr(
+            settings, 'IN_REQUEST_CACHE_PREFETCH_MAX_KEYS', registry.max_keys
+        )
+        self.aliases = [
+            alias for alias, config in settings.CACHES.items()
+            if config.get('BACKEND', '').endswith('.CacheACache') and
+            config.get('PREFETCH', config.get('prefetch'))
+        ]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        pattern = request_pattern(request)
+        reads = getattr(request, CacheACache.reads_attribute, None)
+        if pattern is not None and reads:
+            registry.learn(pattern, reads)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        prefetch = {}
+        pattern = request_pattern(request)
+        if pattern is not None:
+            learned = registry.keys(pattern)
+            for alias in self.aliases:
+                cache = caches[alias]
+                prefetch.setdefault(cache, set()).update(
+                    learned.get(cache.name, ())
+                )
+
+        declarations = getattr(view_func, 'cache_prefetch', {})
+        for alias, declared in declarations.items():
+            keys = prefetch.setdefault(caches[alias], set())
+            for declared_keys in declared:
+                if callable(declared_keys):
+                    declared_keys = declared_keys(
+                        request, *view_args, **view_kwargs
+                    )
+
+                keys.update(declared_keys)
+
+        for cache, keys in prefetch.items():
+            if keys:
+                cache.fetch_many(list(keys))
+
+
+class WriteBehindMiddleware(object):
+    """
+    Flush CacheACache writes queued in request (WRITE_BEHIND option) when
+    the response is ready. Without it they are flushed by request_finished
+    signal, after the response is sent. It's required with
+    RequestCacheMiddleware under ASGI, where the signal may be sent by
+    other thread. Put it after RequestCacheMiddleware.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            flush_writes(request=request)
+
+
+class CacheProfileMiddleware(object):
+    """
+    Record every cache call made in request (alias, key patterns, tier
+    which served it, latency and call site) and report repeated reads of
+    the same key, loops of single key reads which could be one get_many
+    and share of cache time in request time.
+
+    Report is sent as cache_profile signal and logged to
+    django_in_request_cache.profiler logger (INFO level, without calls).
+    With IN_REQUEST_CACHE_PROFILE_DIR setting full reports are appended to
+    cache-profile-<pid>.jsonl file in the directory, one JSON per line.
+    IN_REQUEST_CACHE_PROFILE_RATE (1 by default) is the fraction of
+    profiled requests, IN_REQUEST_CACHE_PROFILE_BATCH_MIN (3 by default)
+    the number of single key reads reported as batchable.
+    Put it after RequestCacheMiddleware, it is meant for profiling only.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+        self.rate = float(
+            getattr(settings, 'IN_REQUEST_CACHE_PROFILE_RATE', 1)
+        )
+        self.batch_min = int(
+            getattr(settings, 'IN_REQUEST_CACHE_PROFILE_BATCH_MIN', 3)
+        )
+        self.directory = getattr(
+            settings, 'IN_REQUEST_CACHE_PROFILE_DIR', None
+        )
+        install_profiler()
+
+    def __call__(self, request):
+        if self.rate < 1 and random.random() >= self.rate:
+            return self.get_response(request)
+
+        profile = CacheProfile()
+        setattr(request, PROFILE_ATTRIBUTE, profile)
+        start = perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            delattr(request, PROFILE_ATTRIBUTE)
+            report = profile.report(perf_counter() - start, self.batch_min)
+            report['path'] = getattr(request, 'path', None)
+            self.send_report(request, report)
+
+    def send_report(self, request, report):
+        cache_profile.send(
+            sender=self.__class__, request=request, report=report
+        )
+        summary = dict(report, calls=len(report['calls']))
+        profile_logger.info(
+            'cache profile %s', json.dumps(summary, sort_keys=True)
+        )
+        if self.directory:
+            path = os.path.join(
+                self.directory, 'cache-profile-%s.jsonl' % os.getpid()
+            )
+            with io.open(path, 'a', encoding='utf-8') as dump:
+                dump.write('%s\n' % json.dumps(report, sort_keys=True))
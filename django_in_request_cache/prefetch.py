@@ -0,0 +1,76 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import collections
+import threading
+
+
+class PrefetchRegistry(object):
+    """
+    Keys read by each URL pattern, learned from previous requests.
+    Only keys read in at least min_count requests are prefetched, at most
+    max_keys of the most common ones per pattern and cache.
+    """
+
+    def __init__(self, max_keys=100, min_count=2):
+        self.max_keys = max_keys
+        self.min_count = min_count
+        self.lock = threading.Lock()
+        self.patterns = collections.defaultdict(
+            lambda: collections.defaultdict(collections.Counter)
+        )
+
+    def learn(self, pattern, reads):
+        """
+        Add keys read in one request.
+        :param pattern: resolved URL pattern
+        :param reads: dict cache name -> keys
+        """
+        with self.lock:
+            learned = self.patterns[pattern]
+            for name, keys in reads.items():
+                counter = learned[name]
+                counter.update(keys)
+                if len(counter) > self.max_keys * 10:
+                    # forget rarely read keys
+                    learned[name] = collections.Counter(
+                        dict(counter.most_common(self.max_keys * 5))
+                    )
+
+    def keys(self, pattern):
+        """
+        Keys worth to prefetch for pattern.
+        :return: dict cache name -> keys
+        """
+        with self.lock:
+            learned = self.patterns.get(pattern, {})
+            return dict(
+                (name, [
+                    key for key, count in counter.most_common(self.max_keys)
+                    if count >= self.min_count
+                ])
+                for name, counter in learned.items()
+            )
+
+    def clear(self):
+        with self.lock:
+            self.patterns.clear()
+
+
+registry = PrefetchRegistry()
+
+
+def request_pattern(request):
+    """
+    Resolved URL pattern of the request.
+    :return: pattern name or None
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+
+    return getattr(match, 'route', None) or match.view_name
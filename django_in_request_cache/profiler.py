@@ -0,0 +1,287 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import collections
+import functools
+import os
+import re
+import sys
+import threading
+
+import django.core.cache
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from django_in_request_cache.cache import InRequestCache
+from django_in_request_cache.context import current_request
+from django_in_request_cache.stats import perf_counter
+
+# sent by CacheProfileMiddleware at the end of request with request and
+# report (see CacheProfile.report) arguments
+cache_profile = Signal()
+
+PROFILE_ATTRIBUTE = '_dinr_profile'
+
+READ_METHODS = frozenset([
+    'get', 'get_many', 'has_key', 'get_or_set', 'fetch_many',
+])
+SINGLE_READ_METHODS = frozenset(['get', 'has_key', 'get_or_set'])
+MANY_METHODS = frozenset(['get_many', 'fetch_many', 'delete_many'])
+PROFILED_METHODS = READ_METHODS.union([
+    'set', 'add', 'delete', 'set_many', 'delete_many', 'incr', 'decr',
+    'touch',
+])
+
+# frames of cache backends are skipped in call sites
+SKIPPED_PATHS = (
+    os.path.dirname(os.path.abspath(__file__)),
+    os.path.dirname(os.path.abspath(django.core.cache.__file__)),
+)
+
+# numbers and hex digests in keys, they are replaced by * in key patterns
+KEY_VARIABLE = re.compile(r'[0-9a-fA-F]{8,}|\d+')
+
+
+def key_pattern(key):
+    """
+    Key with numbers and hex digests replaced by *, e.g. user:*:profile
+    """
+    return KEY_VARIABLE.sub('*', '%s' % (key,))
+
+
+def call_site():
+    """
+    First frame out of cache backends and this package.
+    :return: 'directory/file.py:line function' or None
+    """
+    frame = sys._getframe(1)
+    while frame is not None and \
+            frame.f_code.co_filename.startswith(SKIPPED_PATHS):
+        frame = frame.f_back
+
+    if frame is None:
+        return None
+
+    code = frame.f_code
+    return '%s:%s %s' % (
+        '/'.join(code.co_filename.split(os.sep)[-2:]), frame.f_lineno,
+        code.co_name
+    )
+
+
+class CacheCall(object):
+    """
+    One cache call made in profiled request. tier is the last cache read
+    by the call (the tier which served it).
+    """
+    __slots__ = ('cache', 'method', 'keys', 'tier', 'seconds', 'site')
+
+    def __init__(self, cache, method, keys, site):
+        self.cache = cache
+        self.method = method
+        self.keys = keys
+        self.tier = cache
+        self.seconds = 0.0
+        self.site = site
+
+
+class CacheProfile(object):
+    """
+    Cache calls made in one request. Calls made by cache backends (i.e.
+    CacheACache calls to its tiers) are not recorded, they set tier of the
+    call which made them.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.local = threading.local()
+
+    def call(self, cache, name, method, args, kwargs):
+        local = self.local
+        current = getattr(local, 'current', None)
+        if current is not None:
+            if name in READ_METHODS:
+                current.tier = cache
+
+            return method(cache, *args, **kwargs)
+
+        if args:
+            keys = args[0]
+            if name in MANY_METHODS and \
+                    not isinstance(keys, (list, tuple, set, frozenset)):
+                keys = list(keys)  # keep iterators readable by the call
+                args = (keys,) + args[1:]
+
+        else:
+            keys = kwargs.get('key', kwargs.get('keys', kwargs.get('data')))
+
+        if name in MANY_METHODS or name == 'set_many':
+            keys = list(keys or ())
+
+        else:
+            keys = [keys]
+
+        current = local.current = CacheCall(cache, name, keys, call_site())
+        start = perf_counter()
+        try:
+            return method(cache, *args, **kwargs)
+        finally:
+            current.seconds = perf_counter() - start
+            local.current = None
+            self.calls.append(current)
+
+    def report(self, request_time, batch_min=3):
+        """
+        Summary of recorded calls:
+
+        * repeated_reads - keys read more than once, not counting reads
+          served by InRequestCache
+        * batchable - single key reads with the same key pattern from the
+          same call site, they can be one get_many
+        * calls - all calls with alias, key patterns, tier, time and site
+
+        :return: dict, it can be dumped as JSON
+        """
+        aliases = {}
+
+        def alias(cache):
+            if cache not in aliases:
+                aliases[cache] = cache_alias(cache)
+
+            return aliases[cache]
+
+        reads = collections.OrderedDict()
+        loops = collections.OrderedDict()
+        calls = []
+        cache_time = 0.0
+        for call in self.calls:
+            cache_time += call.seconds
+            calls.append({
+                'alias': alias(call.cache),
+                'method': call.method,
+                'keys': sorted(set(key_pattern(key) for key in call.keys)),
+                'tier': alias(call.tier),
+                'time': call.seconds,
+                'site': call.site,
+            })
+            if call.method not in READ_METHODS:
+                continue
+
+            for key in call.keys:
+                reads.setdefault((alias(call.cache), key), []).append(call)
+
+            if call.method in SINGLE_READ_METHODS:
+                loops.setdefault((
+                    alias(call.cache), call.method, call.site,
+                    key_pattern(call.keys[0])
+                ), set()).add(call.keys[0])
+
+        repeated_reads = [
+            {
+                'alias': cache, 'key': '%s' % (key,), 'count': len(hits),
+                'tiers': sorted(set(alias(call.tier) for call in hits)),
+            }
+            for (cache, key), hits in reads.items()
+            if len(hits) > 1 and not all(
+                isinstance(call.tier, InRequestCache) for call in hits
+            )
+        ]
+        batchable = [
+            {
+                'alias': cache, 'method': method, 'site': site,
+                'pattern': pattern, 'count': len(keys),
+            }
+            for (cache, method, site, pattern), keys in loops.items()
+            if len(keys) >= batch_min
+        ]
+        return {
+            'request_time': request_time,
+            'cache_time': cache_time,
+            'cache_share': cache_time / request_time if request_time else 0,
+            'repeated_reads': sorted(
+                repeated_reads, key=lambda item: -item['count']
+            ),
+            'batchable': sorted(batchable, key=lambda item: -item['count']),
+            'calls': calls,
+        }
+
+
+def cache_alias(cache):
+    """
+    Alias of cache backend instance created by current thread, class name
+    for other instances. Caches not created yet are not created.
+    """
+    created = getattr(getattr(caches, '_caches', None), 'caches', {})
+    for alias, instance in created.items():
+        if instance is cache:
+            return alias
+
+    return type(cache).__name__
+
+
+def current_profile():
+    """
+    get CacheProfile of current request
+    :return: CacheProfile or None
+    """
+    return getattr(current_request(), PROFILE_ATTRIBUTE, None)
+
+
+def profiled(name, method):
+    """
+    Wrap cache backend method, calls made in profiled request are recorded.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profile = current_profile()
+        if profile is None:
+            return method(self, *args, **kwargs)
+
+        return profile.call(self, name, method, args, kwargs)
+
+    wrapper.dinr_profiled = True
+    return wrapper
+
+
+_install_lock = threading.Lock()
+# wrapped backend methods, (backend class, method name, attribute of the
+# class before install or None when the method was inherited)
+_installed = []
+
+
+def install_profiler():
+    """
+    Wrap PROFILED_METHODS of backends of all configured caches, once per
+    process. Calls out of profiled requests pay one request lookup.
+    uninstall_profiler restores the backends.
+    """
+    with _install_lock:
+        for config in settings.CACHES.values():
+            backend = import_string(config['BACKEND'])
+            for name in PROFILED_METHODS:
+                method = getattr(backend, name, None)
+                if method is None or getattr(method, 'dinr_profiled', False):
+                    continue
+
+                _installed.append((backend, name, vars(backend).get(name)))
+                setattr(backend, name, profiled(name, method))
+
+
+def uninstall_profiler():
+    """
+    Restore backend methods wrapped by install_profiler.
+    """
+    with _install_lock:
+        while _installed:
+            backend, name, attribute = _installed.pop()
+            if attribute is None:
+                delattr(backend, name)
+
+            else:
+                setattr(backend, name, attribute)
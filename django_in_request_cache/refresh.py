@@ -0,0 +1,136 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import logging
+import math
+import random
+import threading
+import time
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2.7 without futures backport
+    ThreadPoolExecutor = None
+
+
+logger = logging.getLogger('django_in_request_cache')
+
+# fast cache expiration of keys, shared by all threads of the process,
+# (cache name, key, version) -> (expire_at, timeout)
+_deadlines = {}
+# refreshes scheduled or running in the process
+_pending = set()
+_lock = threading.Lock()
+_executor = None
+
+
+def get_executor(workers):
+    """
+    get thread pool of the process, it's created by the first refresh
+    :return: ThreadPoolExecutor
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers)
+
+    return _executor
+
+
+class RefreshAhead(object):
+    """
+    Background re-read of CacheACache keys read close to their fast cache
+    expiration (REFRESH_AHEAD option), so the next reads don't wait for
+    slower cache.
+    """
+    max_keys = 10000
+
+    def __init__(self, cache, fraction, workers=2, max_pending=16):
+        self.cache = cache
+        # the last fraction of fast cache lifetime when keys are refreshed
+        self.fraction = fraction
+        self.workers = workers
+        # refreshes scheduled at once, per process
+        self.max_pending = max_pending
+
+    def record(self, keys, timeout, version=None):
+        """
+        Remember fast cache expiration of keys stored in fast cache.
+        """
+        now = time.time()
+        if len(_deadlines) >= self.max_keys:
+            self.purge(now)
+            if len(_deadlines) >= self.max_keys:
+                return
+
+        deadline = (now + timeout, timeout)
+        name = self.cache.name
+        for key in keys:
+            _deadlines[(name, key, version)] = deadline
+
+    def purge(self, now):
+        """
+        Forget expired keys.
+        """
+        for flight, (expire_at, _) in list(_deadlines.items()):
+            if expire_at <= now:
+                _deadlines.pop(flight, None)
+
+    def due(self, key, version=None):
+        """
+        Probabilistic early expiration, the probability of refresh grows
+        from 1/e at the start of the last fraction of key lifetime to 1 at
+        its expiration.
+        :return: True if key should be refreshed now
+        """
+        deadline = _deadlines.get((self.cache.name, key, version))
+        if deadline is None:
+            return False
+
+        expire_at, timeout = deadline
+        remaining = expire_at - time.time()
+        window = timeout * self.fraction
+        if remaining > window:
+            return False
+
+        return remaining <= -window * math.log(1.0 - random.random())
+
+    def schedule(self, key, version=None):
+        """
+        Re-read the key on thread pool, unless its refresh is pending already
+        or too many refreshes are pending.
+        :return: True if refresh was scheduled
+        """
+        flight = (self.cache.name, key, version)
+        with _lock:
+            if flight in _pending or len(_pending) >= self.max_pending:
+                return False
+
+            _pending.add(flight)
+
+        # it's recorded again when refreshed value is stored
+        _deadlines.pop(flight, None)
+        try:
+            get_executor(self.workers).submit(self.refresh, flight)
+        except RuntimeError:  # interpreter shutdown
+            with _lock:
+                _pending.discard(flight)
+
+            return False
+
+        return True
+
+    def refresh(self, flight):
+        _, key, version = flight
+        try:
+            self.cache.refresh(key, version=version)
+        except Exception:
+            logger.exception('Refresh ahead of %s key failed', key)
+        finally:
+            with _lock:
+                _pending.discard(flight)
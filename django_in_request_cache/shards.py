@@ -0,0 +1,186 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import bisect
+import hashlib
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from django_in_request_cache.refresh import ThreadPoolExecutor
+
+try:
+    from django_in_request_cache.aio import ShardedCacheAsyncMixin
+except SyntaxError:  # Python 2.7
+    ShardedCacheAsyncMixin = object
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers):
+    """
+    get thread pool of the process used to call shards concurrently
+    :return: ThreadPoolExecutor or None on Python 2.7 without futures
+    """
+    global _executor
+    if _executor is None and ThreadPoolExecutor is not None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers)
+
+    return _executor
+
+
+def hash_key(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:8], 16)
+
+
+class HashRing(object):
+    """
+    Consistent hashing of keys to nodes, every node has replicas points on
+    the ring. Adding a node moves about 1/(nodes + 1) of keys.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self.nodes = list(nodes)
+        self.replicas = replicas
+        points = sorted(
+            (hash_key('%s-%s' % (node, replica)), node)
+            for node in self.nodes for replica in range(replicas)
+        )
+        self.points = [point for point, _ in points]
+        self.point_nodes = [node for _, node in points]
+
+    def get_node(self, key):
+        """
+        get node of the key, the first node point after the key hash
+        """
+        index = bisect.bisect(self.points, hash_key(key))
+        return self.point_nodes[index % len(self.points)]
+
+    def split(self, keys):
+        """
+        Group keys by their nodes.
+        :return: dict node -> list of keys
+        """
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.get_node(key), []).append(key)
+
+        return groups
+
+
+class ShardedCache(ShardedCacheAsyncMixin):
+    """
+    Slower caches of CacheACache (SHARDS option) used as one cache backend.
+    Keys are routed to shards (cache aliases) by consistent hashing, bulk
+    operations are split per shard and shards are called concurrently.
+    """
+
+    def __init__(self, aliases, replicas=100, workers=None):
+        self.ring = HashRing(aliases, replicas)
+        self.workers = int(workers) if workers else 4 * len(self.ring.nodes)
+
+    def __repr__(self):
+        return 'ShardedCache(%s)' % ', '.join(self.ring.nodes)
+
+    def shard(self, key):
+        """
+        get cache backend of the key
+        :return: BaseCache
+        """
+        return caches[self.ring.get_node(key)]
+
+    def map_shards(self, func, groups):
+        """
+        Call func(alias, items) for every shard, concurrently when there
+        are more shards.
+        :return: list of results
+        """
+        executor = get_executor(self.workers)
+        if len(groups) < 2 or executor is None:
+            return [func(alias, items) for alias, items in groups.items()]
+
+        futures = [
+            executor.submit(func, alias, items)
+            for alias, items in groups.items()
+        ]
+        return [future.result() for future in futures]
+
+    def get(self, key, default=None, version=None):
+        return self.shard(key).get(key, default=default, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shard(key).set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shard(key).add(key, value, timeout, version)
+
+    def delete(self, key, version=None):
+        return self.shard(key).delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.shard(key).has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.shard(key).incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.shard(key).decr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shard(key).touch(key, timeout, version=version)
+
+    def get_many(self, keys, version=None):
+        """
+        Fetch a bunch of keys, one get_many per shard.
+        """
+        result = {}
+        for found in self.map_shards(
+            lambda alias, keys: caches[alias].get_many(keys, version=version),
+            self.ring.split(keys)
+        ):
+            result.update(found)
+
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Set a bunch of values, one set_many per shard.
+
+        Returns a list of keys that failed insertion.
+        """
+        groups = {}
+        for key, value in data.items():
+            groups.setdefault(self.ring.get_node(key), {})[key] = value
+
+        failed_keys = []
+        for failed in self.map_shards(
+            lambda alias, data: caches[alias].set_many(data, timeout, version),
+            groups
+        ):
+            failed_keys.extend(failed or [])
+
+        return failed_keys
+
+    def delete_many(self, keys, version=None):
+        """
+        Delete a bunch of values, one delete_many per shard.
+        """
+        self.map_shards(
+            lambda alias, keys: caches[alias].delete_many(
+                keys, version=version
+            ),
+            self.ring.split(keys)
+        )
+
+    def clear(self):
+        for alias in self.ring.nodes:
+            caches[alias].clear()
@@ -0,0 +1,508 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+"""
+Cache shared by all processes of a host in memory mapped file, it requires
+POSIX system (fcntl).
+"""
+
+from __future__ import unicode_literals, absolute_import
+
+import errno
+import fcntl
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured
+
+from django_in_request_cache.keys import CompiledKeysMixin
+
+try:
+    from django.utils.six.moves import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    from django_in_request_cache.aio import InRequestCacheAsyncMixin
+except SyntaxError:  # Python 2.7
+    InRequestCacheAsyncMixin = object
+
+
+MAGIC = b'DINRSHM1'
+# magic, buckets, ways, slot size
+HEADER = struct.Struct('<8sIII')
+HEADER_SIZE = 64
+# sequence, key hash, expire at (0 never expires), value size, key size
+SLOT = struct.Struct('<IQdIH')
+SEQUENCE = struct.Struct('<I')
+
+# read attempts of a slot being written, miss is returned then
+READ_ATTEMPTS = 10
+
+# segments shared by all threads of the process, by path
+_segments = {}
+_segments_lock = threading.Lock()
+
+
+def private_directory():
+    """
+    Directory of segments of the effective user, it is created with 0700
+    mode in user runtime directory (XDG_RUNTIME_DIR), /dev/shm or temp
+    directory. Directory not owned by the user or accessible by others is
+    refused.
+    :return: path
+    """
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if not base or not os.path.isdir(base):
+        base = '/dev/shm' if os.path.isdir('/dev/shm') else \
+            tempfile.gettempdir()
+
+    path = os.path.join(base, 'dinr-%s' % os.geteuid())
+    try:
+        os.mkdir(path, 0o700)
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+
+    check_private(os.lstat(path), path, stat.S_ISDIR)
+    return path
+
+
+def check_private(status, path, is_type):
+    """
+    Refuse file of other type (i.e. symlink), owned by other user or
+    accessible by group or others, other users could plant pickles there.
+    """
+    if not is_type(status.st_mode) or status.st_uid != os.geteuid() or \
+            status.st_mode & 0o077:
+        raise ImproperlyConfigured(
+            'SharedMemoryCache refuses %s, it must be owned by the user and '
+            'not accessible by others.' % path
+        )
+
+
+def open_private(path):
+    """
+    Open segment file, it is created by the user or it must be owned by
+    the user and not accessible by others. Symlinks are not followed.
+    :return: file descriptor
+    """
+    flags = os.O_RDWR | getattr(os, 'O_NOFOLLOW', 0)
+    try:
+        return os.open(path, flags | os.O_CREAT | os.O_EXCL, 0o600)
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+
+    try:
+        fd = os.open(path, flags)
+    except OSError as error:
+        if error.errno == errno.ELOOP:  # symlink
+            raise ImproperlyConfigured(
+                'SharedMemoryCache refuses symlink %s.' % path
+            )
+
+        raise
+
+    try:
+        check_private(os.fstat(fd), path, stat.S_ISREG)
+    except ImproperlyConfigured:
+        os.close(fd)
+        raise
+
+    return fd
+
+
+def key_hash(key):
+    """
+    Stable 64 bit hash of bytes key, same in all processes.
+    """
+    return struct.unpack('<Q', hashlib.md5(key).digest()[:8])[0]
+
+
+class Segment(object):
+    """
+    Memory mapped file of fixed size, divided to buckets of ways slots.
+    Slot is written under lock of its bucket stripe (thread lock and fcntl
+    lock of one file byte), readers don't lock. They check slot sequence
+    is even and unchanged after the read (seqlock).
+    """
+
+    def __init__(self, path, size, slot_size, ways, stripes):
+        slots = (size - HEADER_SIZE) // slot_size
+        if slot_size <= SLOT.size or slots < ways:
+            raise ImproperlyConfigured(
+                'SharedMemoryCache SIZE %s is too small for SLOT_SIZE %s.' % (
+                    size, slot_size
+                )
+            )
+
+        self.path = path
+        self.slot_size = slot_size
+        self.ways = ways
+        self.buckets = slots // ways
+        self.size = HEADER_SIZE + self.buckets * ways * slot_size
+        self.stripes = stripes
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.fd = open_private(path)
+        self.lock_file(0)
+        try:
+            if os.fstat(self.fd).st_size != self.size:
+                os.ftruncate(self.fd, self.size)
+
+            self.map = mmap.mmap(self.fd, self.size, mmap.MAP_SHARED)
+            magic, buckets, ways, slot_size = HEADER.unpack_from(self.map, 0)
+            if (magic, buckets, ways, slot_size) != (
+                    MAGIC, self.buckets, self.ways, self.slot_size):
+                self.map[:self.size] = b'\0' * self.size
+                HEADER.pack_into(
+                    self.map, 0, MAGIC, self.buckets, self.ways,
+                    self.slot_size
+                )
+        finally:
+            self.unlock_file(0)
+
+    def lock_file(self, stripe):
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, stripe)
+
+    def unlock_file(self, stripe):
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, stripe)
+
+    def bucket(self, hashed):
+        return hashed % self.buckets
+
+    def offsets(self, bucket):
+        """
+        Offsets of bucket slots.
+        """
+        start = HEADER_SIZE + bucket * self.ways * self.slot_size
+        return range(start, start + self.ways * self.slot_size, self.slot_size)
+
+    def read(self, offset, hashed, key):
+        """
+        Read slot without lock.
+        :return: (expire_at, value bytes) of the key, None if slot has other
+            key or it is being written
+        """
+        mapped = self.map
+        for _ in range(READ_ATTEMPTS):
+            sequence, slot_hash, expire_at, value_size, key_size = \
+                SLOT.unpack_from(mapped, offset)
+            if sequence & 1:
+                continue
+
+            if slot_hash != hashed or key_size != len(key):
+                result = None
+            else:
+                start = offset + SLOT.size
+                if mapped[start:start + key_size] != key:
+                    result = None
+                else:
+                    start += key_size
+                    result = (expire_at, mapped[start:start + value_size])
+
+            if SEQUENCE.unpack_from(mapped, offset)[0] == sequence:
+                return result
+
+        return None
+
+    def find(self, hashed, key, now):
+        """
+        Find live value of the key.
+        :return: (offset, expire_at, value bytes) or None
+        """
+        for offset in self.offsets(self.bucket(hashed)):
+            found = self.read(offset, hashed, key)
+            if found is not None:
+                expire_at, value = found
+                if expire_at and expire_at <= now:
+                    return None
+
+                return offset, expire_at, value
+
+        return None
+
+    def stripe(self, hashed):
+        return self.bucket(hashed) % self.stripes
+
+    def acquire(self, stripe):
+        self.locks[stripe].acquire()
+        try:
+            self.lock_file(stripe)
+        except Exception:
+            self.locks[stripe].release()
+            raise
+
+    def release(self, stripe):
+        try:
+            self.unlock_file(stripe)
+        finally:
+            self.locks[stripe].release()
+
+    def choose(self, hashed, key, now):
+        """
+        Slot for the key, caller holds lock of its stripe. It's the slot of
+        the key, an empty or expired slot, or the one expiring first.
+        """
+        chosen = None
+        chosen_expire_at = None
+        for offset in self.offsets(self.bucket(hashed)):
+            _, slot_hash, expire_at, _, key_size = SLOT.unpack_from(
+                self.map, offset
+            )
+            if slot_hash == hashed and key_size == len(key) and \
+                    self.map[offset + SLOT.size:
+                             offset + SLOT.size + key_size] == key:
+                return offset
+
+            if key_size == 0 or (expire_at and expire_at <= now):
+                expire_at = -1
+
+            elif not expire_at:
+                expire_at = float('inf')
+
+            if chosen is None or expire_at < chosen_expire_at:
+                chosen, chosen_expire_at = offset, expire_at
+
+        return chosen
+
+    def write(self, offset, hashed, key, expire_at, value):
+        """
+        Write slot, caller holds lock of its stripe.
+        """
+        mapped = self.map
+        sequence = SEQUENCE.unpack_from(mapped, offset)[0]
+        SEQUENCE.pack_into(mapped, offset, (sequence + 1) & 0xffffffff)
+        start = offset + SLOT.size
+        mapped[start:start + len(key)] = key
+        start += len(key)
+        mapped[start:start + len(value)] = value
+        SLOT.pack_into(
+            mapped, offset, (sequence + 1) & 0xffffffff, hashed,
+            expire_at or 0.0, len(value), len(key)
+        )
+        SEQUENCE.pack_into(mapped, offset, (sequence + 2) & 0xffffffff)
+
+    def erase(self, offset):
+        """
+        Empty slot, caller holds lock of its stripe.
+        """
+        self.write(offset, 0, b'', 0.0, b'')
+
+
+def get_segment(path, size, slot_size, ways, stripes):
+    """
+    get (or map) segment of the process
+    :return: Segment
+    """
+    segment = _segments.get(path)
+    if segment is None:
+        with _segments_lock:
+            segment = _segments.get(path)
+            if segment is None:
+                segment = _segments[path] = Segment(
+                    path, size, slot_size, ways, stripes
+                )
+
+    return segment
+
+
+class SharedMemoryCache(InRequestCacheAsyncMixin, CompiledKeysMixin,
+                        BaseCache):
+    """
+    Cache shared by all processes (i.e. gunicorn workers) of a host, stored
+    in memory mapped file of fixed SIZE. Keys are hashed to buckets of WAYS
+    slots of SLOT_SIZE bytes, values bigger than a slot (or MAX_VALUE_SIZE)
+    are not cached. It is intended as CacheACache fast cache.
+    """
+
+    def __init__(self, location, params):
+        super(SharedMemoryCache, self).__init__(params)
+        self.setup_keys(params)
+        size = int(params.get('size', params.get('SIZE', 16 * 1024 * 1024)))
+        slot_size = int(params.get('slot_size', params.get('SLOT_SIZE', 4096)))
+        ways = int(params.get('ways', params.get('WAYS', 4)))
+        stripes = int(params.get('stripes', params.get('STRIPES', 64)))
+        self.max_value_size = int(params.get(
+            'max_value_size', params.get('MAX_VALUE_SIZE', slot_size)
+        ))
+        if not location:
+            raise ImproperlyConfigured(
+                'SharedMemoryCache requires LOCATION, caches with the same '
+                'LOCATION share data.'
+            )
+
+        if os.path.isabs(location):
+            path = location
+        else:
+            path = os.path.join(private_directory(), 'dinr-%s-%s-%s-%s' % (
+                location, size, slot_size, ways
+            ))
+
+        self.segment = get_segment(path, size, slot_size, ways, stripes)
+
+    def encode(self, key):
+        key = key.encode('utf-8')
+        return key_hash(key), key
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Set a value in the cache. If timeout is given, that timeout will be
+        used for the key; otherwise the default cache timeout will be used.
+        Value bigger than a slot is not cached, the key is deleted.
+        """
+        self._set(
+            self.cache_key(key, version=version), value,
+            self.get_backend_timeout(timeout)
+        )
+
+    def fits(self, key, value):
+        """
+        Returns True if encoded key and pickled value fit into one slot.
+        """
+        return len(value) <= self.max_value_size and \
+            SLOT.size + len(key) + len(value) <= self.segment.slot_size
+
+    def _set(self, key, value, expire_at, only_new=False):
+        hashed, key = self.encode(key)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        segment = self.segment
+        fits = self.fits(key, value)
+        stripe = segment.stripe(hashed)
+        now = time.time()
+        segment.acquire(stripe)
+        try:
+            if only_new and segment.find(hashed, key, now) is not None:
+                return False
+
+            if fits:
+                offset = segment.choose(hashed, key, now)
+                segment.write(offset, hashed, key, expire_at, value)
+                return True
+
+            found = segment.find(hashed, key, float('-inf'))
+            if found is not None:
+                segment.erase(found[0])
+
+            return False
+        finally:
+            segment.release(stripe)
+
+    def get(self, key, default=None, version=None):
+        """
+        Fetch a given key from the cache. If the key does not exist, return
+        default, which itself defaults to None.
+        """
+        hashed, key = self.encode(self.cache_key(key, version=version))
+        found = self.segment.find(hashed, key, time.time())
+        if found is None:
+            return default
+
+        return pickle.loads(found[2])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Set a value in the cache if the key does not already exist.
+
+        Returns True if the value was stored, False otherwise.
+        """
+        return self._set(
+            self.cache_key(key, version=version), value,
+            self.get_backend_timeout(timeout), only_new=True
+        )
+
+    def _update(self, key, version, update):
+        """
+        Call update(segment, offset, expire_at, value bytes) on live slot of
+        the key under its stripe lock.
+        :return: update result or None for missing key
+        """
+        hashed, key = self.encode(self.cache_key(key, version=version))
+        segment = self.segment
+        stripe = segment.stripe(hashed)
+        segment.acquire(stripe)
+        try:
+            found = segment.find(hashed, key, time.time())
+            if found is None:
+                return None
+
+            offset, expire_at, value = found
+            return update(hashed, key, offset, expire_at, value)
+        finally:
+            segment.release(stripe)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Update the key's expiry time.
+
+        Returns True if successful or False if the key does not exist.
+        """
+        def update(hashed, key, offset, expire_at, value):
+            self.segment.write(
+                offset, hashed, key, self.get_backend_timeout(timeout), value
+            )
+            return True
+
+        return bool(self._update(key, version, update))
+
+    def incr(self, key, delta=1, version=None):
+        """
+        Add delta to value in the cache. If the key does not exist, raise a
+        ValueError exception. The key is deleted and ValueError is raised
+        when the new value doesn't fit into its slot.
+        """
+        def update(hashed, key, offset, expire_at, value):
+            value = pickle.loads(value) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            if not self.fits(key, pickled):
+                self.segment.erase(offset)
+                raise ValueError(
+                    "Value of key '%s' doesn't fit into a slot" % key
+                )
+
+            self.segment.write(offset, hashed, key, expire_at, pickled)
+            return value
+
+        value = self._update(key, version, update)
+        if value is None:
+            raise ValueError("Key '%s' not found" % key)
+
+        return value
+
+    def delete(self, key, version=None):
+        """
+        Delete a key from the cache, failing silently.
+        """
+        def update(hashed, key, offset, expire_at, value):
+            self.segment.erase(offset)
+
+        self._update(key, version, update)
+
+    def has_key(self, key, version=None):
+        """
+        Returns True if the key is in the cache and has not expired.
+        """
+        hashed, key = self.encode(self.cache_key(key, version=version))
+        return self.segment.find(hashed, key, time.time()) is not None
+
+    def clear(self):
+        """
+        Remove *all* values from the cache at once.
+        """
+        segment = self.segment
+        for bucket in range(segment.buckets):
+            stripe = bucket % segment.stripes
+            segment.acquire(stripe)
+            try:
+                for offset in segment.offsets(bucket):
+                    segment.erase(offset)
+            finally:
+                segment.release(stripe)
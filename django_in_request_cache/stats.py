@@ -0,0 +1,193 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import bisect
+import collections
+import threading
+import time
+
+from django.dispatch import Signal
+
+from django_in_request_cache.context import current_request
+
+
+# sent by CacheStatsMiddleware at the end of request with request and
+# stats (per request summary) arguments
+cache_stats = Signal()
+
+# upper bounds of latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 1,
+)
+
+REQUEST_STATS_ATTRIBUTE = '_dinr_stats'
+
+TIMED_METHODS = frozenset([
+    'add', 'get', 'set', 'delete', 'get_many', 'set_many', 'delete_many',
+    'has_key', 'incr', 'decr', 'touch', 'clear', 'backfill_many',
+])
+
+perf_counter = getattr(time, 'perf_counter', time.time)
+
+
+class LatencyHistogram(object):
+    """
+    Latency histogram with fixed LATENCY_BUCKETS buckets.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def as_dict(self):
+        bounds = [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf']
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'buckets': dict(zip(bounds, self.buckets)),
+        }
+
+
+class CacheStats(object):
+    """
+    Process wide counters and per tier latency histograms of one cache.
+    Every record is added to current request summary as well.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.latency = collections.defaultdict(LatencyHistogram)
+
+    def incr(self, event, value=1):
+        with self.lock:
+            self.counters[event] += value
+
+        summary = request_summary()
+        if summary is not None:
+            summary[self.name][event] += value
+
+    def observe(self, tier, seconds):
+        with self.lock:
+            self.latency[tier].observe(seconds)
+
+        summary = request_summary()
+        if summary is not None:
+            summary[self.name]['%s_time' % tier] += seconds
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'latency': dict(
+                    (tier, histogram.as_dict())
+                    for tier, histogram in self.latency.items()
+                ),
+            }
+
+
+class TimedCache(object):
+    """
+    Cache backend proxy, it records latency of every cache call.
+    """
+
+    def __init__(self, cache, stats, tier):
+        self.cache = cache
+        self.stats = stats
+        self.tier = tier
+
+    def __getattr__(self, name):
+        attr = getattr(self.cache, name)
+        if name not in TIMED_METHODS:
+            return attr
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self.stats.observe(self.tier, perf_counter() - start)
+
+        return timed
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache_stats(name):
+    """
+    get (or create) CacheStats of cache with given name
+    :return: CacheStats
+    """
+    try:
+        return _registry[name]
+    except KeyError:
+        with _registry_lock:
+            return _registry.setdefault(name, CacheStats(name))
+
+
+def get_stats(name=None):
+    """
+    Snapshot of process wide cache statistics.
+    :param name: cache stats name, all caches by default
+    :return: dict
+    """
+    if name is not None:
+        return get_cache_stats(name).as_dict()
+
+    return dict((key, stats.as_dict()) for key, stats in _registry.items())
+
+
+def reset_stats():
+    """
+    Drop all process wide cache statistics.
+    """
+    with _registry_lock:
+        _registry.clear()
+
+
+def request_summary(request=None):
+    """
+    get cache statistics summary of current (or given) request
+    :return: dict of cache name to counters or None out of request
+    """
+    if request is None:
+        request = current_request()
+        if request is None:
+            return None
+
+    summary = getattr(request, REQUEST_STATS_ATTRIBUTE, None)
+    if summary is None:
+        summary = collections.defaultdict(collections.Counter)
+        setattr(request, REQUEST_STATS_ATTRIBUTE, summary)
+
+    return summary
+
+
+def format_summary(summary):
+    """
+    Format request summary as header value, i.e.
+    name;fast_hit=2;slow_hit=1;slow_time=0.0021, name2;hit=3
+    """
+    parts = []
+    for name in sorted(summary):
+        counters = summary[name]
+        parts.append(';'.join([name] + [
+            '%s=%s' % (event, round(counters[event], 6))
+            for event in sorted(counters)
+        ]))
+
+    return ', '.join(parts)
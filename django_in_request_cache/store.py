@@ -0,0 +1,295 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import heapq
+import itertools
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2.7
+    from collections import MutableMapping
+
+try:
+    from types import MappingProxyType
+except ImportError:  # Python 2.7, dicts are copied only
+    MappingProxyType = dict
+
+
+logger = logging.getLogger('django_in_request_cache')
+
+_NOT_FOUND = object()
+
+
+class CacheMiss(object):
+    """
+    Marker stored in fast cache for keys missing in slower cache.
+    It is pickled by reference, so identity survives pickling fast cache
+    backends (LocMemCache etc.)
+    """
+
+    def __reduce__(self):
+        return 'CACHE_MISS'
+
+    def __repr__(self):
+        return 'CACHE_MISS'
+
+
+CACHE_MISS = CacheMiss()
+
+
+def approximate_size(value):
+    """
+    Approximate memory size of value in bytes. Containers are measured one
+    level deep only.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            sys.getsizeof(key) + sys.getsizeof(item)
+            for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in value)
+
+    return size
+
+
+def freeze(value):
+    """
+    Read-only deep copy of value, dicts are turned to mappingproxy, lists
+    to tuples and sets to frozensets. Other objects are kept as they are.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType(dict(
+            (key, freeze(item)) for key, item in value.items()
+        ))
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset(value)
+
+    return value
+
+
+class RequestStore(dict):
+    """
+    Request store with request start clock snapshot (now) and min-heap of
+    expiration times. Only entries which expire are in the heap, expired
+    ones are purged in bulk when the earliest expiration time passes.
+    """
+    __slots__ = ('now', 'expirations', 'counter')
+
+    def __init__(self, now=None):
+        super(RequestStore, self).__init__()
+        self.now = now
+        self.expirations = []
+        self.counter = itertools.count()
+
+    def expire(self, key, expire_at, now):
+        """
+        Register key expiration time and purge expired entries.
+        """
+        heapq.heappush(self.expirations, (expire_at, next(self.counter), key))
+        if self.expirations[0][0] <= now:
+            self.purge(now)
+
+    def purge(self, now):
+        """
+        Delete entries expired before now. Only atomic operations are used,
+        request store can be shared by worker threads.
+        """
+        expirations = self.expirations
+        try:
+            while expirations[0][0] <= now:
+                expire_at, _, key = heapq.heappop(expirations)
+                item = self.get(key)
+                if item is not None and item.expire_at == expire_at:
+                    self.pop(key, None)
+        except IndexError:  # heap emptied, possibly by other thread
+            pass
+
+
+class LRUStore(MutableMapping):
+    """
+    Request store with bounded number of entries and/or approximate memory
+    size. Expired entries are purged first, then least recently used entries
+    are evicted. Expiration times are kept in min-heap like in RequestStore,
+    so inserts into full store don't scan its entries.
+    """
+    now = None  # request start clock snapshot
+
+    def __init__(self, max_entries=None, max_bytes=None, name=''):
+        self.data = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+        self.expirations = []
+        self.counter = itertools.count()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        item = self.data.pop(key)
+        self.data[key] = item  # mark item as most recently used
+        return item
+
+    def get(self, key, default=None):
+        item = self.data.pop(key, _NOT_FOUND)
+        if item is _NOT_FOUND:
+            return default
+
+        self.data[key] = item  # mark item as most recently used
+        return item
+
+    def __setitem__(self, key, item):
+        if key in self.data:
+            self._remove(key)
+
+        self.data[key] = item
+        if self.max_bytes is not None:
+            size = approximate_size(key) + approximate_size(
+                getattr(item, 'value', item)
+            )
+            self.sizes[key] = size
+            self.size += size
+
+        expire_at = getattr(item, 'expire_at', None)
+        if expire_at is not None:
+            heapq.heappush(
+                self.expirations, (expire_at, next(self.counter), key)
+            )
+
+        expirations = self.expirations
+        if expirations and (expirations[0][0] <= time.time() or
+                            len(expirations) > 2 * len(self.data) + 64):
+            self._purge()
+
+        if self.is_full():
+            self._evict()
+
+    def __delitem__(self, key):
+        if key not in self.data:
+            raise KeyError(key)
+
+        self._remove(key)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def is_full(self):
+        """
+        Returns True if the store is over any of its bounds.
+        """
+        if self.max_entries is not None and len(self.data) > self.max_entries:
+            return True
+
+        return self.max_bytes is not None and self.size > self.max_bytes
+
+    def _remove(self, key):
+        del self.data[key]
+        self.size -= self.sizes.pop(key, 0)
+
+    def _purge(self):
+        """
+        Purge expired items. Heap entries of overwritten and deleted items
+        are skipped, the heap is rebuilt when they outnumber the items.
+        """
+        now = time.time()
+        expirations = self.expirations
+        data = self.data
+        while expirations and expirations[0][0] <= now:
+            expire_at, _, key = heapq.heappop(expirations)
+            item = data.get(key)
+            if item is not None and \
+                    getattr(item, 'expire_at', None) == expire_at:
+                self._remove(key)
+
+        if len(expirations) > 2 * len(data) + 64:
+            counter = self.counter
+            self.expirations = [
+                (item.expire_at, next(counter), key)
+                for key, item in data.items()
+                if getattr(item, 'expire_at', None) is not None
+            ]
+            heapq.heapify(self.expirations)
+
+    def _evict(self):
+        """
+        Evict least recently used items until the store fits into its
+        bounds.
+        """
+        while self.data and self.is_full():
+            self._remove(next(iter(self.data)))
+            self.evictions += 1
+            if self.evictions == 1:
+                logger.warning(
+                    'In request cache %s reached its bound, evicting least '
+                    'recently used entries.', self.name,
+                    extra={'cache_name': self.name}
+                )
+
+
+class SharedLRUStore(LRUStore):
+    """
+    LRUStore shared by worker threads of a request, every access holds the
+    store lock.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SharedLRUStore, self).__init__(*args, **kwargs)
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Locked copy of LRUStore, entries and their order are kept.
+        """
+        shared = cls(store.max_entries, store.max_bytes, store.name)
+        shared.data = store.data
+        shared.sizes = store.sizes
+        shared.size = store.size
+        shared.expirations = store.expirations
+        shared.counter = store.counter
+        shared.now = store.now
+        shared.evictions = store.evictions
+        return shared
+
+    def __getitem__(self, key):
+        with self.lock:
+            return super(SharedLRUStore, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return super(SharedLRUStore, self).get(key, default)
+
+    def __setitem__(self, key, item):
+        with self.lock:
+            super(SharedLRUStore, self).__setitem__(key, item)
+
+    def __delitem__(self, key):
+        with self.lock:
+            super(SharedLRUStore, self).__delitem__(key)
+
+    def pop(self, key, *args):
+        with self.lock:
+            return super(SharedLRUStore, self).pop(key, *args)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.data))
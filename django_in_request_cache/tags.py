@@ -0,0 +1,82 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+
+class TaggedValue(object):
+    """
+    CacheACache value stored with stamps of its tags. It is valid while
+    stamps of all its tags are unchanged, see CacheACache.invalidate_tags.
+    """
+    __slots__ = ('value', 'tags')
+
+    def __init__(self, value, tags):
+        self.value = value
+        self.tags = tags  # tag -> stamp
+
+    def __getstate__(self):
+        return self.value, self.tags
+
+    def __setstate__(self, state):
+        self.value, self.tags = state
+
+    def __repr__(self):
+        return 'TaggedValue(value=%r, tags=%r)' % (self.value, self.tags)
+
+
+class TagIndex(object):
+    """
+    Tag index of InRequestCache request store, tag -> cache keys and cache
+    key -> tags. Overwritten and deleted keys are dropped from their tags.
+    """
+    __slots__ = ('keys', 'tags')
+
+    def __init__(self):
+        self.keys = {}  # tag -> set of cache keys
+        self.tags = {}  # cache key -> tags
+
+    def __len__(self):
+        return len(self.tags)
+
+    def add(self, cache_keys, tags):
+        """
+        Replace tags of cache keys.
+        """
+        tags = frozenset(tags)
+        self.discard(cache_keys)
+        for key in cache_keys:
+            self.tags[key] = tags
+
+        for tag in tags:
+            self.keys.setdefault(tag, set()).update(cache_keys)
+
+    def discard(self, cache_keys):
+        """
+        Drop cache keys from index of their tags.
+        """
+        for key in cache_keys:
+            for tag in self.tags.pop(key, ()):
+                keys = self.keys.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.keys[tag]
+
+    def pop(self, tag):
+        """
+        Remove tag from the index.
+        :return: cache keys of the tag
+        """
+        keys = self.keys.pop(tag, ())
+        self.discard(keys)
+        return keys
+
+
+def tag_key(tag):
+    """
+    Slower cache key of tag stamp.
+    """
+    return 'dinr-tag:%s' % tag
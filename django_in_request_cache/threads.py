@@ -0,0 +1,117 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+from django_in_request_cache.context import current_request, enter_scope, \
+    exit_scope
+from django_in_request_cache.store import LRUStore, SharedLRUStore
+from django_in_request_cache.write_behind import request_pending_writes, \
+    WRITE_BUFFERS_ATTRIBUTE
+
+# request attribute marking request cache shared with worker threads
+SHARED_ATTRIBUTE = '_dinr_shared'
+
+
+def is_shared(request):
+    """
+    Returns True if request cache of the request is used by worker threads.
+    """
+    return getattr(request, SHARED_ATTRIBUTE, False)
+
+
+def share_request(request):
+    """
+    Prepare request cache of the request for concurrent access from worker
+    threads. dict and RequestStore stores are safe with atomic operations,
+    LRUStore stores are replaced with locked copies. Write buffers filled
+    by worker threads are flushed by the request thread.
+    """
+    if request is None or is_shared(request):
+        return
+
+    # worker threads share write buffers of the request thread
+    request_pending_writes(request)
+    if getattr(request, WRITE_BUFFERS_ATTRIBUTE, None) is None:
+        setattr(request, WRITE_BUFFERS_ATTRIBUTE, {})
+
+    for name, value in list(vars(request).items()):
+        if type(value) is LRUStore:
+            setattr(request, name, SharedLRUStore.from_store(value))
+
+    setattr(request, SHARED_ATTRIBUTE, True)
+
+
+def run_in_request(request, func, args, kwargs):
+    """
+    Call func in worker thread with request cache of request.
+    """
+    token = enter_scope(request)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        exit_scope(token)
+
+
+def submit_in_request(executor, func, *args, **kwargs):
+    """
+    Submit func to executor, the call sees request cache of the current
+    request (or request_cache_scope)::
+
+        with ThreadPoolExecutor(4) as executor:
+            futures = [
+                submit_in_request(executor, load_user, pk) for pk in pks
+            ]
+
+    Out of request func is submitted as it is.
+    :return: Future
+    """
+    request = current_request()
+    if request is None:
+        return executor.submit(func, *args, **kwargs)
+
+    share_request(request)
+    return executor.submit(run_in_request, request, func, args, kwargs)
+
+
+class RequestCacheExecutor(object):
+    """
+    Executor wrapper, calls submitted in request see request cache of the
+    submitting request, see submit_in_request::
+
+        with RequestCacheExecutor(ThreadPoolExecutor(4)) as executor:
+            users = list(executor.map(load_user, pks))
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    def submit(self, func, *args, **kwargs):
+        return submit_in_request(self.executor, func, *args, **kwargs)
+
+    def map(self, func, *iterables, **kwargs):
+        """
+        Call func for arguments from iterables concurrently.
+        :param timeout: seconds to wait for each result, no limit by default
+        :return: iterator of results in order of arguments
+        """
+        timeout = kwargs.get('timeout')
+        futures = [self.submit(func, *args) for args in zip(*iterables)]
+
+        def results():
+            for future in futures:
+                yield future.result(timeout)
+
+        return results()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True)
+        return False
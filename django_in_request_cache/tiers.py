@@ -0,0 +1,218 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured
+
+from django_in_request_cache.store import CACHE_MISS
+
+# tier is read, back populated from lower tiers and written
+WRITE_THROUGH = 'write-through'
+# tier is read only, it's never written nor deleted
+READ_ONLY = 'read-only'
+# tier is read and written, but it isn't back populated on its miss
+SKIP_ON_MISS = 'skip-on-miss'
+
+POLICIES = (WRITE_THROUGH, READ_ONLY, SKIP_ON_MISS)
+
+
+class Tier(object):
+    """
+    One cache of TierChain
+    """
+    __slots__ = ('alias', 'max_timeout', 'policy')
+
+    def __init__(self, alias, max_timeout, policy=WRITE_THROUGH):
+        if policy not in POLICIES:
+            raise ImproperlyConfigured(
+                'Cache tier %s POLICY must be one of %s, not %r.' % (
+                    alias, ', '.join(POLICIES), policy
+                )
+            )
+
+        self.alias = alias
+        self.max_timeout = max_timeout
+        self.policy = policy
+
+    @classmethod
+    def from_config(cls, config, max_timeout):
+        """
+        Tier from TIERS option item, a cache alias or dict with CACHE,
+        MAX_TIMEOUT and POLICY keys.
+        :return: Tier
+        """
+        if not isinstance(config, dict):
+            return cls(config, max_timeout)
+
+        return cls(
+            config.get('cache', config.get('CACHE')),
+            int(config.get('max_timeout', config.get(
+                'MAX_TIMEOUT', max_timeout
+            ))),
+            config.get('policy', config.get('POLICY', WRITE_THROUGH)),
+        )
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def writable(self):
+        return self.policy != READ_ONLY
+
+    @property
+    def backfilled(self):
+        return self.policy == WRITE_THROUGH
+
+    def get_timeout(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Returns timeout for the tier, it is never longer than max_timeout.
+        """
+        if timeout == DEFAULT_TIMEOUT or timeout is None:
+            return self.max_timeout
+
+        return min(self.max_timeout, timeout)
+
+
+class TierChain(object):
+    """
+    Fast caches of CacheACache (TIERS option) used as one cache backend.
+    Reads walk the tiers from the fastest one and back populate faster
+    tiers in bulk, writes and deletes go to every tier.
+    """
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+
+    def __repr__(self):
+        return 'TierChain(%s)' % ', '.join(tier.alias for tier in self.tiers)
+
+    def backfill(self, index, data, version=None):
+        """
+        Back populate tiers faster than the tier at index with values found
+        in it. Values don't outlive max_timeout of the tier they were found
+        in, negative entries (CACHE_MISS) are not promoted, their lifetime
+        is NEGATIVE_TIMEOUT of the tier they were stored in.
+        """
+        data = dict(
+            (key, value) for key, value in data.items()
+            if value is not CACHE_MISS
+        )
+        if not data:
+            return
+
+        timeout = self.tiers[index].max_timeout
+        for tier in self.tiers[:index]:
+            if tier.backfilled:
+                tier.cache.set_many(data, tier.get_timeout(timeout), version)
+
+    def served_value(self, value):
+        """
+        Value read from slower tier as get of the fastest tier returns it,
+        see ObjectCache.served_value.
+        """
+        served = getattr(self.tiers[0].cache, 'served_value', None)
+        return value if served is None else served(value)
+
+    def get(self, key, default=None, version=None):
+        """
+        Fetch a given key from the first tier having it.
+        """
+        for index, tier in enumerate(self.tiers):
+            value = tier.cache.get(key, default=default, version=version)
+            if value is not default:
+                if index:
+                    self.backfill(index, {key: value}, version)
+                    value = self.served_value(value)
+
+                return value
+
+        return default
+
+    def get_many(self, keys, version=None):
+        """
+        Fetch a bunch of keys, each tier is asked for keys missing in
+        faster tiers only.
+        """
+        result = {}
+        missing = list(keys)
+        for index, tier in enumerate(self.tiers):
+            if not missing:
+                break
+
+            found = tier.cache.get_many(missing, version=version)
+            if found:
+                if index:
+                    self.backfill(index, found, version)
+                    found = dict(
+                        (key, self.served_value(value))
+                        for key, value in found.items()
+                    )
+
+                result.update(found)
+                missing = [key for key in missing if key not in found]
+
+        return result
+
+    def backfill_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Back populate tiers with values read from the slower cache, tiers
+        with skip-on-miss policy are skipped.
+        """
+        for tier in self.tiers:
+            if tier.backfilled:
+                tier.cache.set_many(data, tier.get_timeout(timeout), version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        for tier in self.tiers:
+            if tier.writable:
+                tier.cache.set(key, value, tier.get_timeout(timeout), version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for tier in self.tiers:
+            if tier.writable:
+                tier.cache.set_many(data, tier.get_timeout(timeout), version)
+
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Update the key's expiry time in every tier, tiers without touch
+        support drop the key.
+
+        Returns True if the key was touched in any tier.
+        """
+        touched = False
+        for tier in self.tiers:
+            if not tier.writable:
+                continue
+
+            try:
+                touched = tier.cache.touch(
+                    key, tier.get_timeout(timeout), version
+                ) or touched
+            except NotImplementedError:
+                tier.cache.delete(key, version=version)
+
+        return touched
+
+    def delete(self, key, version=None):
+        for tier in self.tiers:
+            if tier.writable:
+                tier.cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for tier in self.tiers:
+            if tier.writable:
+                tier.cache.delete_many(keys, version=version)
+
+    def clear(self):
+        for tier in self.tiers:
+            if tier.writable:
+                tier.cache.clear()
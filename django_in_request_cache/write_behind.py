@@ -0,0 +1,237 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import collections
+import logging
+import threading
+
+from django.dispatch import Signal
+
+
+logger = logging.getLogger('django_in_request_cache')
+
+# sent when slower cache write of buffered values fails, with cache and
+# keys arguments (and exception, if any)
+write_behind_failed = Signal()
+
+SET = 'set'
+DELETE = 'delete'
+
+# request attributes with write buffers (cache name -> WriteBuffer) and
+# PendingWrites of the thread which handles the request
+WRITE_BUFFERS_ATTRIBUTE = '_dinr_write_buffers'
+PENDING_ATTRIBUTE = '_dinr_pending_writes'
+
+_local = threading.local()
+
+
+class PendingWrites(object):
+    """
+    Write buffers with queued writes of one request handling thread. They
+    are flushed by request_finished signal, when the request isn't current
+    any more. Worker threads of the request register buffers here too.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = []
+
+    def add(self, buffer):
+        with self.lock:
+            self.buffers.append(buffer)
+
+    def discard(self, buffer):
+        with self.lock:
+            if buffer in self.buffers:
+                self.buffers.remove(buffer)
+
+    def flush(self):
+        with self.lock:
+            buffers, self.buffers = self.buffers, []
+
+        for buffer in buffers:
+            buffer.flush()
+
+
+def pending_writes():
+    """
+    get PendingWrites of current thread
+    :return: PendingWrites
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = PendingWrites()
+
+    return pending
+
+
+def request_pending_writes(request):
+    """
+    get PendingWrites of thread handling the request, it is bound to the
+    request by its first write buffer or by threads.share_request.
+    :return: PendingWrites
+    """
+    pending = getattr(request, PENDING_ATTRIBUTE, None)
+    if pending is None:
+        pending = pending_writes()
+        setattr(request, PENDING_ATTRIBUTE, pending)
+
+    return pending
+
+
+class WriteBuffer(object):
+    """
+    Slower cache writes of CacheACache (WRITE_BEHIND option) queued in one
+    request. Later write of the same key replaces the earlier one.
+    Buffer is registered in pending writes whenever it gets a write while
+    empty, so writes made after an early flush are flushed too.
+    """
+
+    def __init__(self, cache, pending):
+        self.cache = cache
+        self.pending = pending
+        self.lock = threading.Lock()
+        self.ops = collections.OrderedDict()
+
+    def queue(self, key, version, op):
+        with self.lock:
+            register = not self.ops
+            self.ops[(key, version)] = op
+
+        if register:
+            self.pending.add(self)
+
+    def set(self, key, value, timeout, version):
+        self.queue(key, version, (SET, value, timeout))
+
+    def delete(self, key, version):
+        self.queue(key, version, (DELETE, None, None))
+
+    def lookup(self, key, version):
+        """
+        get queued write of the key
+        :return: (operation, value, timeout) or None
+        """
+        return self.ops.get((key, version))
+
+    def pop(self, key, version):
+        """
+        Remove queued write of the key, it's written to slower cache now.
+        """
+        with self.lock:
+            op = self.ops.pop((key, version), None)
+
+        if op is not None:
+            self.flush_ops({(key, version): op})
+
+    def clear(self):
+        """
+        Drop all queued writes.
+        """
+        with self.lock:
+            self.ops = collections.OrderedDict()
+
+        self.pending.discard(self)
+
+    def flush(self):
+        """
+        Write all queued values to slower cache, one set_many per timeout
+        and version and one delete_many per version.
+        """
+        with self.lock:
+            ops, self.ops = self.ops, collections.OrderedDict()
+
+        self.pending.discard(self)
+        if ops:
+            self.flush_ops(ops)
+
+    def flush_ops(self, ops):
+        cache = self.cache
+        sets = collections.defaultdict(dict)
+        deletes = collections.defaultdict(list)
+        for (key, version), (op, value, timeout) in ops.items():
+            if op == SET:
+                sets[(timeout, version)][key] = value
+            else:
+                deletes[version].append(key)
+                if cache.stale_timeout is not None:
+                    deletes[version].append(cache.stale_key(key))
+
+        for (timeout, version), data in sets.items():
+            try:
+                failed_keys = cache.cache.set_many(data, timeout, version)
+            except Exception as error:
+                self.report(list(data), error)
+                continue
+
+            if failed_keys:
+                self.report(failed_keys)
+
+            if cache.coherence:
+                cache.bump_generations(list(data), version=version)
+
+        for version, keys in deletes.items():
+            try:
+                cache.cache.delete_many(keys, version=version)
+            except Exception as error:
+                self.report(keys, error)
+                continue
+
+            if cache.coherence:
+                cache.bump_generations(keys, version=version)
+
+    def report(self, keys, error=None):
+        logger.error(
+            'Write behind of %s keys to %s cache failed: %s', len(keys),
+            self.cache.cache_alias, error or 'keys rejected',
+            exc_info=error is not None, extra={'keys': keys}
+        )
+        if self.cache.stats is not None:
+            self.cache.stats.incr('write_behind_error', len(keys))
+
+        write_behind_failed.send(
+            sender=self.cache.__class__, cache=self.cache, keys=keys,
+            exception=error
+        )
+
+
+def get_write_buffer(cache, request):
+    """
+    get WriteBuffer of cache in the request
+    :return: WriteBuffer
+    """
+    buffers = getattr(request, WRITE_BUFFERS_ATTRIBUTE, None)
+    if buffers is None:
+        buffers = {}
+        setattr(request, WRITE_BUFFERS_ATTRIBUTE, buffers)
+
+    buffer = buffers.get(cache.name)
+    if buffer is None:
+        buffer = buffers.setdefault(
+            cache.name, WriteBuffer(cache, request_pending_writes(request))
+        )
+
+    return buffer
+
+
+def flush_writes(sender=None, request=None, **kwargs):
+    """
+    Flush write buffers of the request (WriteBehindMiddleware,
+    request_cache_scope exit) or all pending writes of current thread,
+    when the request is gone already (request_finished signal).
+    """
+    if request is None:
+        pending = getattr(_local, 'pending', None)
+        if pending is not None:
+            pending.flush()
+
+        return
+
+    buffers = getattr(request, WRITE_BUFFERS_ATTRIBUTE, None)
+    if buffers:
+        for buffer in list(buffers.values()):
+            buffer.flush()
@@ -43,7 +43,7 @@ setup(
     long_description=read('README.rst'),
     setup_requires=['pytest-runner'],
     install_requires=install_requires,
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     include_package_data=True,
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -0,0 +1,111 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import sys
+
+import pytest
+from django.core.cache import caches
+from django_globals.middleware import Global, globals as d_globals
+
+from django_in_request_cache.cache import CacheACache
+
+# test modules with async def syntax and asyncio.run, they need Python 3.7+
+ASYNC_TEST_MODULES = [
+    'test_aio.py',
+    'test_context_async.py',
+    'test_shards_async.py',
+]
+
+collect_ignore = ASYNC_TEST_MODULES if sys.version_info < (3, 7) else []
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+class MockRequest(object):
+    """
+    Mock django request object for testing purpose
+    """
+    path = '/path/'
+
+
+@pytest.fixture()
+def no_global_request():
+    if hasattr(d_globals, 'request'):
+        delattr(d_globals, 'request')
+
+
+@pytest.fixture()
+def global_request(no_global_request):
+    request = MockRequest()
+    Global().process_request(request)
+    return request
+
+
+@pytest.fixture()
+def main_cache(no_global_request):
+    caches['fast_cache'].clear()
+    caches['other_fast_cache'].clear()
+    CacheACache._process_memos.clear()
+    cache = caches['main_cache']
+    cache.clear()
+    return cache
+
+
+@pytest.fixture()
+def fast_cache():
+    cache = caches['fast_cache']
+    cache.clear()
+    return cache
+
+
+@pytest.fixture()
+def cache_params():
+    """
+    CacheACache params of get_cache, test modules override this fixture.
+    """
+    return {}
+
+
+@pytest.fixture()
+def get_cache(cache_params):
+    """
+    CacheACache factory, keyword arguments override cache_params, optional
+    location param is the cache name.
+    """
+    def get_cache(**kwargs):
+        params = dict(
+            fast_cache='fast_cache',
+            cache_to_cache='main_cache',
+        )
+        params.update(cache_params)
+        params.update(kwargs)
+        location = params.pop('location', None)
+        return CacheACache(location, params)
+
+    return get_cache
+
+
+@pytest.fixture()
+def spy(monkeypatch):
+    """
+    Record arguments of every call of cache method.
+    """
+    def spy(cache, method):
+        calls = []
+        original = getattr(cache, method)
+
+        def wrapper(*args, **kwargs):
+            calls.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(cache, method, wrapper)
+        return calls
+
+    return spy
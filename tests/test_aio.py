@@ -0,0 +1,194 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import asyncio
+import time
+
+import pytest
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from django_in_request_cache.aio import aget_many_caches
+from django_in_request_cache.cache import CacheACache, InRequestCache
+from django_in_request_cache.context import request_cache_scope
+from tests.test_cache_a_cache import MockCache
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+class AsyncMockCache(MockCache):
+    """
+    MockCache with async API, it records awaited calls.
+    """
+
+    def __init__(self, location, params):
+        super(AsyncMockCache, self).__init__(location, params)
+        self.calls = []
+
+    async def aget(self, key, default=None, version=None):
+        self.calls.append(('aget', key))
+        await asyncio.sleep(0)
+        return self.get(key, default, version)
+
+    async def aget_many(self, keys, version=None):
+        self.calls.append(('aget_many', sorted(keys)))
+        await asyncio.sleep(0)
+        return self.get_many(keys, version)
+
+    async def aset(self, key, value, timeout=None, version=None):
+        self.calls.append(('aset', key))
+        return self.set(key, value, timeout, version)
+
+
+@pytest.fixture()
+def slow_cache(monkeypatch, no_global_request):
+    cache = AsyncMockCache('slow_cache', {})
+    monkeypatch.setattr(CacheACache, 'cache', property(lambda self: cache))
+    return cache
+
+
+@pytest.fixture()
+def cache_params():
+    return dict(location='aio')
+
+
+###############################################################################
+#  Test InRequestCache
+###############################################################################
+
+
+def test_in_request_cache_async():
+    cache = InRequestCache(location=None, params={})
+
+    async def main():
+        await cache.aset('key', 'value')
+        await cache.aset_many({'key2': 'value2', 'key3': 'value3'})
+        await cache.adelete('key3')
+        assert await cache.aadd('key', 'other') is False
+        assert await cache.ahas_key('key2')
+        return await cache.aget('key'), await cache.aget_many(
+            ['key', 'key2', 'key3']
+        )
+
+    with request_cache_scope():
+        assert asyncio.run(main()) == (
+            'value', {'key': 'value', 'key2': 'value2'}
+        )
+
+
+def test_in_request_cache_async_tags():
+    cache = InRequestCache(location=None, params={})
+
+    async def main():
+        await cache.aset('key', 'value', tags=['user'])
+        await cache.aset_many({'key2': 'value2'}, tags=['user'])
+        await cache.aadd('key3', 'value3', tags=['group'])
+        cache.invalidate_tags(['user'])
+        return await cache.aget_many(['key', 'key2', 'key3'])
+
+    with request_cache_scope():
+        assert asyncio.run(main()) == {'key3': 'value3'}
+
+
+###############################################################################
+#  Test CacheACache
+###############################################################################
+
+
+def test_cache_a_cache_aget(fast_cache, slow_cache, get_cache):
+    cache = get_cache()
+    slow_cache.set('key', 'value')
+
+    async def main():
+        return [await cache.aget('key'), await cache.aget('key'),
+                await cache.aget('missing', 'default')]
+
+    assert asyncio.run(main()) == ['value', 'value', 'default']
+    assert slow_cache.calls == [('aget', 'key'), ('aget', 'missing')]
+    assert fast_cache.get('key') == 'value'
+
+
+def test_cache_a_cache_aget_many(fast_cache, slow_cache, get_cache):
+    cache = get_cache(negative_timeout=5)
+    fast_cache.set('key', 'value')
+    slow_cache.set('key2', 'value2')
+
+    async def main():
+        return [await cache.aget_many(['key', 'key2', 'key3']),
+                await cache.aget_many(['key', 'key2', 'key3'])]
+
+    assert asyncio.run(main()) == [{'key': 'value', 'key2': 'value2'}] * 2
+    assert slow_cache.calls == [('aget_many', ['key2', 'key3'])]
+
+
+def test_cache_a_cache_aset(fast_cache, slow_cache, get_cache):
+    cache = get_cache()
+
+    async def main():
+        await cache.aset('key', 'value')
+        await cache.aset_many({'key2': 'value2'})
+        assert await cache.aadd('key', 'other') is False
+        await cache.adelete('key2')
+
+    asyncio.run(main())
+    assert slow_cache.calls == [('aset', 'key')]
+    assert slow_cache.get('key') == 'value'
+    assert fast_cache.get('key') is None  # dropped by failed add
+    assert slow_cache.get('key2') is None
+    assert fast_cache.get('key2') is None
+
+
+def test_aget_many_caches(fast_cache, main_cache):
+    fast_cache.set('key', 'value')
+    main_cache.set('key2', 'value2')
+    result = asyncio.run(aget_many_caches({
+        'fast_cache': ['key', 'key2'], 'main_cache': ['key2'],
+    }))
+    assert result == {
+        'fast_cache': {'key': 'value'}, 'main_cache': {'key2': 'value2'},
+    }
+
+
+def test_aget_many_caches_sync_backends(monkeypatch, no_global_request):
+    original = LocMemCache.get_many
+
+    def get_many(self, keys, version=None):
+        time.sleep(0.1)
+        return original(self, keys, version=version)
+
+    monkeypatch.setattr(LocMemCache, 'get_many', get_many)
+    aliases = ['shard_1', 'shard_2', 'shard_3']
+    for alias in aliases:
+        caches[alias].set('key', alias)
+
+    start = time.time()
+    result = asyncio.run(aget_many_caches(
+        dict((alias, ['key']) for alias in aliases)
+    ))
+    # sync backends are called in executor, concurrently
+    assert time.time() - start < 0.25
+    assert result == dict((alias, {'key': alias}) for alias in aliases)
+
+
+def test_cache_a_cache_coherence_async(no_global_request):
+    caches['shard_1'].clear()
+    cache = CacheACache(None, {
+        'FAST_CACHE': 'in_request_cache', 'CACHE_TO_CACHE': 'shard_1',
+        'COHERENCE': True,
+    })
+
+    async def main():
+        await cache.aset('ns:key', 'value')
+        return await cache.aget('ns:key'), await cache.aget_many(['ns:key'])
+
+    with request_cache_scope() as scope:
+        assert asyncio.run(main()) == ('value', {'ns:key': 'value'})
+        # generations read in executor are memoized in the request
+        assert 'ns' in getattr(scope, cache.generations_attribute)['shard_1']
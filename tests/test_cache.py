@@ -11,27 +11,11 @@ import warnings
 import django_globals
 import pytest
 from django.test import Client
-from django_globals.middleware import Global, globals as d_globals
+from django_globals.middleware import globals as d_globals
 
 from django_in_request_cache.cache import InRequestCache, CacheItem
-
-
-###############################################################################
-#  Test Fixtures
-###############################################################################
-
-
-class MockRequest(object):
-    """
-    Mock django request object for testing purpose
-    """
-
-
-@pytest.fixture()
-def global_request():
-    request = MockRequest()
-    Global().process_request(request)
-    return request
+from django_in_request_cache.keys import KeyHandle
+from django_in_request_cache.store import RequestStore
 
 
 ###############################################################################
@@ -155,3 +139,212 @@ def test_cache_without_global_request(global_request):
     assert cache.get('key') is None
     cache.set('key', 'value')
     assert cache.get('key') is None
+
+
+def test_cache_get_many(global_request):
+    cache = InRequestCache(location=None, params={})
+    now = time.time()
+    cache_data = {
+        cache.cache_key('key'): CacheItem('value', now + 10),
+        cache.cache_key('expired'): CacheItem('value2', now - 1),
+        cache.cache_key('none'): CacheItem(None, now + 10),
+    }
+    setattr(global_request, cache.cache_name, cache_data)
+
+    assert cache.get_many(['key', 'expired', 'none', 'missing']) == {
+        'key': 'value',
+        'none': None,
+    }
+
+
+def test_cache_set_many(global_request):
+    cache = InRequestCache(location=None, params={})
+    start = time.time()
+    assert cache.set_many({'key': 'value', 'key2': 'value2'}, timeout=2) == []
+    end = time.time()
+    cache_data = getattr(global_request, cache.cache_name)
+    for key, value in (('key', 'value'), ('key2', 'value2')):
+        item = cache_data[cache.cache_key(key)]
+        assert item.value == value
+        assert start + 2 <= item.expire_at <= end + 2
+
+    assert cache.get_many(['key', 'key2']) == {
+        'key': 'value', 'key2': 'value2',
+    }
+
+
+def test_cache_delete_many(global_request):
+    cache = InRequestCache(location=None, params={})
+    cache.set_many({'key': 'value', 'key2': 'value2', 'key3': 'value3'})
+    cache.delete_many(['key', 'key2', 'missing'])
+    assert cache.get_many(['key', 'key2', 'key3']) == {'key3': 'value3'}
+
+
+def test_cache_max_entries(global_request):
+    cache = InRequestCache(location=None, params={'MAX_ENTRIES': 2})
+    cache.set('key', 'value')
+    cache.set('key2', 'value2')
+    assert cache.get('key') == 'value'
+    cache.set('key3', 'value3')
+    assert cache.get_many(['key', 'key2', 'key3']) == {
+        'key': 'value', 'key3': 'value3',
+    }
+    assert cache.cache.evictions == 1
+
+
+def test_cache_unbounded(global_request):
+    cache = InRequestCache(location=None, params={})
+    assert type(cache.cache) is dict
+
+
+def test_cache_trusted_keys(global_request):
+    cache = InRequestCache(location=None, params={'TRUSTED_KEYS': True})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        cache.set('key with spaces', 'value')
+        assert cache.get('key with spaces') == 'value'
+
+    cache = InRequestCache(location=None, params={})
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        cache.get('key with spaces')
+        assert len(w) == 1
+
+
+def test_cache_timeout_none(global_request):
+    cache = InRequestCache(location=None, params={})
+    cache.set('key', 'value', timeout=None)
+    item = getattr(global_request, cache.cache_name)[cache.cache_key('key')]
+    assert item.expire_at is None
+    assert cache.get('key') == 'value'
+    assert cache.get_many(['key']) == {'key': 'value'}
+
+    cache = InRequestCache(location=None, params={'MAX_TIMEOUT': 2})
+    start = time.time()
+    assert cache.get_backend_timeout(None) >= start + 2
+
+
+def test_cache_request_clock(monkeypatch, global_request):
+    cache = InRequestCache(location=None, params={'REQUEST_CLOCK': True})
+    cache.set('key', 'value', timeout=1)
+    start = cache.cache.now
+    assert isinstance(cache.cache, RequestStore)
+    monkeypatch.setattr(time, 'time', lambda: start + 10)
+    assert cache.get('key') == 'value'
+    assert cache.get_many(['key']) == {'key': 'value'}
+
+    cache.clear()
+    assert cache.cache.now == start + 10
+
+
+def test_cache_request_timeout(global_request):
+    cache = InRequestCache(location=None, params={'REQUEST_TIMEOUT': 60})
+    cache.set('key', 'value')
+    cache.set('short', 'value', timeout=10)
+    cache_data = getattr(global_request, cache.cache_name)
+    assert cache_data[cache.cache_key('key')].expire_at is None
+    assert cache_data[cache.cache_key('short')].expire_at is not None
+    assert len(cache_data.expirations) == 1
+
+
+def test_cache_request_store_purge(global_request):
+    cache = InRequestCache(location=None, params={'REQUEST_TIMEOUT': 60})
+    cache.set('expired', 'value', timeout=0)
+    cache.set('expired2', 'value', timeout=-1)
+    cache.set('key', 'value', timeout=10)
+    cache.set('long', 'value')
+    cache_data = getattr(global_request, cache.cache_name)
+    assert sorted(cache_data) == [
+        cache.cache_key('key'), cache.cache_key('long'),
+    ]
+
+    # replaced value isn't purged by old expiration time
+    cache.set('key2', 'value', timeout=0)
+    cache.set('key2', 'value2')
+    cache.set('key3', 'value3', timeout=0)
+    assert cache.get('key2') == 'value2'
+
+
+def test_cache_key_handle(global_request):
+    cache = InRequestCache(location=None, params={'KEY_PREFIX': 'prefix'})
+    handle = KeyHandle('key')
+    assert handle == 'key'
+    cache.set(handle, 'value')
+    assert cache.get('key') == 'value'
+    assert cache.get_many([handle]) == {handle: 'value'}
+    assert handle.keys == {cache.key_signature: 'prefix:1:key'}
+    assert cache.get(handle, version=2) is None
+
+    other = InRequestCache(location=None, params={})
+    assert other.get(handle) is None
+    assert handle.keys[other.key_signature] == ':1:key'
+
+
+def test_cache_key_memo(monkeypatch, global_request):
+    cache = InRequestCache(location=None, params={'KEY_MEMO_SIZE': 2})
+    calls = []
+    make_key = cache.make_key
+    monkeypatch.setattr(
+        cache, 'make_key', lambda *args, **kwargs: calls.append(args) or
+        make_key(*args, **kwargs)
+    )
+    cache.get('key')
+    cache.get('key')
+    cache.get('key', version=2)
+    assert len(calls) == 2
+    cache.get('key2')
+    cache.get('key3')
+    assert len(cache.key_memo) == 1
+
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        cache.get('key with spaces')
+        cache.get('key with spaces')
+        assert len(w) == 1
+
+
+def test_cache_incr_decr(global_request):
+    cache = InRequestCache(location=None, params={})
+    with pytest.raises(ValueError):
+        cache.incr('counter')
+
+    cache.set('counter', 1)
+    assert cache.incr('counter') == 2
+    assert cache.incr('counter', 5) == 7
+    assert cache.decr('counter', 3) == 4
+    assert cache.get('counter') == 4
+
+    cache.set('expired', 1, timeout=0)
+    with pytest.raises(ValueError):
+        cache.incr('expired')
+
+
+def test_cache_touch(global_request):
+    cache = InRequestCache(location=None, params={'REQUEST_CLOCK': True})
+    assert not cache.touch('key')
+    cache.set('key', 'value', timeout=10)
+    assert cache.touch('key', timeout=0)
+    assert cache.get('key') is None
+    assert type(cache.cache) is RequestStore
+
+    cache = InRequestCache(location='plain', params={})
+    cache.set('key', 'value', timeout=0)
+    assert not cache.touch('key')
+    cache.set('key', 'value', timeout=10)
+    assert cache.touch('key', timeout=None)
+    assert cache.cache[cache.cache_key('key')].expire_at is None
+
+
+def test_cache_get_or_set(global_request):
+    cache = InRequestCache(location=None, params={})
+    calls = []
+
+    def default():
+        calls.append(1)
+        return 'value'
+
+    assert cache.get_or_set('key', default) == 'value'
+    assert cache.get_or_set('key', default) == 'value'
+    assert calls == [1]
+    assert cache.get_or_set('none', None) is None
+    assert not cache.has_key('none')
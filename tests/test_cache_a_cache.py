@@ -5,6 +5,8 @@
 
 from __future__ import unicode_literals, absolute_import
 
+import pickle
+import threading
 import time
 from collections import namedtuple
 
@@ -14,7 +16,8 @@ from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT, \
     InvalidCacheBackendError
 from django.utils.six import text_type
 
-from django_in_request_cache.cache import CacheACache
+from django_in_request_cache.cache import CACHE_MISS
+from django_in_request_cache.context import request_cache_scope
 
 
 ###############################################################################
@@ -55,7 +58,8 @@ class MockCache(BaseCache):
         """
         key = self.cache_key(key, version=version)
         item = self.cache.get(key)
-        if isinstance(item, CacheItem) and time.time() < item.expire_at:
+        if isinstance(item, CacheItem) and (
+                item.expire_at is None or time.time() < item.expire_at):
             return item.value
 
         return default
@@ -101,30 +105,6 @@ class MockCache(BaseCache):
         return super(MockCache, self).has_key(key, version)
 
 
-@pytest.fixture()
-def main_cache():
-    cache = caches['main_cache']
-    cache.clear()
-    return cache
-
-
-@pytest.fixture()
-def fast_cache():
-    cache = caches['fast_cache']
-    cache.clear()
-    return cache
-
-
-def get_cache(**kwargs):
-    location = kwargs.pop('location', None)
-    params = dict(
-        fast_cache='fast_cache',
-        cache_to_cache='main_cache',
-    )
-    params.update(kwargs)
-    return CacheACache(location, params)
-
-
 def assert_item(cache, key, value, timeout):
     assert key in cache.cache
     item = cache.cache[key]
@@ -137,13 +117,13 @@ def assert_item(cache, key, value, timeout):
 ###############################################################################
 
 
-def test_cache_property(main_cache, fast_cache):
+def test_cache_property(main_cache, fast_cache, get_cache):
     cache = get_cache()
     assert cache.cache is main_cache
     assert cache.fast_cache is fast_cache
 
 
-def test_wrong_cache_property():
+def test_wrong_cache_property(get_cache):
     cache = get_cache(fast_cache='wrong_cache', cache_to_cache='bad_cache')
     with pytest.raises(InvalidCacheBackendError) as exc_info:
         cache_to_cache = cache.cache
@@ -154,7 +134,7 @@ def test_wrong_cache_property():
     assert 'wrong_cache' in text_type(exc_info.value)
 
 
-def test_fast_cache_set(fast_cache):
+def test_fast_cache_set(fast_cache, get_cache):
     cache = get_cache(fast_cache_max_timeout=5)
     assert 'key' not in fast_cache.cache
     cache.fast_cache_set('key', 'value')
@@ -169,7 +149,7 @@ def test_fast_cache_set(fast_cache):
     assert_item(fast_cache, 'key3', 'value3', timeout=3)
 
 
-def test_cache_set(fast_cache, main_cache):
+def test_cache_set(fast_cache, main_cache, get_cache):
     cache = get_cache(fast_cache_max_timeout=5, timeout=10)
 
     assert 'key' not in fast_cache.cache
@@ -189,7 +169,7 @@ def test_cache_set(fast_cache, main_cache):
     assert_item(main_cache, 'key', 'value3', timeout=3)
 
 
-def test_cache_get(fast_cache, main_cache):
+def test_cache_get(fast_cache, main_cache, get_cache):
     cache = get_cache(fast_cache_max_timeout=5, timeout=10)
 
     assert 'key' not in fast_cache.cache
@@ -208,7 +188,7 @@ def test_cache_get(fast_cache, main_cache):
     assert_item(fast_cache, 'key', 'value', timeout=5)
 
 
-def test_cache_delete(fast_cache, main_cache):
+def test_cache_delete(fast_cache, main_cache, get_cache):
     cache = get_cache()
 
     fast_cache.set('key', 'value')
@@ -226,7 +206,7 @@ def test_cache_delete(fast_cache, main_cache):
     assert 'key' not in main_cache.cache
 
 
-def test_cache_clear(fast_cache, main_cache):
+def test_cache_clear(fast_cache, main_cache, get_cache):
     cache = get_cache()
     fast_cache.set('key', 'value')
     main_cache.set('key', 'value')
@@ -237,7 +217,7 @@ def test_cache_clear(fast_cache, main_cache):
     assert not len(main_cache.cache)
 
 
-def test_cache_add(fast_cache, main_cache):
+def test_cache_add(fast_cache, main_cache, get_cache):
     cache = get_cache(fast_cache_max_timeout=5, timeout=10)
 
     fast_cache.set('key', 'default', timeout=3)
@@ -246,3 +226,399 @@ def test_cache_add(fast_cache, main_cache):
     assert cache.add('key', 'value')
     assert_item(fast_cache, 'key', 'value', timeout=5)
     assert_item(main_cache, 'key', 'value', timeout=10)
+
+
+def test_cache_get_many(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache(fast_cache_max_timeout=5, timeout=10)
+    fast_cache.set('key', 'fast')
+    main_cache.set('key', 'slow', timeout=222)
+    main_cache.set('key2', 'value2', timeout=222)
+    main_cache.set('key3', 'value3', timeout=222)
+    main_get_many = spy(main_cache, 'get_many')
+    fast_set_many = spy(fast_cache, 'set_many')
+
+    assert cache.get_many(['key', 'key2', 'key3', 'missing']) == {
+        'key': 'fast', 'key2': 'value2', 'key3': 'value3',
+    }
+    assert len(main_get_many) == 1
+    assert sorted(main_get_many[0][0]) == ['key2', 'key3', 'missing']
+    assert len(fast_set_many) == 1
+    assert_item(fast_cache, 'key2', 'value2', timeout=5)
+    assert_item(fast_cache, 'key3', 'value3', timeout=5)
+
+    main_cache.clear()
+    assert cache.get_many(['key', 'key2', 'key3']) == {
+        'key': 'fast', 'key2': 'value2', 'key3': 'value3',
+    }
+    assert len(main_get_many) == 1
+
+
+def test_cache_set_many(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache(fast_cache_max_timeout=5, timeout=10)
+    main_set_many = spy(main_cache, 'set_many')
+    fast_set_many = spy(fast_cache, 'set_many')
+
+    assert cache.set_many({'key': 'value', 'key2': 'value2'}) == []
+    assert len(main_set_many) == 1
+    assert len(fast_set_many) == 1
+    assert_item(main_cache, 'key', 'value', timeout=10)
+    assert_item(main_cache, 'key2', 'value2', timeout=10)
+    assert_item(fast_cache, 'key', 'value', timeout=5)
+    assert_item(fast_cache, 'key2', 'value2', timeout=5)
+
+
+def test_cache_delete_many(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache()
+    cache.set_many({'key': 'value', 'key2': 'value2', 'key3': 'value3'})
+    main_delete_many = spy(main_cache, 'delete_many')
+    fast_delete_many = spy(fast_cache, 'delete_many')
+
+    cache.delete_many(['key', 'key2'])
+    assert len(main_delete_many) == 1
+    assert len(fast_delete_many) == 1
+    assert cache.get_many(['key', 'key2', 'key3']) == {'key3': 'value3'}
+
+
+def test_cache_get_none_value(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache(fast_cache_max_timeout=5, timeout=10)
+    main_cache.set('key', None)
+    assert cache.get('key', 'default') is None
+    assert_item(fast_cache, 'key', None, timeout=5)
+
+    main_get = spy(main_cache, 'get')
+    assert cache.get('key', 'default') is None
+    assert not main_get
+
+
+def test_cache_negative_entry(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache(fast_cache_max_timeout=5, negative_timeout=2)
+    main_get = spy(main_cache, 'get')
+
+    assert cache.get('key', 'default') == 'default'
+    assert_item(fast_cache, 'key', CACHE_MISS, timeout=2)
+    assert cache.get('key', 'default') == 'default'
+    assert cache.get_many(['key']) == {}
+    assert len(main_get) == 1
+
+    cache.set('key', 'value')
+    assert_item(fast_cache, 'key', 'value', timeout=5)
+    assert cache.get('key') == 'value'
+
+    cache.delete('key')
+    assert 'key' not in fast_cache.cache
+    assert cache.get('key') is None
+    assert_item(fast_cache, 'key', CACHE_MISS, timeout=2)
+
+
+def test_cache_negative_entry_disabled(fast_cache, main_cache, get_cache):
+    cache = get_cache()
+    assert cache.get('key', 'default') == 'default'
+    assert cache.get_many(['key2']) == {}
+    assert 'key' not in fast_cache.cache
+    assert 'key2' not in fast_cache.cache
+
+
+def test_cache_get_many_negative_entry(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache(fast_cache_max_timeout=5, negative_timeout=10)
+    main_cache.set('key', 'value')
+    assert cache.get_many(['key', 'missing']) == {'key': 'value'}
+    assert_item(fast_cache, 'missing', CACHE_MISS, timeout=5)
+
+    main_get_many = spy(main_cache, 'get_many')
+    assert cache.get_many(['key', 'missing']) == {'key': 'value'}
+    assert not main_get_many
+
+
+def test_cache_add_clears_negative_entry(fast_cache, main_cache, get_cache):
+    cache = get_cache(negative_timeout=2)
+    assert cache.get('key') is None
+    main_cache.set('key', 'value')
+    assert not cache.add('key', 'value2')
+    assert cache.get('key') == 'value'
+
+
+def test_cache_miss_pickle():
+    assert pickle.loads(pickle.dumps(CACHE_MISS)) is CACHE_MISS
+
+
+def test_cache_get_or_set(fast_cache, main_cache, get_cache):
+    cache = get_cache(fast_cache_max_timeout=5, timeout=10)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'value'
+
+    assert cache.get_or_set('key', compute) == 'value'
+    assert cache.get_or_set('key', compute) == 'value'
+    assert len(calls) == 1
+    assert_item(main_cache, 'key', 'value', timeout=10)
+    assert_item(fast_cache, 'key', 'value', timeout=5)
+
+
+def test_cache_get_or_set_race(fast_cache, main_cache, get_cache):
+    cache = get_cache()
+
+    def compute():
+        # other writer sets the key between the miss and the add
+        main_cache.set('key', 'winner')
+        return 'mine'
+
+    assert cache.get_or_set('key', compute) == 'winner'
+    assert cache.get('key') == 'winner'
+
+
+def test_cache_get_or_set_single_flight(fast_cache, main_cache, get_cache):
+    cache = get_cache(
+        fast_cache_max_timeout=5, timeout=10, single_flight=True,
+        stale_timeout=20,
+    )
+    assert cache.get_or_set('key', lambda: 'value') == 'value'
+    assert_item(main_cache, 'key', 'value', timeout=10)
+    assert_item(main_cache, 'key:stale', 'value', timeout=30)
+    assert_item(fast_cache, 'key', 'value', timeout=5)
+    assert 'key:lock' not in main_cache.cache
+
+    cache.delete('key')
+    assert 'key' not in main_cache.cache
+    assert 'key:stale' not in main_cache.cache
+
+
+def test_cache_get_or_set_serve_stale(fast_cache, main_cache, get_cache):
+    cache = get_cache(single_flight=True, stale_timeout=20)
+    main_cache.add('key:lock', 1)
+    main_cache.set('key:stale', 'stale')
+
+    def compute():
+        raise AssertionError('lock holder recomputes the value')
+
+    assert cache.get_or_set('key', compute) == 'stale'
+
+
+def test_cache_get_or_set_wait_for_lock(monkeypatch, fast_cache, main_cache,
+                                        get_cache):
+    cache = get_cache(fast_cache_max_timeout=5, single_flight=True)
+    main_cache.add('key:lock', 1)
+    sleeps = []
+
+    def sleep(delay):
+        sleeps.append(delay)
+        if len(sleeps) == 3:
+            main_cache.set('key', 'value')
+
+    monkeypatch.setattr(time, 'sleep', sleep)
+    assert cache.get_or_set('key', lambda: 'computed') == 'value'
+    assert sleeps == [0.05, 0.1, 0.2]
+    assert_item(fast_cache, 'key', 'value', timeout=5)
+
+
+def test_cache_get_or_set_lock_timeout(monkeypatch, fast_cache, main_cache,
+                                       get_cache):
+    cache = get_cache(single_flight=True, lock_timeout=0)
+    main_cache.add('key:lock', 1)
+    monkeypatch.setattr(time, 'sleep', lambda delay: None)
+    assert cache.get_or_set('key', lambda: 'computed') == 'computed'
+
+    def compute():
+        main_cache.set('key2', 'winner')
+        return 'computed'
+
+    main_cache.add('key2:lock', 1)
+    assert cache.get_or_set('key2', compute) == 'winner'
+
+
+def test_cache_get_or_set_coalesce_threads(fast_cache, main_cache, get_cache):
+    cache = get_cache(single_flight=True)
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'value'
+
+    def worker():
+        results.append(cache.get_or_set('key', compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+
+
+def test_cache_coherence(fast_cache, main_cache, get_cache, spy):
+    caches['other_fast_cache'].clear()
+    cache = get_cache(coherence=True, fast_cache_max_timeout=300)
+    other_cache = get_cache(
+        coherence=True, fast_cache='other_fast_cache',
+        fast_cache_max_timeout=300,
+    )
+
+    with request_cache_scope():
+        cache.set('user:1', 'value')
+        assert other_cache.get('user:1') == 'value'
+        assert cache.get('user:1') == 'value'
+
+    with request_cache_scope():
+        cache.set('user:1', 'value2')
+        cache.set('other', 'value3')
+
+    main_get_many = spy(main_cache, 'get_many')
+    main_get = spy(main_cache, 'get')
+    with request_cache_scope():
+        assert other_cache.get('user:1') == 'value2'
+        assert other_cache.get('other') == 'value3'
+        assert other_cache.get('user:1') == 'value2'
+        assert other_cache.get('other') == 'value3'
+
+    # generations of both namespaces fetched at once, values once
+    assert len(main_get_many) == 1
+    assert sorted(main_get_many[0][0]) == [
+        'dinr-generation:', 'dinr-generation:user',
+    ]
+    # MockCache get_many calls get for every key
+    assert len(main_get) == 4
+
+    with request_cache_scope():
+        cache.delete('user:1')
+
+    with request_cache_scope():
+        assert other_cache.get('user:1') is None
+        assert other_cache.get('other') == 'value3'
+
+
+def test_cache_coherence_get_many(fast_cache, main_cache, get_cache):
+    caches['other_fast_cache'].clear()
+    cache = get_cache(coherence=True, negative_timeout=10)
+    other_cache = get_cache(coherence=True, fast_cache='other_fast_cache')
+
+    with request_cache_scope():
+        cache.set_many({'a:1': 1, 'b:1': 2})
+        assert other_cache.get_many(['a:1', 'b:1', 'c:1']) == {
+            'a:1': 1, 'b:1': 2,
+        }
+
+    with request_cache_scope():
+        cache.set_many({'a:1': 3, 'c:1': 4})
+
+    with request_cache_scope():
+        assert other_cache.get_many(['a:1', 'b:1', 'c:1']) == {
+            'a:1': 3, 'b:1': 2, 'c:1': 4,
+        }
+
+
+def test_cache_coherence_missing_generation(fast_cache, main_cache, get_cache):
+    cache = get_cache(coherence=True)
+    with request_cache_scope():
+        cache.set('user:1', 'value')
+
+    main_cache.delete('dinr-generation:user')
+    with request_cache_scope():
+        assert cache.get('user:1') == 'value'
+        assert 'dinr-generation:user' in main_cache.cache
+
+
+def test_cache_incr(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache()
+    main_cache.set('counter', 1)
+    fast_cache.set('counter', 1)
+    slow_incr = spy(main_cache, 'incr')
+    slow_get = spy(main_cache, 'get')
+    assert cache.incr('counter') == 2
+    assert cache.decr('counter', 5) == -3
+    assert cache.get('counter') == -3
+    assert slow_incr == [('counter', 1), ('counter', -5)]
+    assert fast_cache.get('counter') == -3
+    # fast cache refreshed from the results, counter read once by
+    # BaseCache.incr of MockCache for each call
+    assert len(slow_get) == 2
+
+    with pytest.raises(ValueError):
+        cache.incr('missing')
+
+    assert 'missing' not in fast_cache.cache
+
+
+def test_cache_touch(fast_cache, get_cache):
+    slow_cache = caches['shard_2']
+    slow_cache.clear()
+    cache = get_cache(cache_to_cache='shard_2', negative_timeout=10)
+    assert not cache.touch('key')
+    assert fast_cache.get('key') is None
+
+    cache.set('key', 'value', timeout=20)
+    # MockCache doesn't support touch, the fast copy is dropped
+    assert cache.touch('key', timeout=50)
+    assert 'key' not in fast_cache.cache
+    assert slow_cache.get('key') == 'value'
+
+    # outdated negative entry is dropped
+    assert cache.get('other') is None
+    assert fast_cache.cache['other'].value is CACHE_MISS
+    slow_cache.set('other', 'value')
+    assert cache.touch('other')
+    assert 'other' not in fast_cache.cache
+
+    caches['shard_1'].clear()
+    cache = get_cache(fast_cache='shard_1', cache_to_cache='shard_2')
+    cache.set('key', 'value', timeout=20)
+    assert cache.touch('key', timeout=0)
+    assert caches['shard_1'].get('key') is None
+    assert slow_cache.get('key') is None
+
+
+def test_cache_get_or_set_round_trips(fast_cache, main_cache, get_cache, spy):
+    cache = get_cache()
+    slow_get = spy(main_cache, 'get')
+    slow_add = spy(main_cache, 'add')
+    assert cache.get_or_set('key', lambda: 'value') == 'value'
+    assert cache.get_or_set('key', lambda: 'other') == 'value'
+    assert len(slow_get) == 1
+    assert len(slow_add) == 1
+
+
+def test_cache_coherence_out_of_request(fast_cache, main_cache, get_cache,
+                                        spy):
+    cache = get_cache(coherence=True, process_memo_timeout=0.05)
+    cache.set('user:1', 'value')
+    main_get_many = spy(main_cache, 'get_many')
+    for _ in range(5):
+        assert cache.get('user:1') == 'value'
+
+    # generations are memoized by the process out of request scope
+    assert len(main_get_many) == 0
+    # other process bumps the generation, it is seen when the memo expires
+    main_cache.incr('dinr-generation:user')
+    main_cache.set('user:1', 'value2')
+    assert cache.get('user:1') == 'value'
+    time.sleep(0.06)
+    assert cache.get('user:1') == 'value2'
+    assert len(main_get_many) == 1
+
+
+def test_cache_coherence_generations_per_slower_cache(fast_cache, main_cache,
+                                                      get_cache):
+    caches['other_fast_cache'].clear()
+    other_slow_cache = caches['shard_2']
+    other_slow_cache.clear()
+    cache = get_cache(coherence=True)
+    other_cache = get_cache(
+        coherence=True, fast_cache='other_fast_cache',
+        cache_to_cache='shard_2',
+    )
+    with request_cache_scope():
+        cache.set('user:1', 'value')
+        other_cache.set('user:1', 'old')
+
+    other_slow_cache.incr('dinr-generation:user')
+    other_slow_cache.set('user:1', 'new')
+    with request_cache_scope():
+        assert cache.get('user:1') == 'value'
+        assert other_cache.get_generations(['user:1'])['user'] == \
+            other_slow_cache.get('dinr-generation:user')
+        assert other_cache.get('user:1') == 'new'
@@ -0,0 +1,52 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import warnings
+
+from django_in_request_cache.cache import InRequestCache
+from django_in_request_cache.context import current_scope, \
+    request_cache_scope, RequestCacheScope
+from django_in_request_cache.middleware import RequestCacheMiddleware
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test request_cache_scope
+###############################################################################
+
+
+def test_request_cache_scope(no_global_request):
+    cache = InRequestCache(location=None, params={})
+    assert current_scope() is None
+    with request_cache_scope() as scope:
+        assert isinstance(scope, RequestCacheScope)
+        assert current_scope() is scope
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            cache.set('key', 'value')
+            assert cache.get('key') == 'value'
+
+        with request_cache_scope():
+            assert cache.get('key') is None
+
+        assert cache.get('key') == 'value'
+
+    assert current_scope() is None
+
+
+def test_middleware(no_global_request):
+    cache = InRequestCache(location=None, params={})
+    request = MockRequest()
+
+    def view(request):
+        cache.set('key', 'value')
+        return cache.get('key')
+
+    assert RequestCacheMiddleware(view)(request) == 'value'
+    assert current_scope() is None
+    assert getattr(request, cache.cache_name)
+
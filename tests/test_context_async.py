@@ -0,0 +1,67 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import asyncio
+
+from django.core.cache import caches
+
+from django_in_request_cache.aio import AsyncRequestCacheMiddleware
+from django_in_request_cache.cache import CacheACache, InRequestCache
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test AsyncRequestCacheMiddleware
+###############################################################################
+
+
+def test_async_middleware(no_global_request):
+    cache = InRequestCache(location=None, params={})
+
+    async def view(request):
+        assert cache.get('key') is None
+        cache.set('key', request.value)
+        await asyncio.sleep(0.01)
+        return cache.get('key')
+
+    async def main():
+        middleware = AsyncRequestCacheMiddleware(view)
+        requests = [MockRequest() for _ in range(3)]
+        for value, request in enumerate(requests):
+            request.value = value
+
+        return await asyncio.gather(*[
+            middleware(request) for request in requests
+        ])
+
+    assert asyncio.run(main()) == [0, 1, 2]
+
+
+def test_async_middleware_write_behind(no_global_request):
+    slow_cache = caches['shard_1']
+    slow_cache.clear()
+    cache = CacheACache(None, {
+        'FAST_CACHE': 'in_request_cache', 'CACHE_TO_CACHE': 'shard_1',
+        'WRITE_BEHIND': True,
+    })
+
+    async def view(request):
+        cache.set('key', 'value')
+        return slow_cache.get('key')
+
+    async def main():
+        # writes are flushed without request_finished signal
+        response = await AsyncRequestCacheMiddleware(view)(MockRequest())
+        for _ in range(100):
+            if slow_cache.get('key') is not None:
+                break
+
+            await asyncio.sleep(0.01)
+
+        return response, slow_cache.get('key')
+
+    assert asyncio.run(main()) == (None, 'value')
@@ -0,0 +1,81 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+from django_globals.middleware import Global
+
+from django_in_request_cache.decorators import request_memoize
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test request_memoize
+###############################################################################
+
+
+def test_memoize(global_request):
+    calls = []
+
+    @request_memoize('in_request_cache')
+    def func(a, b=None):
+        calls.append((a, b))
+        return None
+
+    assert func(1) is None
+    assert func(1) is None
+    assert func(1, b=2) is None
+    assert func(1, b=2) is None
+    assert calls == [(1, None), (1, 2)]
+    assert func.cache_info() == (2, 2)
+
+    Global().process_request(MockRequest())
+    assert func(1) is None
+    assert calls == [(1, None), (1, 2), (1, None)]
+
+
+def test_memoize_method(global_request):
+    calls = []
+
+    class Checker(object):
+        @request_memoize('in_request_cache', key=lambda self, perm: perm)
+        def has_perm(self, perm):
+            calls.append(perm)
+            return perm == 'view'
+
+    assert Checker().has_perm('view')
+    assert Checker().has_perm('view')
+    assert not Checker().has_perm('edit')
+    assert calls == ['view', 'edit']
+
+
+def test_memoize_unhashable(global_request):
+    calls = []
+
+    @request_memoize('in_request_cache')
+    def func(items):
+        calls.append(items)
+        return len(items)
+
+    assert func([1, 2]) == 2
+    assert func([1, 2]) == 2
+    assert len(calls) == 2
+
+
+def test_memoize_shared(global_request, main_cache):
+    calls = []
+
+    @request_memoize('in_request_cache', shared_alias='cache_a_cache')
+    def func(a):
+        calls.append(a)
+        return a * 2
+
+    assert func(2) == 4
+    assert len(main_cache.cache) == 1
+
+    Global().process_request(MockRequest())
+    assert func(2) == 4
+    assert calls == [2]
+    assert func.cache_info() == (0, 2)
@@ -0,0 +1,174 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import pickle
+import time
+
+import pytest
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from django_in_request_cache.cache import CacheACache, ObjectCache
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+def get_cache(safety='copy', **kwargs):
+    params = dict(safety=safety)
+    params.update(kwargs)
+    cache = ObjectCache('test-%s' % safety, params)
+    cache.clear()
+    return cache
+
+
+class Payload(object):
+    """
+    Value counting its unpickling
+    """
+    loads = 0
+
+    def __init__(self, data):
+        self.data = data
+
+    def __setstate__(self, state):
+        Payload.loads += 1
+        self.__dict__.update(state)
+
+
+###############################################################################
+#  Test ObjectCache
+###############################################################################
+
+
+def test_immutable():
+    cache = get_cache('immutable')
+    value = {'key': [1, 2]}
+    cache.set('key', value)
+    assert cache.get('key') is value
+    assert cache.get_many(['key', 'missing']) == {'key': value}
+
+
+def test_copy():
+    cache = get_cache('copy')
+    value = {'key': [1, 2]}
+    cache.set('key', value)
+    value['key'].append(3)
+    result = cache.get('key')
+    assert result == {'key': [1, 2]}
+    result['key'].append(4)
+    assert cache.get('key') == {'key': [1, 2]}
+
+
+def test_freeze():
+    cache = get_cache('freeze')
+    cache.set('key', {'key': [1, {2}], 'dict': {'a': 1}})
+    value = cache.get('key')
+    assert value['key'] == (1, frozenset([2]))
+    with pytest.raises(TypeError):
+        value['other'] = 1
+
+    with pytest.raises(TypeError):
+        value['dict']['a'] = 2
+
+
+def test_default_safety():
+    cache = ObjectCache('test-default', {})
+    cache.clear()
+    value = {'key': [1, 2]}
+    cache.set('key', value)
+    assert cache.get('key') == value
+    assert cache.get('key') is not value
+
+
+def test_invalid_safety():
+    with pytest.raises(ImproperlyConfigured):
+        get_cache('unsafe')
+
+
+def test_shared_by_location():
+    cache = get_cache()
+    cache.set('key', 'value')
+    assert ObjectCache('test-copy', {}).get('key') == 'value'
+    assert ObjectCache('other', {}).get('key') is None
+
+
+def test_timeout():
+    cache = get_cache()
+    cache.set('key', 'value', 0.05)
+    cache.set('forever', 'value', None)
+    assert cache.add('key', 'other') is False
+    assert cache.has_key('key')
+    time.sleep(0.06)
+    assert cache.get('key') is None
+    assert cache.add('key', 'other') is True
+    assert cache.touch('key', 10) is True
+    assert cache.touch('missing', 10) is False
+    assert cache.get('forever') == 'value'
+
+
+def test_max_entries():
+    cache = get_cache(max_entries=2)
+    cache.set('key', 1)
+    cache.set('key2', 2)
+    cache.get('key')
+    cache.set('key3', 3)
+    assert cache.get_many(['key', 'key2', 'key3']) == {'key': 1, 'key3': 3}
+
+
+def test_incr_and_delete():
+    cache = get_cache()
+    cache.set_many({'key': 1, 'key2': 2, 'key3': 3})
+    assert cache.incr('key', 2) == 3
+    assert cache.decr('key') == 2
+    with pytest.raises(ValueError):
+        cache.incr('missing')
+
+    cache.delete('key')
+    cache.delete_many(['key2', 'missing'])
+    assert cache.get_many(['key', 'key2', 'key3']) == {'key3': 3}
+
+
+def test_cache_a_cache_backfill(monkeypatch):
+    caches['object_cache'].clear()
+    slow_cache = caches['main_cache']
+    slow_cache.clear()
+    cache = CacheACache('objects', dict(
+        fast_cache='object_cache', cache_to_cache='main_cache'
+    ))
+    slow_cache.set('key', pickle.dumps(Payload([1, 2])))
+    # main_cache stores objects, its pickling is simulated
+    monkeypatch.setattr(
+        slow_cache, 'get', lambda key, default=None, version=None:
+        pickle.loads(slow_cache.cache[key].value)
+    )
+    Payload.loads = 0
+    first = cache.get('key')
+    assert cache.get('key') is first
+    assert cache.get('key') is first
+    assert Payload.loads == 1
+
+
+def test_cache_a_cache_freeze(monkeypatch):
+    fast_cache = caches['object_cache']
+    fast_cache.clear()
+    monkeypatch.setattr(fast_cache, 'safety', ObjectCache.FREEZE)
+    slow_cache = caches['main_cache']
+    slow_cache.clear()
+    cache = CacheACache('objects', dict(
+        fast_cache='object_cache', cache_to_cache='main_cache'
+    ))
+    slow_cache.set_many({'key': {'key': [1]}, 'key2': [2]})
+    # backfilled value has the same types as fast cache hits
+    first = cache.get('key')
+    assert first == cache.get('key') == {'key': (1,)}
+    assert type(first) is type(cache.get('key'))
+    assert cache.get_many(['key2']) == cache.get_many(['key2']) == {
+        'key2': (2,),
+    }
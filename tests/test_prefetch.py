@@ -0,0 +1,97 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import pytest
+from django.core.cache import caches
+
+from django_in_request_cache.decorators import prefetch_cache_keys
+from django_in_request_cache.middleware import CachePrefetchMiddleware, \
+    RequestCacheMiddleware
+from django_in_request_cache.prefetch import PrefetchRegistry, registry
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+class MockResolverMatch(object):
+    """
+    Mock django ResolverMatch object for testing purpose
+    """
+    view_name = 'view-name'
+
+
+@pytest.fixture()
+def main_cache(main_cache):
+    registry.clear()
+    return main_cache
+
+
+def call_view(view, *args):
+    def get_response(request):
+        request.resolver_match = MockResolverMatch()
+        prefetch.process_view(request, view, args, {})
+        return view(request, *args)
+
+    prefetch = CachePrefetchMiddleware(get_response)
+    return RequestCacheMiddleware(prefetch)(MockRequest())
+
+
+###############################################################################
+#  Test CachePrefetchMiddleware
+###############################################################################
+
+
+def test_registry():
+    registry = PrefetchRegistry(max_keys=2)
+    registry.learn('pattern', {'cache': ['a', 'b', 'c']})
+    assert registry.keys('pattern') == {'cache': []}
+    registry.learn('pattern', {'cache': ['a', 'b']})
+    registry.learn('pattern', {'cache': ['a', 'c']})
+    assert registry.keys('pattern') == {'cache': ['a', 'b']}
+    assert registry.keys('other') == {}
+
+
+def test_learned_prefetch(main_cache, spy):
+    main_cache.set('key', 'value')
+    main_cache.set('key2', 'value2')
+    calls = spy(main_cache, 'get_many')
+
+    def view(request):
+        cache = caches['prefetch_cache']
+        return [cache.get('key'), cache.get('key2'), cache.get('missing')]
+
+    assert call_view(view) == ['value', 'value2', None]
+    assert call_view(view) == ['value', 'value2', None]
+    assert calls == []
+
+    # third request prefetches keys read in both previous requests
+    assert call_view(view) == ['value', 'value2', None]
+    assert [sorted(args[0]) for args in calls] == [['key', 'key2', 'missing']]
+
+
+def test_declared_prefetch(main_cache, spy):
+    main_cache.set('key', 'value')
+    main_cache.set('user:1', 'user')
+    calls = spy(main_cache, 'get_many')
+
+    @prefetch_cache_keys('prefetch_cache', ['key'])
+    @prefetch_cache_keys(
+        'prefetch_cache', lambda request, pk: ['user:%s' % pk]
+    )
+    def view(request, pk):
+        cache = caches['prefetch_cache']
+        fast_cache = caches['in_request_cache']
+        assert fast_cache.get_many(['key', 'user:1']) == {
+            'key': 'value', 'user:1': 'user',
+        }
+        return cache.get('user:%s' % pk)
+
+    assert call_view(view, 1) == 'user'
+    assert [sorted(args[0]) for args in calls] == [['key', 'user:1']]
@@ -0,0 +1,173 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import json
+import os
+
+import pytest
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from django_in_request_cache.cache import CacheACache
+from django_in_request_cache.middleware import CacheProfileMiddleware, \
+    RequestCacheMiddleware
+from django_in_request_cache.profiler import cache_alias, cache_profile, \
+    install_profiler, key_pattern, uninstall_profiler
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+@pytest.fixture(autouse=True)
+def profiler():
+    yield
+    uninstall_profiler()
+
+
+@pytest.fixture()
+def cache():
+    caches['shard_1'].clear()
+    caches['shard_2'].clear()
+    return CacheACache(None, {
+        'FAST_CACHE': 'shard_1', 'CACHE_TO_CACHE': 'shard_2',
+    })
+
+
+def profile(view):
+    reports = []
+
+    def receiver(sender, request, report, **kwargs):
+        reports.append(report)
+
+    cache_profile.connect(receiver)
+    try:
+        RequestCacheMiddleware(CacheProfileMiddleware(view))(MockRequest())
+    finally:
+        cache_profile.disconnect(receiver)
+
+    assert len(reports) == 1
+    return reports[0]
+
+
+###############################################################################
+#  Test profiler
+###############################################################################
+
+
+def test_key_pattern():
+    assert key_pattern('user:12:profile') == 'user:*:profile'
+    assert key_pattern('page:d41d8cd98f00b204') == 'page:*'
+    assert key_pattern('settings') == 'settings'
+
+
+def test_repeated_reads(cache):
+    caches['shard_2'].set('settings', 'value')
+
+    def view(request):
+        cache.get('settings')
+        cache.get('settings')
+        cache.get_many(iter(['settings', 'missing']))
+        cache.set('other', 1)
+
+    report = profile(view)
+    assert [call['method'] for call in report['calls']] == [
+        'get', 'get', 'get_many', 'set',
+    ]
+    first, second = report['calls'][:2]
+    assert first['alias'] == 'CacheACache'
+    assert first['tier'] == 'shard_2'
+    assert second['tier'] == 'shard_1'
+    assert first['site'].endswith('test_profiler.py:%s view' % (
+        view.__code__.co_firstlineno + 1
+    ))
+    assert report['repeated_reads'] == [{
+        'alias': 'CacheACache', 'key': 'settings', 'count': 3,
+        'tiers': ['shard_1', 'shard_2'],
+    }]
+    assert report['batchable'] == []
+    assert report['path'] == '/path/'
+    assert 0 < report['cache_time'] <= report['request_time']
+    assert 0 < report['cache_share'] <= 1
+
+
+def test_batchable_reads(cache):
+    def view(request):
+        for pk in range(5):
+            cache.get('user:%s' % pk)
+
+        for pk in range(2):
+            cache.get('group:%s' % pk)
+
+    report = profile(view)
+    assert len(report['batchable']) == 1
+    assert report['batchable'][0]['pattern'] == 'user:*'
+    assert report['batchable'][0]['count'] == 5
+    assert report['repeated_reads'] == []
+
+
+def test_in_request_cache_reads_not_repeated():
+    cache = caches['in_request_cache']
+
+    def view(request):
+        cache.set('key', 1)
+        cache.get('key')
+        cache.get('key')
+
+    report = profile(view)
+    assert report['repeated_reads'] == []
+    assert len(report['calls']) == 3
+
+
+def test_profile_dump(settings, tmpdir, cache):
+    settings.IN_REQUEST_CACHE_PROFILE_DIR = str(tmpdir)
+    profile(lambda request: cache.get('key'))
+
+    path = os.path.join(str(tmpdir), 'cache-profile-%s.jsonl' % os.getpid())
+    with open(path) as dump:
+        lines = dump.readlines()
+
+    assert len(lines) == 1
+    assert json.loads(lines[0])['calls'][0]['keys'] == ['key']
+
+
+def test_profile_rate(settings, cache):
+    settings.IN_REQUEST_CACHE_PROFILE_RATE = 0
+    reports = []
+
+    def receiver(sender, request, report, **kwargs):
+        reports.append(report)
+
+    cache_profile.connect(receiver)
+    try:
+        middleware = CacheProfileMiddleware(lambda request: cache.get('key'))
+        RequestCacheMiddleware(middleware)(MockRequest())
+    finally:
+        cache_profile.disconnect(receiver)
+
+    assert reports == []
+
+
+def test_cache_alias():
+    cache = caches['shard_1']
+    created = caches._caches.caches
+    created.pop('shard_3', None)
+    assert cache_alias(cache) == 'shard_1'
+    assert cache_alias(LocMemCache('other', {})) == 'LocMemCache'
+    # aliases not used by the thread are not created
+    assert 'shard_3' not in created
+
+
+def test_uninstall_profiler():
+    install_profiler()
+    assert LocMemCache.get.dinr_profiled
+    assert 'get_or_set' in vars(LocMemCache)  # inherited method is wrapped
+    uninstall_profiler()
+    assert not hasattr(LocMemCache.get, 'dinr_profiled')
+    assert 'get_or_set' not in vars(LocMemCache)
@@ -0,0 +1,135 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import threading
+import time
+
+import pytest
+
+from django_in_request_cache import refresh
+from django_in_request_cache.cache import CacheACache
+from tests.test_cache_a_cache import MockCache
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+@pytest.fixture()
+def tiers(monkeypatch, no_global_request):
+    refresh._deadlines.clear()
+    fast_cache = MockCache('fast', {})
+    slow_cache = MockCache('slow', {})
+    monkeypatch.setattr(
+        CacheACache, 'fast_cache', property(lambda self: fast_cache)
+    )
+    monkeypatch.setattr(
+        CacheACache, 'cache', property(lambda self: slow_cache)
+    )
+    return fast_cache, slow_cache
+
+
+@pytest.fixture()
+def cache_params():
+    return dict(
+        location='refresh',
+        fast_cache_max_timeout=10,
+        refresh_ahead=0.5,
+    )
+
+
+def expire_in(cache, key, seconds):
+    flight = (cache.name, key, None)
+    _, timeout = refresh._deadlines[flight]
+    refresh._deadlines[flight] = (time.time() + seconds, timeout)
+
+
+def wait_for_refresh():
+    for _ in range(100):
+        if not refresh._pending:
+            return
+
+        time.sleep(0.01)
+
+
+###############################################################################
+#  Test refresh ahead
+###############################################################################
+
+
+def test_refresh_ahead(tiers, get_cache):
+    fast_cache, slow_cache = tiers
+    cache = get_cache()
+    slow_cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    slow_cache.set('key', 'new value')
+
+    # fresh entry isn't refreshed
+    assert cache.get('key') == 'value'
+    wait_for_refresh()
+    assert fast_cache.get('key') == 'value'
+
+    expire_in(cache, 'key', 0)
+    assert cache.get('key') == 'value'
+    wait_for_refresh()
+    assert fast_cache.get('key') == 'new value'
+    assert cache.get_many(['key']) == {'key': 'new value'}
+
+
+def test_refresh_ahead_probability(monkeypatch, tiers, get_cache):
+    cache = get_cache()
+    cache.refresh_ahead.record(['key'], 10)
+    expire_in(cache, 'key', 2.5)  # half of the window is left
+    monkeypatch.setattr(refresh.random, 'random', lambda: 0.1)
+    assert not cache.refresh_ahead.due('key')
+    monkeypatch.setattr(refresh.random, 'random', lambda: 0.9)
+    assert cache.refresh_ahead.due('key')
+    expire_in(cache, 'key', 6)  # out of the window
+    assert not cache.refresh_ahead.due('key')
+
+
+def test_refresh_ahead_deduplication(monkeypatch, tiers, get_cache):
+    cache = get_cache(refresh_max_pending=2)
+    release = threading.Event()
+    monkeypatch.setattr(
+        CacheACache, 'refresh', lambda self, key, version: release.wait(1)
+    )
+    try:
+        assert cache.refresh_ahead.schedule('key')
+        assert not cache.refresh_ahead.schedule('key')
+        assert cache.refresh_ahead.schedule('key2')
+        assert not cache.refresh_ahead.schedule('key3')
+    finally:
+        release.set()
+
+    wait_for_refresh()
+    assert cache.refresh_ahead.schedule('key3')
+    wait_for_refresh()
+
+
+def test_refresh_ahead_missing_key(tiers, get_cache):
+    fast_cache, slow_cache = tiers
+    cache = get_cache(negative_timeout=5)
+    slow_cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    slow_cache.delete('key')
+    cache.refresh('key')
+    assert cache.get('key') is None
+    assert slow_cache.get('key') is None
+
+
+def test_refresh_ahead_request_scoped_fast_cache(get_cache):
+    with pytest.warns(UserWarning, match='REFRESH_AHEAD is disabled'):
+        cache = get_cache(fast_cache='in_request_cache')
+
+    assert cache.refresh_ahead is None
+    with pytest.warns(UserWarning, match='REFRESH_AHEAD is disabled'):
+        cache = get_cache(tiers=['fast_cache', 'in_request_cache', 'shard_1'])
+
+    assert cache.refresh_ahead is None
+    assert get_cache().refresh_ahead is not None
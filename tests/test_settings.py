@@ -25,4 +25,39 @@ CACHES = dict(
             'TIMEOUT': 100,
         },
     },
+    other_fast_cache={
+        'BACKEND': 'tests.test_cache_a_cache.MockCache',
+        'LOCATION': 'other_fast_cache',
+    },
+    in_request_cache={
+        'BACKEND': 'django_in_request_cache.cache.InRequestCache',
+    },
+    object_cache={
+        'BACKEND': 'django_in_request_cache.cache.ObjectCache',
+        'LOCATION': 'object_cache',
+        'SAFETY': 'immutable',
+    },
+    prefetch_cache={
+        'BACKEND': 'django_in_request_cache.cache.CacheACache',
+        'FAST_CACHE': 'in_request_cache',
+        'CACHE_TO_CACHE': 'main_cache',
+        'PREFETCH': True,
+    },
+    shard_1={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shard_1',
+    },
+    shard_2={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shard_2',
+    },
+    shard_3={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shard_3',
+    },
+    cache_a_cache={
+        'BACKEND': 'django_in_request_cache.cache.CacheACache',
+        'FAST_CACHE': 'fast_cache',
+        'CACHE_TO_CACHE': 'main_cache',
+    },
 )
@@ -0,0 +1,100 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import pytest
+from django.core.cache import caches
+
+from django_in_request_cache.cache import CacheACache
+from django_in_request_cache.shards import HashRing, ShardedCache
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+SHARDS = ['shard_1', 'shard_2', 'shard_3']
+
+
+@pytest.fixture()
+def shards():
+    for alias in SHARDS:
+        caches[alias].clear()
+
+    caches['fast_cache'].clear()
+    return [caches[alias] for alias in SHARDS]
+
+
+def shard_keys(shard):
+    return sorted(key.split(':')[-1] for key in shard._cache)
+
+
+###############################################################################
+#  Test HashRing
+###############################################################################
+
+
+def test_hash_ring_distribution():
+    ring = HashRing(SHARDS)
+    keys = ['key-%s' % i for i in range(3000)]
+    groups = ring.split(keys)
+    assert sorted(groups) == SHARDS
+    for node_keys in groups.values():
+        assert 700 < len(node_keys) < 1300
+
+    assert ring.get_node('key-1') == HashRing(SHARDS).get_node('key-1')
+
+
+def test_hash_ring_add_node():
+    keys = ['key-%s' % i for i in range(3000)]
+    ring = HashRing(SHARDS)
+    bigger_ring = HashRing(SHARDS + ['shard_4'])
+    moved = [key for key in keys if ring.get_node(key) !=
+             bigger_ring.get_node(key)]
+    assert all(bigger_ring.get_node(key) == 'shard_4' for key in moved)
+    assert len(moved) < len(keys) * 0.35
+
+
+###############################################################################
+#  Test ShardedCache
+###############################################################################
+
+
+def test_sharded_cache(shards):
+    cache = ShardedCache(SHARDS)
+    data = dict(('key-%s' % i, i) for i in range(30))
+    assert cache.set_many(data) == []
+    for shard in shards:
+        assert shard_keys(shard)
+        for key in shard_keys(shard):
+            assert cache.ring.get_node(key) == SHARDS[shards.index(shard)]
+
+    assert cache.get_many(list(data) + ['missing']) == data
+    cache.delete_many(['key-%s' % i for i in range(10)])
+    assert len(cache.get_many(list(data))) == 20
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    assert cache.add('key', 'other') is False
+    cache.delete('key')
+    assert cache.get('key') is None
+    cache.clear()
+    assert not any(shard_keys(shard) for shard in shards)
+
+
+def test_cache_a_cache_shards(shards):
+    cache = CacheACache(None, dict(
+        fast_cache='fast_cache', shards=SHARDS,
+    ))
+    assert cache.name == 'fast_cache+shard_1,shard_2,shard_3'
+    cache.set_many({'key': 'value', 'key2': 'value2'})
+    caches['fast_cache'].clear()
+    assert cache.get_many(['key', 'key2']) == {
+        'key': 'value', 'key2': 'value2'
+    }
+    cache.set('key3', 'value3')
+    shard = caches[cache.shards.ring.get_node('key3')]
+    assert shard.get('key3') == 'value3'
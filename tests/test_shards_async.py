@@ -0,0 +1,50 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import asyncio
+
+import pytest
+from django.core.cache import caches
+
+from django_in_request_cache.shards import ShardedCache
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+SHARDS = ['shard_1', 'shard_2', 'shard_3']
+
+
+@pytest.fixture()
+def shards():
+    for alias in SHARDS:
+        caches[alias].clear()
+
+    return [caches[alias] for alias in SHARDS]
+
+
+###############################################################################
+#  Test ShardedCache
+###############################################################################
+
+
+def test_sharded_cache_async(shards):
+    cache = ShardedCache(SHARDS)
+    data = dict(('key-%s' % i, i) for i in range(30))
+
+    async def main():
+        await cache.aset_many(data)
+        await cache.aset('key', 'value')
+        await cache.adelete_many(['key-0'])
+        return await cache.aget_many(list(data)), await cache.aget('key')
+
+    found, value = asyncio.run(main())
+    assert len(found) == 29
+    assert value == 'value'
+
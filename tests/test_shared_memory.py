@@ -0,0 +1,203 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import multiprocessing
+import os
+import stat
+import threading
+import time
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from django_in_request_cache.shared_memory import SharedMemoryCache, SLOT
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+@pytest.fixture()
+def location(tmp_path):
+    return str(tmp_path / 'segment')
+
+
+def get_cache(location, **kwargs):
+    params = dict(size=64 * 1024, slot_size=512)
+    params.update(kwargs)
+    return SharedMemoryCache(location, params)
+
+
+def write_in_process(location, key, value):
+    get_cache(location).set(key, value)
+
+
+###############################################################################
+#  Test SharedMemoryCache
+###############################################################################
+
+
+def test_set_get(location):
+    cache = get_cache(location)
+    cache.set('key', {'value': [1, 2]})
+    assert cache.get('key') == {'value': [1, 2]}
+    assert cache.get('missing', 'default') == 'default'
+    assert cache.add('key', 'other') is False
+    assert cache.add('key2', 'value2') is True
+    assert cache.get_many(['key2', 'missing']) == {'key2': 'value2'}
+    assert cache.has_key('key2')
+    cache.delete('key2')
+    assert cache.get('key2') is None
+    cache.clear()
+    assert cache.get('key') is None
+
+
+def test_timeout(location):
+    cache = get_cache(location)
+    cache.set('key', 'value', 0.05)
+    cache.set('forever', 'value', None)
+    time.sleep(0.06)
+    assert cache.get('key') is None
+    assert cache.add('key', 'value2') is True
+    assert cache.touch('key', 0.05) is True
+    assert cache.touch('missing') is False
+    assert cache.get('forever') == 'value'
+
+
+def test_incr(location):
+    cache = get_cache(location)
+    cache.set('key', 1)
+    assert cache.incr('key', 2) == 3
+    assert cache.decr('key') == 2
+    with pytest.raises(ValueError):
+        cache.incr('missing')
+
+
+def test_incr_overflow(location):
+    cache = get_cache(location, slot_size=64)
+    cache.set('neighbour', 'value')
+    cache.set('key', 1)
+    assert cache.incr('key', 2 ** 64) == 2 ** 64 + 1
+    with pytest.raises(ValueError):
+        cache.incr('key', 2 ** 512)
+
+    # value which outgrew its slot is deleted, other slots are intact
+    assert cache.get('key') is None
+    assert cache.get('neighbour') == 'value'
+
+
+def test_value_size_cap(location):
+    cache = get_cache(location, max_value_size=100)
+    cache.set('key', 'value')
+    cache.set('key', 'x' * 200)
+    assert cache.get('key') is None
+    assert cache.add('key', 'x' * 1000) is False
+
+
+def test_bucket_eviction(location):
+    cache = get_cache(location, size=64 + 4 * 512, ways=4)
+    assert cache.segment.buckets == 1
+    for index in range(4):
+        cache.set('key-%s' % index, index, 10 + index)
+
+    cache.set('key-4', 4)
+    assert cache.get_many(['key-%s' % index for index in range(5)]) == {
+        'key-1': 1, 'key-2': 2, 'key-3': 3, 'key-4': 4,
+    }
+
+
+def test_too_small(location):
+    with pytest.raises(ImproperlyConfigured):
+        get_cache(location, size=1024, slot_size=512)
+
+    with pytest.raises(ImproperlyConfigured):
+        get_cache(location, slot_size=SLOT.size)
+
+
+def test_shared_by_processes(location):
+    cache = get_cache(location)
+    context = multiprocessing.get_context('fork')
+    process = context.Process(
+        target=write_in_process, args=(location, 'key', 'from child')
+    )
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+    assert cache.get('key') == 'from child'
+
+
+def test_concurrent_writes(location):
+    cache = get_cache(location)
+    values = [['a'] * 10, ['b'] * 50]
+    cache.set('key', values[0])
+    stop = threading.Event()
+
+    def write(value):
+        while not stop.is_set():
+            get_cache(location).set('key', value)
+
+    threads = [
+        threading.Thread(target=write, args=(value,)) for value in values
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for _ in range(2000):
+            assert cache.get('key') in values + [None]
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_location_required():
+    with pytest.raises(ImproperlyConfigured):
+        SharedMemoryCache('', {})
+
+
+def test_private_directory(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    cache = SharedMemoryCache('private', dict(size=64 * 1024, slot_size=512))
+    directory = os.path.dirname(cache.segment.path)
+    assert directory == str(tmp_path / ('dinr-%s' % os.geteuid()))
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(cache.segment.path).st_mode) == 0o600
+
+    os.chmod(directory, 0o755)
+    with pytest.raises(ImproperlyConfigured):
+        SharedMemoryCache('other', {})
+
+
+def test_planted_file_refused(location, tmp_path):
+    # file accessible by others
+    with open(location, 'wb') as planted:
+        planted.write(b'planted')
+
+    os.chmod(location, 0o644)
+    with pytest.raises(ImproperlyConfigured):
+        get_cache(location)
+
+    # symlink to file of the user
+    target = str(tmp_path / 'target')
+    get_cache(target)
+    link = str(tmp_path / 'link')
+    os.symlink(target, link)
+    with pytest.raises(ImproperlyConfigured):
+        get_cache(link)
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason='chown requires root')
+def test_file_of_other_user_refused(location):
+    with open(location, 'wb'):
+        pass
+
+    os.chmod(location, 0o600)
+    os.chown(location, 12345, -1)
+    with pytest.raises(ImproperlyConfigured):
+        get_cache(location)
@@ -0,0 +1,121 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import pytest
+from django.core.cache import caches
+
+from django_in_request_cache.cache import InRequestCache
+from django_in_request_cache.context import request_cache_scope
+from django_in_request_cache.middleware import CacheStatsMiddleware, \
+    RequestCacheMiddleware
+from django_in_request_cache.stats import cache_stats, format_summary, \
+    get_stats, reset_stats, LatencyHistogram
+
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+@pytest.fixture(autouse=True)
+def clean_caches(main_cache):
+    reset_stats()
+
+
+@pytest.fixture()
+def cache_params():
+    return dict(location='stats', stats=True)
+
+
+###############################################################################
+#  Test cache statistics
+###############################################################################
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    histogram.observe(0.00001)
+    histogram.observe(0.0003)
+    histogram.observe(5)
+    data = histogram.as_dict()
+    assert data['count'] == 3
+    assert data['buckets']['5e-05'] == 1
+    assert data['buckets']['0.0005'] == 1
+    assert data['buckets']['+Inf'] == 1
+
+
+def test_stats_disabled(get_cache):
+    cache = get_cache(stats=False)
+    assert cache.stats is None
+    assert cache.fast_cache is caches['fast_cache']
+    cache.get('key')
+    assert get_stats() == {}
+
+
+def test_cache_a_cache_stats(get_cache):
+    cache = get_cache(negative_timeout=5)
+    caches['main_cache'].set('key', 'value')
+    assert cache.get('key') == 'value'
+    assert cache.get('key') == 'value'
+    assert cache.get('missing') is None
+    assert cache.get('missing') is None
+    caches['main_cache'].set('key2', 'value2')
+    assert cache.get_many(['key', 'key2', 'missing', 'missing2']) == {
+        'key': 'value', 'key2': 'value2',
+    }
+
+    stats = get_stats('stats')
+    counters = stats['counters']
+    assert counters['fast_hit'] == 2
+    assert counters['slow_hit'] == 2
+    assert counters['miss'] == 2
+    assert counters['negative_hit'] == 2
+    assert counters['backfill'] == 2
+    assert counters['slow_bytes'] > 0
+    assert stats['latency']['fast']['count'] == 9
+    assert stats['latency']['slow']['count'] == 3
+
+
+def test_in_request_cache_stats():
+    cache = InRequestCache(location='_stats_cache', params={'STATS': True})
+    with request_cache_scope():
+        cache.set('key', 'value')
+        cache.get('key')
+        cache.get('missing')
+        cache.get_many(iter(['key', 'missing']))
+
+    assert get_stats('_stats_cache')['counters'] == {'hit': 2, 'miss': 2}
+
+
+def test_stats_middleware(settings, get_cache):
+    settings.IN_REQUEST_CACHE_STATS_HEADER = 'X-Cache-Stats'
+    cache = get_cache()
+    caches['main_cache'].set('key', 'value')
+    signals = []
+
+    def receiver(sender, request, stats, **kwargs):
+        signals.append(stats)
+
+    def view(request):
+        cache.get('key')
+        cache.get('key')
+        return {}
+
+    cache_stats.connect(receiver)
+    try:
+        middleware = RequestCacheMiddleware(CacheStatsMiddleware(view))
+        response = middleware(MockRequest())
+    finally:
+        cache_stats.disconnect(receiver)
+
+    assert len(signals) == 1
+    assert signals[0]['stats']['fast_hit'] == 1
+    assert signals[0]['stats']['slow_hit'] == 1
+    assert response['X-Cache-Stats'] == format_summary(signals[0])
+    assert response['X-Cache-Stats'].startswith('stats;backfill=1;')
@@ -0,0 +1,75 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import time
+
+from django_in_request_cache.cache import CacheItem
+from django_in_request_cache.store import LRUStore, approximate_size
+
+
+###############################################################################
+#  Test LRUStore
+###############################################################################
+
+
+def test_approximate_size():
+    assert approximate_size('x' * 1000) > 1000
+    assert approximate_size(['x' * 1000] * 3) > 3000
+    assert approximate_size({'key': 'x' * 1000}) > 1000
+
+
+def test_store_max_entries():
+    expire_at = time.time() + 10
+    store = LRUStore(max_entries=2)
+    store['a'] = CacheItem(1, expire_at)
+    store['b'] = CacheItem(2, expire_at)
+    assert store['a'].value == 1  # b is least recently used now
+    store['c'] = CacheItem(3, expire_at)
+    assert sorted(store) == ['a', 'c']
+    assert store.evictions == 1
+
+
+def test_store_max_bytes():
+    expire_at = time.time() + 10
+    store = LRUStore(max_bytes=3000)
+    store['a'] = CacheItem('x' * 1000, expire_at)
+    store['b'] = CacheItem('x' * 1000, expire_at)
+    assert store.size > 2000
+    store['c'] = CacheItem('x' * 1000, expire_at)
+    assert sorted(store) == ['b', 'c']
+    assert store.size < 3000
+
+    del store['b']
+    assert store.size < 2000
+    assert store.evictions == 1
+
+
+def test_store_purge_expired():
+    now = time.time()
+    store = LRUStore(max_entries=3)
+    store['expired'] = CacheItem(1, now - 1)
+    store['a'] = CacheItem(2, now + 10)
+    assert list(store) == ['a']
+
+    store['b'] = CacheItem(3, now + 10)
+    store['expired'] = CacheItem(4, now + 0.05)
+    time.sleep(0.06)
+    store['c'] = CacheItem(5, now + 10)
+    assert sorted(store) == ['a', 'b', 'c']
+    assert store.evictions == 0
+
+
+def test_store_expirations_bounded():
+    expire_at = time.time() + 10
+    store = LRUStore(max_entries=10)
+    for index in range(1000):
+        store['key-%s' % (index % 20)] = CacheItem(index, expire_at)
+
+    # heap entries of overwritten and evicted items are dropped
+    assert len(store) == 10
+    assert len(store.expirations) <= 2 * len(store) + 64
+    assert store.evictions == 990
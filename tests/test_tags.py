@@ -0,0 +1,190 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import pickle
+
+from django.core.cache import caches
+
+from django_in_request_cache.context import request_cache_scope
+from django_in_request_cache.tags import tag_key, TaggedValue
+
+
+###############################################################################
+#  Test TaggedValue
+###############################################################################
+
+
+def test_tagged_value_pickle():
+    value = pickle.loads(pickle.dumps(TaggedValue([1, 2], {'user': 5})))
+    assert value.value == [1, 2]
+    assert value.tags == {'user': 5}
+
+
+###############################################################################
+#  Test InRequestCache
+###############################################################################
+
+
+def test_in_request_cache_invalidate_tags():
+    cache = caches['in_request_cache']
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'])
+        cache.set_many({'b': 2, 'c': 3}, tags=['user', 'group'])
+        cache.add('d', 4, tags=['group'])
+        cache.set('e', 5)
+
+        cache.invalidate_tags(['user'])
+        assert cache.get_many(['a', 'b', 'c', 'd', 'e']) == {'d': 4, 'e': 5}
+
+        cache.invalidate_tags(['group', 'unknown'])
+        assert cache.get_many(['a', 'b', 'c', 'd', 'e']) == {'e': 5}
+
+
+def test_in_request_cache_overwrite_drops_tags():
+    cache = caches['in_request_cache']
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'])
+        cache.set_many({'b': 2, 'c': 3}, tags=['user'])
+        cache.set('d', 4, tags=['user'])
+        cache.set('a', 5)  # untagged value replaces tagged one
+        cache.set_many({'b': 6})
+        cache.set('d', 7, tags=['group'])
+        cache.delete('c')
+        cache.set('c', 8)
+
+        cache.invalidate_tags(['user'])
+        assert cache.get_many(['a', 'b', 'c', 'd']) == {
+            'a': 5, 'b': 6, 'c': 8, 'd': 7,
+        }
+
+        cache.invalidate_tags(['group'])
+        assert cache.get('d') is None
+
+
+###############################################################################
+#  Test CacheACache
+###############################################################################
+
+
+def test_invalidate_tags(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'])
+        cache.set_many({'b': 2, 'c': 3}, tags=['group'])
+        assert cache.add('d', 4, tags=['user', 'group'])
+        assert cache.get('a') == 1
+        assert cache.get_many(['a', 'b', 'c', 'd']) == {
+            'a': 1, 'b': 2, 'c': 3, 'd': 4,
+        }
+
+        cache.invalidate_tags(['user'])
+        assert cache.get('a') is None
+        assert cache.get_many(['a', 'b', 'c', 'd']) == {'b': 2, 'c': 3}
+
+    with request_cache_scope():
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        cache.set('a', 6, tags=['user'])
+        assert cache.get('a') == 6
+
+
+def test_invalidate_tags_other_process(main_cache, get_cache):
+    cache = get_cache()
+    other_cache = get_cache(fast_cache='other_fast_cache')
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'])
+        assert other_cache.get('a') == 1
+
+    with request_cache_scope():
+        cache.invalidate_tags(['user'])
+
+    with request_cache_scope():
+        # stale copy in fast cache of other process is detected
+        assert other_cache.get('a') is None
+        assert other_cache.get_many(['a']) == {}
+
+
+def test_tag_stamps_fetched_once(main_cache, get_cache, spy):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set_many({'a': 1, 'b': 2}, tags=['user', 'group'])
+
+    calls = spy(main_cache, 'get_many')
+    with request_cache_scope():
+        assert cache.get('a') == 1
+        assert cache.get('b') == 2
+        assert cache.get_many(['a', 'b']) == {'a': 1, 'b': 2}
+
+    assert [sorted(args[0]) for args in calls] == [
+        [tag_key('group'), tag_key('user')],
+    ]
+
+
+def test_missing_tag_stamp(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'])
+
+    # evicted stamp invalidates values of the tag
+    main_cache.delete(tag_key('user'))
+    with request_cache_scope():
+        assert cache.get('a') is None
+        assert tag_key('user') in main_cache.cache
+
+
+def test_invalidate_missing_tag(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.invalidate_tags(['user'])
+        assert tag_key('user') in main_cache.cache
+        cache.set('a', 1, tags=['user'])
+        assert cache.get('a') == 1
+
+
+def test_tags_write_behind(main_cache, get_cache):
+    cache = get_cache(write_behind=True)
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'])
+        caches['fast_cache'].clear()
+        assert cache.get('a') == 1
+
+        cache.invalidate_tags(['user'])
+        caches['fast_cache'].clear()
+        assert cache.get('a') is None
+
+    with request_cache_scope():
+        assert cache.get('a') is None
+
+
+def test_tag_stamps_per_slower_cache(main_cache, get_cache):
+    other_slow_cache = caches['shard_2']
+    other_slow_cache.clear()
+    cache = get_cache()
+    other_cache = get_cache(
+        fast_cache='other_fast_cache', cache_to_cache='shard_2'
+    )
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'])
+        other_cache.set('a', 2, tags=['user'])
+
+    other_slow_cache.incr(tag_key('user'))
+    with request_cache_scope():
+        assert cache.get('a') == 1
+        assert other_cache.get_tag_stamps(['user'])['user'] == \
+            other_slow_cache.get(tag_key('user'))
+        assert other_cache.get('a') is None
+
+
+def test_tag_stamps_per_version(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set('a', 1, tags=['user'], version=2)
+        cache.invalidate_tags(['user'], version=3)
+        # stamp of other key version is unchanged
+        assert cache.get('a', version=2) == 1
+        cache.invalidate_tags(['user'], version=2)
+        assert cache.get('a', version=2) is None
@@ -0,0 +1,180 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_finished
+
+from django_in_request_cache.cache import CacheACache, CacheItem, \
+    InRequestCache
+from django_in_request_cache.context import current_scope, \
+    request_cache_scope
+from django_in_request_cache.middleware import RequestCacheMiddleware
+from django_in_request_cache.store import RequestStore, SharedLRUStore
+from django_in_request_cache.threads import is_shared, \
+    RequestCacheExecutor, submit_in_request
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+@pytest.fixture()
+def executor(no_global_request):
+    with ThreadPoolExecutor(4) as executor:
+        yield executor
+
+
+@pytest.fixture()
+def slow_cache():
+    cache = caches['shard_1']
+    cache.clear()
+    return cache
+
+
+###############################################################################
+#  Test submit_in_request
+###############################################################################
+
+
+def test_submit_in_request(executor):
+    cache = caches['in_request_cache']
+
+    def load(key):
+        value = cache.get(key)
+        cache.set('%s:seen' % key, value)
+        return value
+
+    with request_cache_scope() as scope:
+        cache.set('a', 1)
+        assert submit_in_request(executor, load, 'a').result() == 1
+        assert cache.get('a:seen') == 1
+        assert is_shared(scope)
+
+    assert executor.submit(current_scope).result() is None
+
+
+def test_submit_out_of_request(executor):
+    assert submit_in_request(executor, current_scope).result() is None
+
+
+def test_executor_map(executor):
+    cache = caches['in_request_cache']
+    executor = RequestCacheExecutor(executor)
+    with request_cache_scope():
+        results = executor.map(
+            lambda key, value: cache.set(key, value) or key,
+            ['a', 'b', 'c'], [1, 2, 3]
+        )
+        assert list(results) == ['a', 'b', 'c']
+        assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_shared_lru_store(executor):
+    cache = InRequestCache(None, {'MAX_ENTRIES': 50})
+    with request_cache_scope():
+        cache.set('a', 1)
+        futures = [
+            submit_in_request(executor, cache.set, 'key-%s' % i, i)
+            for i in range(100)
+        ]
+        for future in futures:
+            future.result()
+
+        store = cache.cache
+        assert type(store) is SharedLRUStore
+        assert len(store) == 50
+        assert cache.get('key-99') == 99
+
+
+def test_shared_store_initialized_once(executor):
+    cache = InRequestCache(None, {'MAX_ENTRIES': 50})
+    barrier = threading.Barrier(4)
+
+    def set_value(i):
+        barrier.wait()
+        cache.set('key-%s' % i, i)
+
+    with request_cache_scope():
+        # the store is created by worker threads
+        submit_in_request(executor, time.sleep, 0).result()
+        for future in [
+            submit_in_request(executor, set_value, i) for i in range(4)
+        ]:
+            future.result()
+
+        assert cache.get_many(['key-%s' % i for i in range(4)]) == {
+            'key-0': 0, 'key-1': 1, 'key-2': 2, 'key-3': 3,
+        }
+
+
+def test_request_store_purge_empty_heap():
+    store = RequestStore()
+    store.purge(time.time())
+    store['a'] = CacheItem(1, 1)
+    store.expire('a', 1, 0)
+    store.purge(2)
+    assert 'a' not in store
+
+
+###############################################################################
+#  Test CacheACache
+###############################################################################
+
+
+def test_coalesced_slow_reads(monkeypatch, executor, slow_cache):
+    slow_cache.set('a', 'value')
+    cache = CacheACache(None, {
+        'FAST_CACHE': 'in_request_cache', 'CACHE_TO_CACHE': 'shard_1',
+    })
+    calls = []
+    original = LocMemCache.get
+
+    def get(self, key, default=None, version=None):
+        calls.append(key)
+        time.sleep(0.05)
+        return original(self, key, default=default, version=version)
+
+    monkeypatch.setattr(LocMemCache, 'get', get)
+    barrier = threading.Barrier(4)
+
+    def load(key):
+        barrier.wait()
+        return cache.get(key)
+
+    with request_cache_scope():
+        futures = [submit_in_request(executor, load, 'a') for _ in range(4)]
+        assert [future.result() for future in futures] == ['value'] * 4
+        assert cache.get('a') == 'value'
+
+    assert calls == ['a']
+
+
+def test_shared_write_behind(executor, slow_cache):
+    cache = CacheACache(None, {
+        'FAST_CACHE': 'in_request_cache', 'CACHE_TO_CACHE': 'shard_1',
+        'WRITE_BEHIND': True,
+    })
+
+    def view(request):
+        # the first write to the buffer is made by worker thread
+        submit_in_request(executor, cache.set, 'k', 'value').result()
+        cache.set('k2', 'value2')
+        assert not slow_cache.has_key('k')
+        return 'response'
+
+    assert RequestCacheMiddleware(view)(MockRequest()) == 'response'
+    request_finished.send(sender=None)
+    assert slow_cache.get('k') == 'value'
+    assert slow_cache.get('k2') == 'value2'
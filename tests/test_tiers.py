@@ -0,0 +1,157 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import pytest
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from django_in_request_cache.cache import CacheACache
+from django_in_request_cache.store import CACHE_MISS
+from django_in_request_cache.tiers import Tier, TierChain
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+@pytest.fixture()
+def tiers():
+    aliases = ('fast_cache', 'other_fast_cache', 'main_cache')
+    for alias in aliases:
+        caches[alias].clear()
+
+    return [caches[alias] for alias in aliases]
+
+
+def tier_list(first=None, second=None):
+    return [
+        dict(first or {}, cache='fast_cache', max_timeout=5),
+        dict(second or {}, cache='other_fast_cache', max_timeout=20),
+        'main_cache',
+    ]
+
+
+@pytest.fixture()
+def cache_params():
+    return dict(location='tiers', tiers=tier_list())
+
+
+###############################################################################
+#  Test tiers
+###############################################################################
+
+
+def test_tiers_config(get_cache):
+    cache = get_cache()
+    assert cache.cache_alias == 'main_cache'
+    assert cache.name == 'tiers'
+    assert cache.fast_cache_timeout == 20
+    assert CacheACache(None, dict(tiers=['fast_cache', 'main_cache'])).name \
+        == 'fast_cache+main_cache'
+    with pytest.raises(ImproperlyConfigured):
+        CacheACache(None, dict(tiers=['main_cache']))
+
+    with pytest.raises(ImproperlyConfigured):
+        Tier('fast_cache', 5, 'write-back')
+
+
+def test_tiers_get(tiers, get_cache):
+    first, second, slow = tiers
+    cache = get_cache()
+    slow.set('key', 'value')
+    second.set('key2', 'value2')
+    assert cache.get('key') == 'value'
+    assert first.cache['key'].timeout == 5
+    assert second.cache['key'].timeout == 20
+    assert cache.get('key2') == 'value2'
+    assert first.get('key2') == 'value2'
+    assert cache.get('missing') is None
+
+
+def test_tiers_get_many(tiers, get_cache):
+    first, second, slow = tiers
+    cache = get_cache()
+    first.set('key', 'value')
+    second.set('key2', 'value2')
+    slow.set_many({'key3': 'value3', 'key4': 'value4'})
+    assert cache.get_many(['key', 'key2', 'key3', 'missing']) == {
+        'key': 'value', 'key2': 'value2', 'key3': 'value3',
+    }
+    assert first.get_many(['key2', 'key3']) == {
+        'key2': 'value2', 'key3': 'value3',
+    }
+    assert second.get('key3') == 'value3'
+    assert 'key' not in second.cache
+
+
+def test_tiers_backfill_timeout(tiers):
+    first, second, slow = tiers
+    cache = CacheACache(None, dict(negative_timeout=2, tiers=[
+        dict(cache='fast_cache', max_timeout=20),
+        dict(cache='other_fast_cache', max_timeout=5),
+        'main_cache',
+    ]))
+    second.set_many({'key': 'value', 'missing': CACHE_MISS}, 2)
+    assert cache.get_many(['key', 'missing']) == {'key': 'value'}
+    # promoted value doesn't outlive the tier it was found in
+    assert first.cache['key'].timeout == 5
+    assert 'missing' not in first.cache
+    assert cache.get('missing') is None
+    assert 'missing' not in first.cache
+
+
+def test_tiers_write(tiers, get_cache):
+    first, second, slow = tiers
+    cache = get_cache()
+    cache.set('key', 'value', 100)
+    assert first.cache['key'].timeout == 5
+    assert second.cache['key'].timeout == 20
+    assert slow.cache['key'].timeout == 100
+    cache.set_many({'key2': 'value2'})
+    assert first.get('key2') == second.get('key2') == slow.get('key2')
+    cache.delete('key')
+    cache.delete_many(['key2'])
+    assert not first.cache and not second.cache and not slow.cache
+
+
+def test_tiers_read_only(tiers, get_cache):
+    first, second, slow = tiers
+    cache = get_cache(tiers=tier_list(second={'policy': 'read-only'}))
+    second.set('key', 'value')
+    slow.set('key2', 'value2')
+    assert cache.get('key') == 'value'
+    assert cache.get('key2') == 'value2'
+    assert 'key2' not in second.cache
+    cache.set('key3', 'value3')
+    cache.delete('key')
+    assert 'key3' not in second.cache
+    assert second.get('key') == 'value'
+
+
+def test_tiers_skip_on_miss(tiers, get_cache):
+    first, second, slow = tiers
+    cache = get_cache(tiers=tier_list(first={'policy': 'skip-on-miss'}))
+    slow.set('key', 'value')
+    assert cache.get('key') == 'value'
+    assert 'key' not in first.cache
+    assert second.get('key') == 'value'
+    cache.set('key2', 'value2')
+    assert first.get('key2') == 'value2'
+
+
+def test_tiers_touch(tiers):
+    first = tiers[0]
+    local = caches['shard_1']
+    local.clear()
+    chain = TierChain([Tier('shard_1', 5), Tier('fast_cache', 20)])
+    chain.set('key', 'value')
+    assert chain.touch('key', 0)
+    assert local.get('key') is None
+    # MockCache doesn't support touch, the key is dropped
+    assert 'key' not in first.cache
+    assert not chain.touch('missing', 10)
@@ -0,0 +1,158 @@
+#!//usr/bin/env python
+# -*- coding: utf-8 -*-
+# MIT License - full license can be found in LICENSE file.
+# Copyright (c) 2016 Jan Nakladal
+
+from __future__ import unicode_literals, absolute_import
+
+import pytest
+from django.core.signals import request_finished
+
+from django_in_request_cache.context import request_cache_scope
+from django_in_request_cache.middleware import RequestCacheMiddleware, \
+    WriteBehindMiddleware
+from django_in_request_cache.write_behind import flush_writes, \
+    write_behind_failed
+
+from tests.conftest import MockRequest
+
+
+###############################################################################
+#  Test Fixtures
+###############################################################################
+
+
+@pytest.fixture()
+def cache_params():
+    return dict(location='write_behind', write_behind=True)
+
+
+###############################################################################
+#  Test write behind
+###############################################################################
+
+
+def test_write_behind(main_cache, get_cache, spy):
+    cache = get_cache()
+    set_many = spy(main_cache, 'set_many')
+    delete_many = spy(main_cache, 'delete_many')
+    main_cache.set('deleted', 'value')
+
+    def view(request):
+        cache.set('key', 'value')
+        cache.set('key', 'value2')
+        cache.set_many({'key2': 'value3', 'key3': 'value4'})
+        cache.delete('deleted')
+        cache.delete('key3')
+        assert 'key' not in main_cache.cache
+        assert cache.get('key') == 'value2'
+        assert cache.get('deleted') is None
+        assert cache.get_many(['key', 'key2', 'key3', 'deleted']) == {
+            'key': 'value2', 'key2': 'value3',
+        }
+        return 'response'
+
+    middleware = RequestCacheMiddleware(WriteBehindMiddleware(view))
+    assert middleware(MockRequest()) == 'response'
+    assert set_many == [({'key': 'value2', 'key2': 'value3'}, 300, None)]
+    assert sorted(delete_many[0][0]) == ['deleted', 'key3']
+    assert main_cache.get('key') == 'value2'
+    assert main_cache.get('deleted') is None
+
+
+def test_write_behind_request_finished(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set('key', 'value')
+        assert 'key' not in main_cache.cache
+        request_finished.send(sender=None)
+        assert main_cache.get('key') == 'value'
+
+
+def test_write_behind_scope_exit(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set('key', 'value')
+
+    assert main_cache.get('key') == 'value'
+
+
+def test_write_behind_write_after_early_flush(main_cache, get_cache):
+    cache = get_cache()
+    request = MockRequest()
+
+    def view(request):
+        cache.set('a', 'value')
+        return 'response'
+
+    middleware = RequestCacheMiddleware(WriteBehindMiddleware(view))
+    assert middleware(request) == 'response'
+    assert main_cache.get('a') == 'value'
+
+    # buffer flushed by the middleware gets another write later
+    with request_cache_scope(request):
+        cache.set('b', 'value2')
+        flush_writes()
+        cache.set('c', 'value3')
+        assert 'c' not in main_cache.cache
+
+    assert main_cache.get('b') == 'value2'
+    assert main_cache.get('c') == 'value3'
+
+    with request_cache_scope(request):
+        cache.set('d', 'value4')
+
+    request_finished.send(sender=None)
+    assert main_cache.get('d') == 'value4'
+
+
+def test_write_behind_nested_scope(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set('outer', 'value')
+        with request_cache_scope():
+            cache.set('inner', 'value2')
+
+        assert main_cache.get('inner') == 'value2'
+        assert 'outer' not in main_cache.cache
+        cache.set('outer2', 'value3')
+
+    assert main_cache.get('outer') == 'value'
+    assert main_cache.get('outer2') == 'value3'
+
+
+def test_write_behind_add(main_cache, get_cache):
+    cache = get_cache()
+    with request_cache_scope():
+        cache.set('key', 'value')
+        assert not cache.add('key', 'value2')
+        assert main_cache.get('key') == 'value'
+
+
+def test_write_behind_out_of_request(main_cache, get_cache):
+    cache = get_cache()
+    cache.set('key', 'value')
+    assert main_cache.get('key') == 'value'
+
+
+def test_write_behind_failure(monkeypatch, main_cache, get_cache):
+    cache = get_cache()
+    failures = []
+
+    def set_many(*args, **kwargs):
+        raise ValueError('connection refused')
+
+    def receiver(sender, cache, keys, exception, **kwargs):
+        failures.append((keys, exception))
+
+    monkeypatch.setattr(main_cache, 'set_many', set_many)
+    write_behind_failed.connect(receiver)
+    try:
+        with request_cache_scope():
+            cache.set('key', 'value')
+    finally:
+        write_behind_failed.disconnect(receiver)
+
+    assert len(failures) == 1
+    assert failures[0][0] == ['key']
+    assert isinstance(failures[0][1], ValueError)